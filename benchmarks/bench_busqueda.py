@@ -0,0 +1,83 @@
+"""Compara el tamaño y el tiempo de parseo de las páginas de búsqueda.
+
+Ejecuta la misma consulta en modo completo (_source entero y resaltados,
+como la consulta original de buscar_documentos) y en modo solo metadatos,
+y mide por página los bytes transferidos, los bytes descomprimidos, la
+latencia y el tiempo de json.loads.
+
+Uso: python benchmarks/bench_busqueda.py "derecho de retracto" --paginas 3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sic_downloader import SICDownloader, URL_BUSQUEDA
+
+
+def medir_pagina(downloader, query):
+    """Envía una consulta y devuelve (bytes en la red, bytes descomprimidos, latencia, parseo)"""
+    headers = downloader.session.headers.copy()
+    headers.update({"Content-Type": "application/json"})
+    response = downloader.session.post(URL_BUSQUEDA, json=query, headers=headers)
+    response.raise_for_status()
+    # elapsed incluye la espera del limitador de tasa, que AdaptadorLimitado deja anotada
+    latencia = response.elapsed.total_seconds() - getattr(response, "espera_limitador", 0.0)
+    
+    contenido = response.content
+    # tell() devuelve lo leído del socket, antes de descomprimir gzip
+    bytes_red = response.raw.tell() or len(contenido)
+    
+    inicio = time.perf_counter()
+    json.loads(contenido)
+    parseo = time.perf_counter() - inicio
+    return bytes_red, len(contenido), latencia, parseo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la consulta de búsqueda (completa vs solo metadatos).')
+    parser.add_argument('terminos', help='Términos de búsqueda')
+    parser.add_argument('--paginas', type=int, default=3, help='Número de páginas a medir por modo')
+    parser.add_argument('--tamano', type=int, default=20, help='Documentos por página')
+    
+    args = parser.parse_args()
+    
+    downloader = SICDownloader(output_dir=tempfile.mkdtemp(prefix="sic_bench_"))
+    modos = [
+        ("completo", {}),
+        ("metadatos", {"solo_metadatos": True}),
+    ]
+    
+    resumen = {}
+    for nombre, opciones in modos:
+        filas = []
+        for pagina in range(args.paginas):
+            query = downloader._construir_consulta(args.terminos, args.tamano, pagina * args.tamano, **opciones)
+            filas.append(medir_pagina(downloader, query))
+        resumen[nombre] = filas
+    
+    print("\n" + "=" * 80)
+    print(f"{'modo':<10} {'pág':>4} {'KB red':>10} {'KB json':>10} {'latencia ms':>12} {'parseo ms':>10}")
+    for nombre, filas in resumen.items():
+        for pagina, (red, descomprimido, latencia, parseo) in enumerate(filas, 1):
+            print(f"{nombre:<10} {pagina:>4} {red / 1024:>10.1f} {descomprimido / 1024:>10.1f} "
+                  f"{latencia * 1000:>12.1f} {parseo * 1000:>10.2f}")
+    
+    print("-" * 80)
+    medias = {
+        nombre: [sum(col) / len(filas) for col in zip(*filas)]
+        for nombre, filas in resumen.items()
+    }
+    completo, metadatos = medias["completo"], medias["metadatos"]
+    print(f"Bytes por página:  {completo[0] / 1024:.1f} KB -> {metadatos[0] / 1024:.1f} KB "
+          f"({completo[0] / max(metadatos[0], 1):.1f}x menos)")
+    print(f"Parseo por página: {completo[3] * 1000:.2f} ms -> {metadatos[3] * 1000:.2f} ms")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
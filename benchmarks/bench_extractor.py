@@ -0,0 +1,122 @@
+"""Micro-benchmark de la extracción de enlaces de las páginas del visor.
+
+Compara la implementación original de extraer_links_documentos
+(BeautifulSoup con html.parser, cuatro recorridos y deduplicación sobre una
+lista) con el extractor de una sola pasada de sic_extractor en cada backend
+instalado, y comprueba que todos devuelven los mismos enlaces. La
+comparación es como conjunto: la versión original deduplicaba antes de
+convertir a URL absoluta y repetía los enlaces relativos.
+
+Las páginas de benchmarks/fixtures son sintéticas (una SPA con URLs de S3 en
+scripts, una página con contenedores de archivos y un listado grande con
+enlaces repetidos); se pueden pasar páginas del visor guardadas como argumentos.
+
+Uso: python benchmarks/bench_extractor.py [pagina.html ...] --repeticiones 50
+"""
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from sic_extractor import extraer_enlaces, backends_disponibles
+
+URL_VISOR = "https://gestor.relatoria.sic.gov.co/visor-relatorias/123/archivos-providencia/Sentencia_escrita"
+DIR_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def extraer_original(html, url_visor):
+    """Copia de la extracción anterior de SICDownloader.extraer_links_documentos"""
+    soup = BeautifulSoup(html, 'html.parser')
+    links = []
+    
+    pdf_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx?|xlsx?)$', re.I))
+    for link in pdf_links:
+        href = link.get('href')
+        if href and href not in links:
+            if not href.startswith(('http://', 'https://')):
+                href = urllib.parse.urljoin(url_visor, href)
+            links.append(href)
+    
+    content_containers = soup.find_all(['div', 'section'], class_=re.compile(r'(documento|archivo|file|document|content)', re.I))
+    for container in content_containers:
+        anchors = container.find_all('a')
+        for anchor in anchors:
+            href = anchor.get('href')
+            if href and href not in links:
+                if not href.startswith(('http://', 'https://')):
+                    href = urllib.parse.urljoin(url_visor, href)
+                links.append(href)
+    
+    iframes = soup.find_all('iframe')
+    for iframe in iframes:
+        src = iframe.get('src')
+        if src and src not in links:
+            if not src.startswith(('http://', 'https://')):
+                src = urllib.parse.urljoin(url_visor, src)
+            links.append(src)
+    
+    scripts = soup.find_all('script')
+    for script in scripts:
+        if script.string:
+            url_matches = re.findall(r'(https?://[^\s"\'<>]+\.(pdf|docx?|xlsx?|zip))', script.string)
+            for url_match, _ in url_matches:
+                if url_match not in links:
+                    links.append(url_match)
+            
+            s3_matches = re.findall(r'(https?://[^\s"\'<>]+amazonaws\.com[^\s"\'<>]+)', script.string)
+            for s3_url in s3_matches:
+                if s3_url not in links:
+                    links.append(s3_url)
+    
+    return links
+
+
+def medir(funcion, paginas, repeticiones):
+    """Devuelve (páginas por segundo, enlaces de cada página)"""
+    resultados = [funcion(html) for html in paginas]
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for html in paginas:
+            funcion(html)
+    duracion = time.perf_counter() - inicio
+    return repeticiones * len(paginas) / duracion, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la extracción de enlaces del visor.')
+    parser.add_argument('paginas', nargs='*', help='Páginas HTML del visor (por defecto benchmarks/fixtures/*.html)')
+    parser.add_argument('--repeticiones', type=int, default=50, help='Veces que se procesa cada página')
+    
+    args = parser.parse_args()
+    
+    rutas = args.paginas or sorted(glob.glob(os.path.join(DIR_FIXTURES, "*.html")))
+    paginas = []
+    for ruta in rutas:
+        with open(ruta, encoding='utf-8') as f:
+            paginas.append(f.read())
+    print(f"{len(paginas)} páginas ({sum(len(p) for p in paginas) / 1024:.0f} KB), {args.repeticiones} repeticiones")
+    
+    candidatos = [("original (bs4)", lambda html: extraer_original(html, URL_VISOR))]
+    for backend in backends_disponibles():
+        candidatos.append((backend, lambda html, b=backend: extraer_enlaces(html, URL_VISOR, b)))
+    
+    referencia = None
+    base = None
+    print("-" * 60)
+    print(f"{'implementación':<16} {'páginas/s':>12} {'aceleración':>12} {'mismos enlaces':>16}")
+    for nombre, funcion in candidatos:
+        velocidad, resultados = medir(funcion, paginas, args.repeticiones)
+        if referencia is None:
+            referencia, base = resultados, velocidad
+        iguales = all(set(a) == set(b) for a, b in zip(resultados, referencia))
+        print(f"{nombre:<16} {velocidad:>12.1f} {velocidad / base:>11.1f}x {'sí' if iguales else 'NO':>16}")
+
+
+if __name__ == "__main__":
+    main()
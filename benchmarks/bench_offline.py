@@ -0,0 +1,319 @@
+"""Benchmark de extremo a extremo contra un servidor local que imita los endpoints de la SIC.
+
+Levanta en otro proceso un servidor HTTP con _search (search_after y
+from/size), get-signed-url, las páginas del visor y los objetos de S3, y
+redirige a él las constantes URL_* de sic_downloader y sic_minimalista. Con
+la misma semilla los documentos, los errores inyectados y los bytes servidos
+son siempre los mismos. Cada flujo se ejecuta en un proceso propio sobre un
+directorio vacío y se mide documentos/s, MB/s y el pico de memoria (RSS).
+
+Con --duplicados los documentos van de dos en dos con el mismo año, número
+y tipo de providencia; el flujo del descargador comprueba además que cada
+archivo completado del manifiesto esté en disco y que no quede ningún .part
+(con varios workers, dos documentos con el mismo nombre no deben pisarse).
+
+El limitador de tasa se crea con --tasa solicitudes/s por host para que la
+espera deliberada no oculte el coste del código; con la tasa real (2/s) se
+mide el ritmo que se obtendría contra la SIC.
+
+Uso: python benchmarks/bench_offline.py --documentos 200 --latencia-ms 20 --errores 0.02 --tamano-kb 256
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import hashlib
+import argparse
+import resource
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TIPOS_VISOR = ["Auto_escrito", "Sentencia_oral", "Comunicacion"]
+TAMANO_ESCRITURA = 64 * 1024
+
+
+class ServidorSIC(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, documentos, latencia, errores, tamano, semilla, duplicados=False):
+        super().__init__(direccion, ManejadorSIC)
+        self.documentos = documentos
+        self.latencia = latencia
+        self.errores = errores
+        self.tamano = tamano
+        self.semilla = semilla
+        self.duplicados = duplicados
+        self.intentos = {}
+        self.lock = threading.Lock()
+        # Contenido de los archivos: cabecera PDF y relleno pseudoaleatorio fijo
+        generador = random.Random(semilla)
+        self.contenido = b"%PDF-1.4\n" + bytes(generador.getrandbits(8) for _ in range(max(0, tamano - 9)))
+
+    def hit(self, i):
+        # Con duplicados, los documentos 2k-1 y 2k comparten año, número y tipo
+        n = i - (i - 1) % 2 if self.duplicados else i
+        fecha = f"{2015 + i % 10}-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+        # Valores de orden con la forma de ORDEN_PAGINACION; el último identifica el documento
+        # para que el servidor retome la paginación (en Elasticsearch sería el número de expediente)
+        return {
+            "_id": f"doc{i:06d}", "_score": 1.0, "sort": [1.0, fecha, f"doc{i:06d}"],
+            "_source": {
+                "informacion": {"ano_expediente": str(2015 + n % 10), "numero_expediente": str(10000 + n),
+                                "tipo_providencia": ["Sentencia", "Auto"][n % 2],
+                                "fecha_providencia": fecha},
+                "partes": [{"nombre": f"Parte {i}"}],
+                "archivos": [{"tipo_archivo": "Sentencia escrita", "path_s3": f"relatoria/{i:06d}.pdf"}],
+                "tesauro": {"categoria": [{"nombre": "Consumidor"}], "descriptor": [{"nombre": "Garantía"}]},
+                "documento_resumen": {"transcripcion": f"Resumen del documento {i}"}
+            }
+        }
+
+    def falla(self, ruta):
+        """Decide de forma reproducible si el intento n-ésimo a esta ruta devuelve 503"""
+        if not self.errores:
+            return False
+        with self.lock:
+            intento = self.intentos.get(ruta, 0)
+            self.intentos[ruta] = intento + 1
+        valor = hashlib.sha256(f"{self.semilla}:{ruta}:{intento}".encode()).digest()
+        return int.from_bytes(valor[:4], "big") / 2 ** 32 < self.errores
+
+
+class ManejadorSIC(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, cuerpo=b"", tipo="application/json", cabeceras=None):
+        if isinstance(cuerpo, (dict, list)):
+            cuerpo = json.dumps(cuerpo).encode()
+        elif isinstance(cuerpo, str):
+            cuerpo = cuerpo.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        if self.command != "HEAD":
+            for inicio in range(0, len(cuerpo), TAMANO_ESCRITURA):
+                self.wfile.write(cuerpo[inicio:inicio + TAMANO_ESCRITURA])
+
+    def _leer_cuerpo(self):
+        longitud = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(longitud) if longitud else b""
+
+    def _base(self):
+        return f"http://{self.headers.get('Host')}"
+
+    def _atender(self):
+        servidor = self.server
+        cuerpo = self._leer_cuerpo()
+        time.sleep(servidor.latencia)
+        partes = urllib.parse.urlsplit(self.path)
+        ruta = partes.path
+
+        if servidor.falla(self.command + " " + self.path + cuerpo.decode("utf-8", "ignore")):
+            return self._responder(503, {"error": "inyectado"})
+
+        if ruta.endswith("/_search"):
+            consulta = json.loads(cuerpo or "{}")
+            if not consulta and partes.query:
+                consulta = json.loads(urllib.parse.parse_qs(partes.query)["source"][0])
+            tamano = consulta.get("size", 20)
+            indices = range(1, servidor.documentos + 1)
+            if consulta.get("search_after"):
+                ultimo = int(consulta["search_after"][-1][3:])
+                indices = range(ultimo + 1, servidor.documentos + 1)
+            else:
+                indices = indices[consulta.get("from", 0):]
+            hits = [servidor.hit(i) for i in list(indices)[:tamano]]
+            return self._responder(200, {"hits": {"total": {"value": servidor.documentos}, "hits": hits}})
+
+        if "/get-signed-url/" in ruta:
+            path_s3 = urllib.parse.unquote(ruta.split("/get-signed-url/", 1)[1])
+            fecha = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+            return self._responder(200, {"url": f"{self._base()}/s3/{path_s3}?X-Amz-Date={fecha}&X-Amz-Expires=3600"})
+
+        if "/visor-relatorias/" in ruta:
+            doc_id, _, tipo = ruta.split("/visor-relatorias/", 1)[1].split("/")[:3]
+            if tipo not in TIPOS_VISOR:
+                return self._responder(200, "<html><body>Sin archivos</body></html>", "text/html")
+            html = (f'<html><body><div class="documento"><a href="{self._base()}/archivos/{doc_id}_{tipo}.pdf">'
+                    f'{tipo}</a></div></body></html>')
+            return self._responder(200, html, "text/html")
+
+        if ruta.startswith(("/s3/", "/archivos/")):
+            return self._responder(200, servidor.contenido, "application/pdf", {"ETag": f'"{len(servidor.contenido)}"'})
+
+        if ruta in ("", "/"):
+            return self._responder(200, "<html><body>Relatoría</body></html>", "text/html")
+
+        return self._responder(404, {"error": "no encontrado"})
+
+    do_GET = _atender
+    do_POST = _atender
+    do_HEAD = _atender
+
+
+def puerto_libre():
+    """Devuelve un puerto TCP libre en 127.0.0.1"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def servir(puerto, opciones, listo):
+    servidor = ServidorSIC(("127.0.0.1", puerto), opciones["documentos"], opciones["latencia_ms"] / 1000,
+                           opciones["errores"], opciones["tamano_kb"] * 1024, opciones["semilla"],
+                           opciones["duplicados"])
+    listo.set()
+    servidor.serve_forever()
+
+
+def redirigir(modulo, base):
+    """Apunta las constantes URL_* de un módulo al servidor local"""
+    for nombre in dir(modulo):
+        if not nombre.startswith("URL_"):
+            continue
+        valor = getattr(modulo, nombre)
+        partes = urllib.parse.urlsplit(valor)
+        setattr(modulo, nombre, base + partes.path + (f"?{partes.query}" if partes.query else ""))
+
+
+def tamano_directorio(directorio):
+    total = 0
+    for raiz, _, archivos in os.walk(directorio):
+        for nombre in archivos:
+            if not nombre.startswith("."):
+                total += os.path.getsize(os.path.join(raiz, nombre))
+    return total
+
+
+def flujo_descargador(base, opciones, directorio):
+    import sic_downloader
+    from sic_limitador import LimitadorTasa
+
+    redirigir(sic_downloader, base)
+    downloader = sic_downloader.SICDownloader(directorio, workers=opciones["workers"],
+                                              limitador=LimitadorTasa(tasa_por_defecto=opciones["tasa"]))
+    downloader.procesar_documentos("benchmark", max_documentos=opciones["documentos"])
+    completados = downloader.manifiesto.resumen().get("completado", 0)
+    if opciones["duplicados"]:
+        en_disco = [nombre for nombre in os.listdir(directorio) if not nombre.startswith(".")]
+        parciales = [nombre for nombre in en_disco if nombre.endswith(".part")]
+        if parciales or len(en_disco) != completados:
+            raise SystemExit(f"× {len(en_disco)} archivos en disco ({len(parciales)} .part) "
+                             f"y {completados} completados en el manifiesto")
+    return completados
+
+
+def flujo_minimalista(base, opciones, directorio):
+    import sic_minimalista
+    from sic_limitador import LimitadorTasa
+
+    redirigir(sic_minimalista, base)
+    sic_minimalista.limitador = LimitadorTasa(tasa_por_defecto=opciones["tasa"])
+    argv = sys.argv
+    sys.argv = ["sic_minimalista", "benchmark", "--max", str(opciones["documentos"]), "--dir", directorio]
+    try:
+        sic_minimalista.main()
+    finally:
+        sys.argv = argv
+    return len([nombre for nombre in os.listdir(directorio) if nombre.endswith(".pdf")])
+
+
+FLUJOS = {
+    "descargador": flujo_descargador,
+    "minimalista": flujo_minimalista,
+}
+
+
+def ejecutar_flujo(nombre, base, opciones, resultados):
+    """Proceso hijo: ejecuta un flujo sobre un directorio vacío y mide tiempo, bytes y RSS"""
+    with tempfile.TemporaryDirectory(prefix=f"bench_{nombre}_") as directorio:
+        salida = open(os.devnull, "w") if not opciones["verboso"] else sys.stdout
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(salida):
+            archivos = FLUJOS[nombre](base, opciones, directorio)
+        duracion = time.perf_counter() - inicio
+        resultados.put({
+            "flujo": nombre,
+            "segundos": duracion,
+            "documentos": opciones["documentos"],
+            "archivos": archivos,
+            "bytes": tamano_directorio(directorio),
+            # ru_maxrss está en KB en Linux y en bytes en macOS
+            "rss_pico_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de extremo a extremo contra un servidor SIC local.')
+    parser.add_argument('--documentos', type=int, default=100, help='Documentos en el índice falso')
+    parser.add_argument('--latencia-ms', type=float, default=10.0, help='Latencia añadida a cada respuesta')
+    parser.add_argument('--errores', type=float, default=0.0, help='Fracción de solicitudes que responden 503')
+    parser.add_argument('--tamano-kb', type=int, default=128, help='Tamaño de cada archivo servido')
+    parser.add_argument('--semilla', type=int, default=1, help='Semilla de los datos y de los errores inyectados')
+    parser.add_argument('--workers', type=int, default=4, help='Workers de SICDownloader')
+    parser.add_argument('--tasa', type=float, default=1000.0, help='Solicitudes/s por host del limitador de tasa')
+    parser.add_argument('--duplicados', action='store_true',
+                        help='Documentos de dos en dos con el mismo nombre base; comprueba que no se pisen')
+    parser.add_argument('--flujos', nargs='+', choices=sorted(FLUJOS), default=sorted(FLUJOS),
+                        help='Flujos a medir')
+    parser.add_argument('--repeticiones', type=int, default=1, help='Ejecuciones por flujo (se informa la mediana)')
+    parser.add_argument('--verboso', action='store_true', help='Mostrar la salida de los flujos')
+    parser.add_argument('--json', action='store_true', help='Mostrar los resultados como JSON')
+
+    args = parser.parse_args()
+    opciones = vars(args)
+
+    contexto = multiprocessing.get_context("spawn")
+    puerto = puerto_libre()
+    listo = contexto.Event()
+    servidor = contexto.Process(target=servir, args=(puerto, opciones, listo), daemon=True)
+    servidor.start()
+    listo.wait(10)
+    base = f"http://127.0.0.1:{puerto}"
+
+    filas = []
+    try:
+        for nombre in args.flujos:
+            medidas = []
+            for _ in range(args.repeticiones):
+                resultados = contexto.Queue()
+                proceso = contexto.Process(target=ejecutar_flujo, args=(nombre, base, opciones, resultados))
+                proceso.start()
+                proceso.join()
+                if resultados.empty():
+                    raise SystemExit(f"× El flujo {nombre} terminó con error (código {proceso.exitcode})")
+                medidas.append(resultados.get())
+            medidas.sort(key=lambda medida: medida["segundos"])
+            filas.append(medidas[len(medidas) // 2])
+    finally:
+        servidor.terminate()
+
+    if args.json:
+        print(json.dumps(filas, indent=2))
+        return
+
+    print(f"{args.documentos} documentos, latencia {args.latencia_ms:.0f} ms, errores {args.errores:.0%}, "
+          f"archivos de {args.tamano_kb} KB, tasa {args.tasa:g}/s por host, semilla {args.semilla}")
+    print(f"{'flujo':<14}{'s':>9}{'docs/s':>10}{'archivos':>10}{'MB/s':>9}{'RSS pico MB':>13}")
+    for fila in filas:
+        print(f"{fila['flujo']:<14}{fila['segundos']:>9.2f}{fila['documentos'] / fila['segundos']:>10.1f}"
+              f"{fila['archivos']:>10}{fila['bytes'] / (1024 * 1024) / fila['segundos']:>9.2f}"
+              f"{fila['rss_pico_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
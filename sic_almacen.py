@@ -0,0 +1,125 @@
+import os
+import shutil
+import sqlite3
+import threading
+import urllib.parse
+
+
+class AlmacenContenido:
+    def __init__(self, directorio):
+        """Almacén direccionado por contenido: blobs nombrados por su sha256
+
+        Los archivos con nombre legible son enlaces (duros si se puede, si no
+        simbólicos o, como último recurso, copias) a los blobs de
+        directorio/.blobs. Un índice SQLite relaciona nombres, referencias de
+        origen (ruta S3 o URL) y ETags con el sha256 del contenido.
+        """
+        self.directorio = directorio
+        self.dir_blobs = os.path.join(directorio, ".blobs")
+        os.makedirs(self.dir_blobs, exist_ok=True)
+        self.lock = threading.Lock()
+
+        self.conexion = sqlite3.connect(os.path.join(directorio, ".almacen.sqlite"), timeout=30,
+                                        check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS nombres (
+                nombre_archivo TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS referencias (
+                clave TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+        """)
+        self.conexion.commit()
+
+    def ruta_blob(self, sha256):
+        """Ruta del blob para un sha256 (repartido en subdirectorios por prefijo)"""
+        return os.path.join(self.dir_blobs, sha256[:2], sha256)
+
+    @staticmethod
+    def clave_etag(url, etag):
+        """Clave de índice para un ETag fuerte, acotada al host que lo emitió
+
+        Los ETag débiles (W/...) no garantizan contenido idéntico y se ignoran.
+        """
+        if not etag or etag.startswith("W/"):
+            return None
+        host = urllib.parse.urlsplit(url).hostname or ""
+        return f"etag:{host}:{etag}"
+
+    def buscar(self, clave):
+        """Devuelve el sha256 asociado a una referencia si su blob existe, o None"""
+        if not clave:
+            return None
+        with self.lock:
+            fila = self.conexion.execute("SELECT sha256 FROM referencias WHERE clave = ?", (clave,)).fetchone()
+        if fila and os.path.exists(self.ruta_blob(fila[0])):
+            return fila[0]
+        return None
+
+    def recuperar(self, clave, nombre_archivo):
+        """Si la referencia ya tiene blob, crea nombre_archivo a partir de él sin descargar nada
+
+        Devuelve {"bytes", "sha256"} o None si la referencia no se conoce.
+        """
+        sha256 = self.buscar(clave)
+        if not sha256:
+            return None
+        self.enlazar(sha256, nombre_archivo)
+        return {"bytes": os.path.getsize(self.ruta_blob(sha256)), "sha256": sha256}
+
+    def guardar(self, ruta_temporal, sha256, claves=()):
+        """Mueve un archivo descargado a su blob (o lo descarta si ya existía) y registra sus referencias"""
+        destino = self.ruta_blob(sha256)
+        if os.path.exists(destino):
+            os.remove(ruta_temporal)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(ruta_temporal, destino)
+
+        self.guardar_referencias(sha256, claves)
+        return destino
+
+    def guardar_referencias(self, sha256, claves):
+        """Asocia referencias de origen (ruta S3, URL, ETag) a un blob"""
+        with self.lock:
+            for clave in claves:
+                if clave:
+                    self.conexion.execute(
+                        "INSERT OR REPLACE INTO referencias (clave, sha256) VALUES (?, ?)", (clave, sha256)
+                    )
+            self.conexion.commit()
+
+    def enlazar(self, sha256, nombre_archivo):
+        """Crea nombre_archivo apuntando al blob y lo registra en el índice de nombres"""
+        blob = self.ruta_blob(sha256)
+        if not os.path.exists(nombre_archivo):
+            try:
+                os.link(blob, nombre_archivo)
+            except OSError:
+                try:
+                    os.symlink(os.path.relpath(blob, os.path.dirname(os.path.abspath(nombre_archivo))),
+                               nombre_archivo)
+                except OSError:
+                    shutil.copyfile(blob, nombre_archivo)
+
+        with self.lock:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO nombres (nombre_archivo, sha256) VALUES (?, ?)", (nombre_archivo, sha256)
+            )
+            self.conexion.commit()
+
+    def estadisticas(self):
+        """Número de nombres, de blobs únicos y bytes ocupados por los blobs"""
+        with self.lock:
+            nombres = self.conexion.execute("SELECT COUNT(*) FROM nombres").fetchone()[0]
+            hashes = [fila[0] for fila in self.conexion.execute("SELECT DISTINCT sha256 FROM nombres")]
+        ocupado = sum(os.path.getsize(self.ruta_blob(h)) for h in hashes if os.path.exists(self.ruta_blob(h)))
+        return {"nombres": nombres, "blobs": len(hashes), "bytes": ocupado}
+
+    def cerrar(self):
+        """Cierra la conexión a la base de datos"""
+        with self.lock:
+            self.conexion.close()
@@ -0,0 +1,527 @@
+import os
+import json
+import asyncio
+import urllib.parse
+import sic_downloader
+from sic_downloader import (SICDownloader, PaginacionIndice, DescargaParcial, TAMANO_BLOQUE, nombre_base_reservado,
+                            nombre_archivo_s3, nombre_archivo_visor)
+from sic_http import crear_cliente_async
+from sic_limitador import LimitadorTasa
+from sic_cache_urls import CacheURLsFirmadas
+from sic_manifiesto import ManifiestoTrabajo
+from sic_almacen import AlmacenContenido
+from sic_planificador import PlanificadorFuentes
+from sic_extractor import extraer_enlaces
+
+try:
+    import httpx
+except ImportError:  # httpx es opcional: solo lo necesita este backend
+    httpx = None
+
+# Número de solicitudes simultáneas por etapa (firma/visor y descargas)
+CONCURRENCIA = 8
+
+TIPOS_ARCHIVO = ["Sentencia_escrita", "Auto_escrito", "Sentencia_oral", "Comunicacion"]
+
+
+def http2_disponible():
+    """Indica si está instalado el paquete h2 que httpx necesita para HTTP/2"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class SICDownloaderAsync:
+    def __init__(self, output_dir="documentos_sic", concurrencia=CONCURRENCIA, limitador=None, cache_urls=None,
+                 manifiesto=None, chunk_size=TAMANO_BLOQUE, almacen=None, planificar=True, parser_html=None,
+                 http2=True, transport=None):
+        """Versión asíncrona (httpx) de SICDownloader
+
+        Expone los mismos métodos (buscar_documentos, obtener_url_s3,
+        extraer_links_documentos, descargar_documento) como corrutinas y
+        procesar_documentos encadena búsqueda, resolución (firma S3 y visor) y
+        descarga como etapas unidas por colas acotadas, de modo que una
+        transferencia lenta no detiene al resto. concurrencia es el número de
+        tareas de cada etapa y el tamaño del pool de conexiones por host.
+        Se usa como gestor de contexto asíncrono (async with) para abrir y
+        cerrar el cliente HTTP. transport permite inyectar un transporte de
+        httpx (por ejemplo httpx.MockTransport en pruebas). La paginación y la
+        escritura de las descargas (.part, Range y almacén) son las de
+        SICDownloader (PaginacionIndice y DescargaParcial).
+        """
+        if httpx is None:
+            raise ImportError("El backend asíncrono requiere httpx: pip install 'httpx[http2]'")
+        self.output_dir = output_dir
+        self.concurrencia = max(1, concurrencia)
+        self.chunk_size = chunk_size
+        self.almacen = almacen
+        self.parser_html = parser_html
+        self.http2 = http2 and http2_disponible()
+        self.transport = transport
+        self.limitador = limitador or LimitadorTasa()
+        os.makedirs(output_dir, exist_ok=True)
+        self.cache_urls = cache_urls or CacheURLsFirmadas(os.path.join(output_dir, ".cache_urls.sqlite"))
+        self.manifiesto = manifiesto or ManifiestoTrabajo(os.path.join(output_dir, ".manifiesto.sqlite"))
+        self.planificador = None
+        if planificar:
+            self.planificador = PlanificadorFuentes(os.path.join(output_dir, ".planificador.json"))
+        self.client = None
+        self.total_resultados = 0
+        self.paginacion_completa = False
+        self.codigo_busqueda = None
+        self.urls_rechazadas = set()
+        # Como en SICDownloader: tras un 400 a search_after se pagina con from/size
+        self.cursor_rechazado = False
+
+    async def __aenter__(self):
+        self.client = crear_cliente_async(
+            self.concurrencia,
+            http2=self.http2,
+            transport=self.transport,
+            event_hooks={"request": [self._antes_de_solicitud], "response": [self._tras_respuesta]}
+        )
+        await self._inicializar_sesion()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        self.client = None
+
+    async def _antes_de_solicitud(self, request):
+        await self.limitador.esperar_async(str(request.url))
+
+    async def _tras_respuesta(self, response):
+        self.limitador.registrar(str(response.request.url), response.status_code,
+                                 response.headers.get("Retry-After"))
+
+    async def _inicializar_sesion(self):
+        """Visita la página principal para obtener cookies iniciales"""
+        try:
+            print("Inicializando sesión con la SIC" + (" (HTTP/2)..." if self.http2 else "..."))
+            response = await self.client.get(sic_downloader.URL_SIC)
+            if response.status_code == 200:
+                print("✓ Sesión inicializada correctamente")
+            else:
+                print(f"× Error al inicializar sesión: {response.status_code}")
+        except httpx.HTTPError as e:
+            print(f"× Error al inicializar sesión: {e}")
+
+    async def buscar_documentos(self, terminos_busqueda, size=20, from_index=0, solo_metadatos=False, resaltar=None):
+        """Realiza una búsqueda en el índice de relatorías (POST y, si falla, GET)"""
+        print(f"Buscando documentos para: '{terminos_busqueda}'")
+        query = SICDownloader._construir_consulta(terminos_busqueda, size, from_index,
+                                                  solo_metadatos=solo_metadatos, resaltar=resaltar)
+        try:
+            response = await self.client.post(sic_downloader.URL_BUSQUEDA, json=query)
+            if response.status_code == 200:
+                print("✓ Búsqueda exitosa (método POST)")
+                return response.json()
+            print(f"× Error en búsqueda POST: {response.status_code}")
+
+            params = {
+                "source": json.dumps(query),
+                "source_content_type": "application/json"
+            }
+            response = await self.client.get(sic_downloader.URL_BUSQUEDA, params=params)
+            if response.status_code == 200:
+                print("✓ Búsqueda exitosa (método GET)")
+                return response.json()
+            print(f"× Error en búsqueda GET: {response.status_code}")
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"× Error en la búsqueda: {e}")
+        return None
+
+    async def _consultar_indice(self, query):
+        """Envía una consulta por POST al índice y devuelve el JSON, o None si falla"""
+        self.codigo_busqueda = None
+        try:
+            response = await self.client.post(sic_downloader.URL_BUSQUEDA, json=query)
+            self.codigo_busqueda = response.status_code
+            if response.status_code == 200:
+                return response.json()
+            print(f"× Error en búsqueda paginada: {response.status_code}")
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"× Error en búsqueda paginada: {e}")
+        return None
+
+    async def iter_documentos(self, terminos_busqueda, tamano_pagina=100, max_documentos=None, solo_metadatos=True):
+        """Recorre todas las páginas de resultados (ver SICDownloader.iter_documentos y PaginacionIndice)"""
+        print(f"Buscando documentos para: '{terminos_busqueda}' (paginado)")
+        self.total_resultados = 0
+        self.paginacion_completa = False
+        pagina = PaginacionIndice(terminos_busqueda, tamano_pagina, max_documentos, solo_metadatos,
+                                  usar_cursor=not self.cursor_rechazado)
+
+        resultados = None
+        if pagina.usar_cursor:
+            resultados = await self._consultar_indice(pagina.primera_consulta())
+            if resultados is None and self.codigo_busqueda == 400:
+                print("⚠ El índice no acepta el orden de search_after; se pagina con from/size en esta sesión")
+                self.cursor_rechazado = True
+        if resultados is None or not SICDownloader._hits_con_orden(resultados):
+            resultados = await self._consultar_indice(pagina.sin_cursor())
+
+        if resultados is None:
+            resultados = await self.buscar_documentos(terminos_busqueda, solo_metadatos=solo_metadatos)
+            documentos = SICDownloader.obtener_ids_documentos(resultados)
+            self.total_resultados = len(documentos)
+            for doc in documentos[:max_documentos] if max_documentos else documentos:
+                yield doc
+            return
+
+        self.total_resultados = SICDownloader._total_hits(resultados)
+        print(f"✓ Búsqueda exitosa ({self.total_resultados} resultados, "
+              f"paginación {'search_after' if pagina.usar_cursor else 'from/size'})")
+
+        while True:
+            for doc in pagina.documentos(resultados):
+                yield doc
+            query = pagina.siguiente_consulta()
+            if query is None:
+                self.paginacion_completa = pagina.completa
+                return
+            resultados = await self._consultar_indice(query)
+            if resultados is None:
+                print("× Se interrumpió la paginación")
+                return
+
+    async def extraer_links_documentos(self, url_visor):
+        """Extrae los enlaces a los documentos desde la página del visor (None si no se pudo obtener)"""
+        print(f"Analizando: {url_visor}")
+        headers = {
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8"
+        }
+        try:
+            response = await self.client.get(url_visor, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Error al acceder al visor: {e}")
+            return None
+
+        # El análisis del HTML es CPU: fuera del bucle de eventos
+        links = await asyncio.to_thread(extraer_enlaces, response.text, url_visor, self.parser_html)
+        print(f"Se encontraron {len(links)} enlaces.")
+        return links
+
+    async def obtener_url_s3(self, path_s3):
+        """Obtiene la URL firmada para un archivo en S3"""
+        if not path_s3:
+            return None
+
+        url_firmada = self.cache_urls.obtener(path_s3)
+        if url_firmada:
+            return url_firmada
+
+        url = sic_downloader.URL_FIRMA_S3 + urllib.parse.quote(path_s3)
+        try:
+            response = await self.client.get(url)
+            response.raise_for_status()
+            url_firmada = response.json().get("url")
+            if url_firmada:
+                self.cache_urls.guardar(path_s3, url_firmada)
+            return url_firmada
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Error al obtener URL firmada: {e}")
+            return None
+
+    async def descargar_documento(self, url, nombre_archivo):
+        """Descarga un documento dado su URL"""
+        return await self._descargar(url, nombre_archivo) is not None
+
+    async def _descargar(self, url, nombre_archivo, clave=None):
+        """Descarga un documento y devuelve {"bytes", "sha256"}, o None si falla (ver SICDownloader._descargar)"""
+        parte = DescargaParcial(nombre_archivo, self.chunk_size, self.almacen, clave or url)
+        info = parte.existente()
+        if info:
+            return info
+
+        try:
+            print(f"Descargando: {nombre_archivo}" + (f" (reanudando desde {parte.inicio} bytes)" if parte.inicio else ""))
+            async with self.client.stream("GET", url, headers=parte.cabeceras()) as response:
+                reiniciar = parte.rango_rechazado(response.status_code)
+                if not reiniciar:
+                    response.raise_for_status()
+                    info = parte.enlazar_por_etag(url, response)
+                    if info is None:
+                        with parte.abrir(response) as f:
+                            async for chunk in response.aiter_bytes(self.chunk_size):
+                                parte.escribir(f, chunk)
+        except httpx.HTTPError as e:
+            print(f"× Error al descargar documento: {e}")
+            if isinstance(e, httpx.HTTPStatusError) and 400 <= e.response.status_code < 500:
+                self.urls_rechazadas.add(url)
+            return None
+
+        if reiniciar:
+            # Fuera del stream para no retener la conexión
+            return await self._descargar(url, nombre_archivo, clave)
+        return info or parte.terminar()
+
+    def _descarga_rechazada(self, url):
+        """Indica (una sola vez) si la última descarga de url falló con un 4xx"""
+        if url in self.urls_rechazadas:
+            self.urls_rechazadas.discard(url)
+            return True
+        return False
+
+    # Tubería de procesar_documentos
+
+    async def _producir_documentos(self, terminos_busqueda, max_documentos, reanudar, cola_docs):
+        """Etapa 1: búsqueda paginada; cada documento se registra y se encola en cuanto llega"""
+        if reanudar and self.manifiesto.busqueda_completa(terminos_busqueda, max_documentos):
+            print(f"Reanudando '{terminos_busqueda}' desde el manifiesto: {self.manifiesto.ruta}")
+            documentos = self.manifiesto.documentos(terminos_busqueda, max_documentos)
+            self.total_resultados = len(documentos)
+            for orden, doc in documentos:
+                nombre_base_reservado(self.manifiesto, doc)
+                await cola_docs.put((orden, doc))
+            return len(documentos)
+
+        orden = 0
+        async for doc in self.iter_documentos(terminos_busqueda, max_documentos=max_documentos):
+            orden += 1
+            self.manifiesto.registrar_documento(terminos_busqueda, orden, doc)
+            # Los nombres se reservan en el orden de la búsqueda, no en el que se resuelven
+            nombre_base_reservado(self.manifiesto, doc)
+            await cola_docs.put((orden, doc))
+        # Como en SICDownloader._iter_registrando: solo la paginación completa o el
+        # corte en max_documentos dejan la búsqueda lista para reanudar sin buscar
+        if self.paginacion_completa:
+            self.manifiesto.marcar_busqueda(terminos_busqueda, True, self.total_resultados)
+        elif max_documentos and orden >= max_documentos:
+            self.manifiesto.marcar_busqueda(terminos_busqueda, True, self.total_resultados, max_documentos)
+        else:
+            self.manifiesto.marcar_busqueda(terminos_busqueda, False, self.total_resultados)
+        return orden
+
+    async def _resolver_documento(self, doc, i, tipos_archivo, reanudar, cola_descargas):
+        """Etapa 2: firma y descarga lo de S3 y extrae los enlaces del visor; encola cada archivo del visor"""
+        doc_id = doc["id"]
+        tipo_prov = doc["tipo_providencia"]
+        base_nombre = nombre_base_reservado(self.manifiesto, doc)
+        total = self.total_resultados
+        print(f"\n[{i}/{total}] Documento: {base_nombre} (ID: {doc_id})")
+
+        estado = self.manifiesto.estado_documento(doc_id)
+        if reanudar and estado == "completado":
+            print("  ✓ Documento completado en una ejecución anterior.")
+            return
+
+        # Pendientes de este documento; la marca inicial se libera al terminar de resolverlo
+        self.pendientes[doc_id] = {"pendientes": 1, "fallidos": 0, "visor_fallido": False}
+
+        cubiertos_s3 = []
+        tiene_s3 = any(archivo.get("path_s3") for archivo in doc["archivos"])
+        usar_s3 = tiene_s3 and (not self.planificador or self.planificador.usar_s3(tipo_prov))
+        s3_descargados = 0
+        for archivo in doc["archivos"] if usar_s3 else []:
+            path_s3 = archivo.get("path_s3")
+            tipo_archivo = archivo.get("tipo")
+            if not path_s3:
+                continue
+            nombre_archivo = nombre_archivo_s3(self.output_dir, base_nombre, tipo_archivo, path_s3)
+            self.manifiesto.registrar_archivo(nombre_archivo, doc_id, "s3", path_s3)
+            # Si ya está en disco o en el almacén no hace falta pedir la URL firmada
+            clave = f"s3:{path_s3}"
+            info = DescargaParcial(nombre_archivo, almacen=self.almacen, clave=clave).existente()
+            if info:
+                self.manifiesto.marcar_archivo(nombre_archivo, "completado", info["bytes"], info["sha256"])
+                self.descargados += 1
+                s3_descargados += 1
+                cubiertos_s3.append(tipo_archivo)
+                continue
+
+            de_cache = self.cache_urls.obtener(path_s3)
+            url_s3 = await self.obtener_url_s3(path_s3)
+            if not url_s3:
+                self.manifiesto.marcar_archivo(nombre_archivo, "fallido", error="firma")
+                self.pendientes[doc_id]["fallidos"] += 1
+                continue
+            # S3 se descarga aquí y no en la cola: como en SICDownloader._procesar_documento,
+            # el planificador y los tipos que se piden al visor dependen de que la descarga
+            # funcione, no solo la firma
+            descargado = await self._descargar_registrado(url_s3, nombre_archivo, clave)
+            if not descargado and self._descarga_rechazada(url_s3) and de_cache:
+                # Como en SICDownloader: una URL firmada de la caché puede dejar de valer antes de caducar
+                print("  URL firmada de la caché rechazada, se vuelve a firmar")
+                self.cache_urls.invalidar(path_s3)
+                url_s3 = await self.obtener_url_s3(path_s3)
+                descargado = bool(url_s3) and await self._descargar_registrado(url_s3, nombre_archivo, clave)
+            if descargado:
+                s3_descargados += 1
+                cubiertos_s3.append(tipo_archivo)
+            else:
+                self.pendientes[doc_id]["fallidos"] += 1
+
+        if usar_s3 and self.planificador:
+            self.planificador.registrar(tipo_prov, "s3", s3_descargados > 0)
+
+        if reanudar and estado in ("resuelto", "fallido"):
+            archivos_visor = self.manifiesto.archivos_documento(doc_id, "visor")
+            print(f"  Enlaces del visor recuperados del manifiesto: {len(archivos_visor)}")
+        else:
+            tipos_visor = tipos_archivo
+            if self.planificador:
+                tipos_visor = self.planificador.tipos_visor(tipo_prov, tipos_archivo, cubiertos_s3)
+
+            archivos_visor = []
+            for tipo in tipos_visor:
+                url_visor = SICDownloader.obtener_url_visor_relatorias(doc_id, tipo)
+                enlaces = await self.extraer_links_documentos(url_visor)
+                if enlaces is None:
+                    self.pendientes[doc_id]["visor_fallido"] = True
+                    self.pendientes[doc_id]["fallidos"] += 1
+                    continue
+                if self.planificador:
+                    self.planificador.registrar(tipo_prov, f"visor:{tipo}", bool(enlaces))
+                for j, enlace in enumerate(enlaces, 1):
+                    nombre_archivo = nombre_archivo_visor(self.output_dir, base_nombre, tipo, j, enlace)
+                    self.manifiesto.registrar_archivo(nombre_archivo, doc_id, "visor", enlace)
+                    archivos_visor.append((nombre_archivo, enlace))
+            if not self.pendientes[doc_id]["visor_fallido"]:
+                self.manifiesto.marcar_documento(doc_id, "resuelto")
+
+        for nombre_archivo, enlace in archivos_visor:
+            self.pendientes[doc_id]["pendientes"] += 1
+            await cola_descargas.put((enlace, nombre_archivo, doc_id))
+
+        self._terminar_archivo(doc_id, True)
+
+    def _terminar_archivo(self, doc_id, exito):
+        """Descuenta un archivo pendiente y, si era el último, cierra el documento en el manifiesto"""
+        pendiente = self.pendientes[doc_id]
+        pendiente["pendientes"] -= 1
+        if not exito:
+            pendiente["fallidos"] += 1
+        if pendiente["pendientes"] == 0:
+            del self.pendientes[doc_id]
+            if pendiente["visor_fallido"]:
+                # Como en SICDownloader._procesar_documento: --resume vuelve a consultar el visor
+                self.manifiesto.marcar_documento(doc_id, "buscado")
+            else:
+                self.manifiesto.marcar_documento(doc_id, "fallido" if pendiente["fallidos"] else "completado")
+
+    async def _resolutor(self, cola_docs, cola_descargas, tipos_archivo, reanudar):
+        while True:
+            elemento = await cola_docs.get()
+            if elemento is None:
+                return
+            orden, doc = elemento
+            try:
+                await self._resolver_documento(doc, orden, tipos_archivo, reanudar, cola_descargas)
+            except Exception as e:
+                print(f"× Error al resolver el documento {doc.get('id')}: {e}")
+                if doc.get("id") in self.pendientes:
+                    self._terminar_archivo(doc["id"], False)
+
+    async def _descargador(self, cola_descargas):
+        while True:
+            elemento = await cola_descargas.get()
+            if elemento is None:
+                return
+            url, nombre_archivo, doc_id = elemento
+            self._terminar_archivo(doc_id, await self._descargar_registrado(url, nombre_archivo))
+
+    async def _descargar_registrado(self, url, nombre_archivo, clave=None):
+        """Descarga un archivo registrado en el manifiesto y deja constancia del resultado"""
+        self.manifiesto.marcar_archivo(nombre_archivo, "descargando")
+        try:
+            info = await self._descargar(url, nombre_archivo, clave)
+        except Exception as e:
+            print(f"× Error al descargar documento: {e}")
+            info = None
+        if info is None:
+            self.manifiesto.marcar_archivo(nombre_archivo, "fallido", error="descarga")
+            return False
+        self.manifiesto.marcar_archivo(nombre_archivo, "completado", info["bytes"], info["sha256"])
+        self.descargados += 1
+        return True
+
+    async def procesar_documentos(self, terminos_busqueda, max_documentos=None, tipos_archivo=None, reanudar=False):
+        """Procesa todos los documentos para los términos de búsqueda dados
+
+        Búsqueda -> cola de documentos -> resolutores (S3 y enlaces del visor) ->
+        cola de archivos -> descargadores. Las colas son acotadas, así que la
+        paginación y la resolución no se adelantan más de lo que las descargas
+        pueden absorber. Los nombres de archivo y el manifiesto son los mismos
+        que en SICDownloader, por lo que ambos motores pueden reanudar el
+        trabajo del otro.
+        """
+        if tipos_archivo is None:
+            tipos_archivo = TIPOS_ARCHIVO
+        self.pendientes = {}
+        self.descargados = 0
+
+        cola_docs = asyncio.Queue(maxsize=self.concurrencia * 2)
+        cola_descargas = asyncio.Queue(maxsize=self.concurrencia * 4)
+        resolutores = [asyncio.create_task(self._resolutor(cola_docs, cola_descargas, tipos_archivo, reanudar))
+                       for _ in range(self.concurrencia)]
+        descargadores = [asyncio.create_task(self._descargador(cola_descargas))
+                         for _ in range(self.concurrencia)]
+
+        try:
+            procesados = await self._producir_documentos(terminos_busqueda, max_documentos, reanudar, cola_docs)
+            for _ in resolutores:
+                await cola_docs.put(None)
+            await asyncio.gather(*resolutores)
+            for _ in descargadores:
+                await cola_descargas.put(None)
+            await asyncio.gather(*descargadores)
+        finally:
+            for tarea in resolutores + descargadores:
+                tarea.cancel()
+
+        if not procesados:
+            print("No se encontraron resultados para la búsqueda.")
+            return
+
+        print("\n" + "=" * 80)
+        print(f"Resumen: Se procesaron {procesados} documentos y se descargaron {self.descargados} archivos.")
+        print("Estado de los archivos en el manifiesto:", self.manifiesto.resumen())
+        if self.planificador:
+            self.planificador.guardar()
+            print(f"Fuentes por tipo de providencia ({self.planificador.visores_evitados} consultas al visor evitadas):")
+            for linea in self.planificador.resumen():
+                print("  " + linea)
+        print("Los archivos se encuentran en el directorio:", os.path.abspath(self.output_dir))
+        print("=" * 80)
+
+
+def procesar_documentos(terminos_busqueda, output_dir="documentos_sic", max_documentos=None, tipos_archivo=None,
+                        reanudar=False, **kwargs):
+    """Envoltorio síncrono: ejecuta SICDownloaderAsync.procesar_documentos en su propio bucle de eventos"""
+    async def ejecutar():
+        async with SICDownloaderAsync(output_dir, **kwargs) as downloader:
+            await downloader.procesar_documentos(terminos_busqueda, max_documentos, tipos_archivo, reanudar)
+
+    asyncio.run(ejecutar())
+
+
+# Función principal para ejecutar desde línea de comandos
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Descargador asíncrono de documentos de la SIC.')
+    parser.add_argument('terminos', help='Términos de búsqueda')
+    parser.add_argument('--max', type=int, default=None, help='Número máximo de documentos a procesar')
+    parser.add_argument('--dir', default='documentos_sic', help='Directorio de salida')
+    parser.add_argument('--concurrencia', type=int, default=CONCURRENCIA,
+                        help='Solicitudes simultáneas por etapa (firma/visor y descargas)')
+    parser.add_argument('--resume', action='store_true', help='Reanudar una ejecución interrumpida desde el manifiesto')
+    parser.add_argument('--chunk-kb', type=int, default=TAMANO_BLOQUE // 1024, help='Tamaño de bloque de descarga en KB')
+    parser.add_argument('--exhaustivo', action='store_true', help='Probar siempre S3 y todos los tipos del visor')
+    parser.add_argument('--almacen', action='store_true', help='Guardar los archivos deduplicados por contenido')
+    parser.add_argument('--sin-http2', action='store_true', help='Usar HTTP/1.1 aunque h2 esté instalado')
+
+    args = parser.parse_args()
+
+    procesar_documentos(args.terminos, args.dir, max_documentos=args.max, reanudar=args.resume,
+                        concurrencia=args.concurrencia, chunk_size=args.chunk_kb * 1024,
+                        almacen=AlmacenContenido(args.dir) if args.almacen else None,
+                        planificar=not args.exhaustivo, http2=not args.sin_http2)
+
+
+if __name__ == "__main__":
+    main()
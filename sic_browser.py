@@ -1,39 +1,177 @@
-import time
-import json
 import os
+import re
+import queue
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
+from sic_limitador import LimitadorTasa
+
+# Espera máxima (segundos) a que aparezca un elemento o termine una descarga
+ESPERA_ELEMENTOS = 15
+ESPERA_DESCARGA = 60
+
+# Recursos que no hacen falta para leer resultados ni descargar (se bloquean por CDP)
+RECURSOS_BLOQUEADOS = [
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp"
+]
+
+# Extensiones de las descargas a medio escribir de Chrome
+EXTENSIONES_PARCIALES = (".crdownload", ".tmp")
+
+SELECTOR_DESCARGA = "a[href*='.pdf'], a[href*='download'], button.download-btn"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
+
+# Dominio de las cookies que se comparten con el estado de sesión
+DOMINIO_SIC = "sic.gov.co"
+
+
+def descarga_completada(directorio, previos):
+    """Condición de espera: devuelve el primer archivo nuevo y completo de directorio, o False"""
+    actuales = set(os.listdir(directorio))
+    if any(nombre.endswith(EXTENSIONES_PARCIALES) for nombre in actuales):
+        return False
+    nuevos = sorted(actuales - previos)
+    return os.path.join(directorio, nuevos[0]) if nuevos else False
+
+
+def reservar_destino(directorio, nombre):
+    """Crea vacío y devuelve un archivo libre en directorio: nombre, o nombre_2, nombre_3... si ya existe
+
+    La creación es exclusiva, así que dos navegadores que terminan a la vez
+    una descarga con el mismo nombre no se pisan.
+    """
+    base, extension = os.path.splitext(nombre)
+    n = 1
+    while True:
+        destino = os.path.join(directorio, nombre if n == 1 else f"{base}_{n}{extension}")
+        try:
+            os.close(os.open(destino, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return destino
+        except FileExistsError:
+            n += 1
+
 
 class SICBrowser:
-    def __init__(self, headless=True):
-        """Inicializa un navegador para acceder a la SIC"""
+    def __init__(self, headless=True, directorio_descargas=None, bloquear_recursos=True, limitador=None,
+                 estado=None):
+        """Inicializa un navegador para acceder a la SIC
+
+        Las descargas van a directorio_descargas (por defecto un directorio
+        temporal propio, para que varios navegadores no se mezclen) y
+        obtener_documento las mueve al destino al completarse. Con
+        bloquear_recursos no se cargan imágenes, fuentes ni hojas de estilo.
+        Si se pasa un limitador (sic_limitador.LimitadorTasa) cada navegación
+        respeta la tasa por host compartida con los demás navegadores. Con
+        estado (sic_estado.EstadoSesion) el navegador arranca con el
+        User-Agent y las cookies vigentes de las sesiones de requests en
+        lugar de un perfil vacío, y guardar_estado le devuelve sus cookies.
+        """
+        self.limitador = limitador
+        self.estado = estado
+        self.directorio_descargas = directorio_descargas or tempfile.mkdtemp(prefix="sic_navegador_")
+        os.makedirs(self.directorio_descargas, exist_ok=True)
+        
         # Configurar opciones de Chrome
         chrome_options = Options()
+        # eager: no esperar a imágenes ni subrecursos, las esperas explícitas deciden
+        chrome_options.page_load_strategy = "eager"
         if headless:
-            chrome_options.add_argument("--headless")
+            chrome_options.add_argument("--headless=new")
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--window-size=1920,1080")
         
-        # Configurar User-Agent
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36")
+        # Configurar User-Agent (el mismo que las sesiones de requests, si ya hay uno elegido)
+        self.user_agent = (estado.user_agent() if estado else None) or USER_AGENT
+        chrome_options.add_argument(f"--user-agent={self.user_agent}")
+        
+        # Descargar los PDF en lugar de abrirlos en el visor integrado
+        preferencias = {
+            "download.default_directory": os.path.abspath(self.directorio_descargas),
+            "download.prompt_for_download": False,
+            "plugins.always_open_pdf_externally": True
+        }
+        if bloquear_recursos:
+            preferencias["profile.managed_default_content_settings.images"] = 2
+        chrome_options.add_experimental_option("prefs", preferencias)
         
         # Iniciar el navegador
         self.driver = webdriver.Chrome(options=chrome_options)
-        self.wait = WebDriverWait(self.driver, 10)
+        self.wait = WebDriverWait(self.driver, ESPERA_ELEMENTOS)
+        
+        # En modo headless las preferencias de descarga no siempre se aplican
+        self.driver.execute_cdp_cmd("Page.setDownloadBehavior", {
+            "behavior": "allow", "downloadPath": os.path.abspath(self.directorio_descargas)
+        })
+        if bloquear_recursos:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": RECURSOS_BLOQUEADOS})
+        if estado:
+            self._restaurar_cookies()
+    
+    def _restaurar_cookies(self):
+        """Carga por CDP las cookies vigentes del estado, sin tener que visitar antes el dominio"""
+        cookies = []
+        for cookie in self.estado.cookies():
+            cdp = {"name": cookie["name"], "value": cookie["value"], "domain": cookie.get("domain", ""),
+                   "path": cookie.get("path") or "/", "secure": cookie.get("secure", False),
+                   "httpOnly": cookie.get("httpOnly", False)}
+            if cookie.get("expires"):
+                cdp["expires"] = cookie["expires"]
+            cookies.append(cdp)
+        if cookies:
+            self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+    
+    def guardar_estado(self):
+        """Guarda en el estado las cookies de la SIC que tenga el navegador y su User-Agent"""
+        if not self.estado or not self.driver:
+            return
+        cookies = [{
+            "name": cookie["name"],
+            "value": cookie["value"],
+            "domain": cookie["domain"],
+            "path": cookie.get("path", "/"),
+            # Chrome marca las cookies de sesión con expires -1
+            "expires": int(cookie["expires"]) if cookie.get("expires", -1) > 0 else None,
+            "secure": cookie.get("secure", False),
+            "httpOnly": cookie.get("httpOnly", False),
+        } for cookie in self.driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+            if cookie["domain"].lstrip(".").endswith(DOMINIO_SIC)]
+        if cookies:
+            self.estado.guardar_cookies(cookies)
+        if not self.estado.user_agent():
+            self.estado.guardar("user_agent", self.user_agent)
+    
+    def _navegar(self, url):
+        if self.limitador:
+            self.limitador.esperar(url)
+        self.driver.get(url)
+    
+    def _esperar_resultados(self):
+        """Espera a que se rendericen los resultados y los devuelve ([] si no aparecen)"""
+        try:
+            self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".resultado-container")))
+            return self.wait.until(lambda driver: driver.find_elements(By.CSS_SELECTOR, ".resultado-item"))
+        except TimeoutException:
+            return []
     
     def buscar_documentos(self, terminos_busqueda):
         """Busca documentos en el sistema de relatoria de la SIC"""
         try:
             # Visitar la página principal
             print("Navegando a la página principal de la SIC...")
-            self.driver.get("https://relatoria.sic.gov.co/")
-            time.sleep(3)  # Esperar a que cargue
+            self._navegar("https://relatoria.sic.gov.co/")
             
             # Buscar el campo de búsqueda e ingresar los términos
             print(f"Buscando: '{terminos_busqueda}'")
@@ -46,13 +184,10 @@ class SICBrowser:
             
             # Esperar a que aparezcan los resultados
             print("Esperando resultados...")
-            time.sleep(5)  # Dar tiempo para que carguen los resultados
             
             # Capturar los resultados (el selector específico dependerá de la estructura de la página)
-            try:
-                resultados_container = self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".resultado-container")))
-                resultados_items = self.driver.find_elements(By.CSS_SELECTOR, ".resultado-item")
-                
+            resultados_items = self._esperar_resultados()
+            if resultados_items:
                 print(f"Se encontraron {len(resultados_items)} resultados.")
                 
                 # Procesar los resultados
@@ -72,7 +207,6 @@ class SICBrowser:
                         doc_id = ""
                         if enlace:
                             # Extraer ID del documento de la URL
-                            import re
                             id_match = re.search(r'/([^/]+)/archivos-providencia', enlace)
                             if id_match:
                                 doc_id = id_match.group(1)
@@ -88,8 +222,7 @@ class SICBrowser:
                         print(f"Error al procesar resultado: {e}")
                 
                 return resultados
-                
-            except TimeoutException:
+            else:
                 print("No se encontraron resultados o la estructura de la página es diferente.")
                 return []
                 
@@ -98,32 +231,52 @@ class SICBrowser:
             return []
     
     def obtener_documento(self, url_documento, ruta_destino):
-        """Navega a la URL del documento y descarga el PDF"""
+        """Navega a la URL del documento, descarga el PDF y lo mueve a ruta_destino
+
+        Espera a que aparezca el enlace de descarga y a que Chrome termine de
+        escribir el archivo. Devuelve la ruta del archivo descargado o False.
+        """
         try:
             print(f"Navegando a: {url_documento}")
-            self.driver.get(url_documento)
-            time.sleep(5)  # Esperar a que cargue
+            self._navegar(url_documento)
             
-            # Buscar enlaces de descarga
-            enlaces_descarga = self.driver.find_elements(By.CSS_SELECTOR, "a[href*='.pdf'], a[href*='download'], button.download-btn")
-            
-            if enlaces_descarga:
-                print(f"Se encontraron {len(enlaces_descarga)} enlaces de descarga.")
-                
-                # Hacer clic en el primer enlace de descarga
-                enlaces_descarga[0].click()
-                print("Se hizo clic en el enlace de descarga.")
-                
-                # Esperar a que se descargue
-                time.sleep(5)
-                
-                # Verificar si se descargó correctamente
-                # Nota: Esto depende de cómo se maneja la descarga en el sitio
-                return True
-            else:
+            # Esperar a que aparezcan los enlaces de descarga
+            try:
+                enlaces_descarga = self.wait.until(
+                    lambda driver: driver.find_elements(By.CSS_SELECTOR, SELECTOR_DESCARGA)
+                )
+            except TimeoutException:
                 print("No se encontraron enlaces de descarga.")
                 return False
             
+            print(f"Se encontraron {len(enlaces_descarga)} enlaces de descarga.")
+            
+            # Hacer clic en el primer enlace de descarga
+            previos = set(os.listdir(self.directorio_descargas))
+            enlaces_descarga[0].click()
+            print("Se hizo clic en el enlace de descarga.")
+            
+            # Esperar a que el archivo nuevo esté completo (sin .crdownload)
+            try:
+                descargado = WebDriverWait(self.driver, ESPERA_DESCARGA, poll_frequency=0.2).until(
+                    lambda _: descarga_completada(self.directorio_descargas, previos)
+                )
+            except TimeoutException:
+                print(f"× La descarga no terminó en {ESPERA_DESCARGA} s")
+                return False
+            
+            # Cada descarga sale de un directorio temporal vacío, así que Chrome
+            # nunca numera los nombres repetidos: se hace aquí al moverla
+            os.makedirs(ruta_destino, exist_ok=True)
+            destino = reservar_destino(ruta_destino, os.path.basename(descargado))
+            try:
+                shutil.move(descargado, destino)
+            except BaseException:
+                # El archivo reservado (vacío o a medio copiar) pasaría por un documento descargado
+                os.remove(destino)
+                raise
+            return destino
+            
         except Exception as e:
             print(f"Error al obtener documento: {e}")
             return False
@@ -132,3 +285,75 @@ class SICBrowser:
         """Cierra el navegador"""
         if self.driver:
             self.driver.quit()
+            self.driver = None
+
+
+class PoolNavegadores:
+    def __init__(self, tamano=1, headless=True, bloquear_recursos=True, limitador=None, estado=None):
+        """Pool de hasta tamano navegadores reutilizables para procesar documentos en paralelo
+
+        Los navegadores se crean a medida que se necesitan, cada uno con su
+        propio directorio de descargas, y se reutilizan entre documentos en
+        lugar de abrir Chrome para cada uno. Todos comparten el limitador de
+        tasa por host y, si se indica, el estado de sesión (sic_estado.EstadoSesion).
+        """
+        self.tamano = max(1, tamano)
+        self.headless = headless
+        self.bloquear_recursos = bloquear_recursos
+        self.limitador = limitador or LimitadorTasa()
+        self.estado = estado
+        self.libres = queue.Queue()
+        self.navegadores = []
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def navegador(self):
+        """Presta un navegador libre (o crea uno si aún no hay tamano) y lo devuelve al pool"""
+        try:
+            navegador = self.libres.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                crear = len(self.navegadores) < self.tamano
+                if crear:
+                    self.navegadores.append(None)
+            if crear:
+                try:
+                    navegador = SICBrowser(self.headless, bloquear_recursos=self.bloquear_recursos,
+                                           limitador=self.limitador, estado=self.estado)
+                except Exception:
+                    with self.lock:
+                        self.navegadores.remove(None)
+                    raise
+                with self.lock:
+                    self.navegadores[self.navegadores.index(None)] = navegador
+            else:
+                navegador = self.libres.get()
+        try:
+            yield navegador
+        finally:
+            self.libres.put(navegador)
+    
+    def buscar_documentos(self, terminos_busqueda):
+        with self.navegador() as navegador:
+            return navegador.buscar_documentos(terminos_busqueda)
+    
+    def obtener_documentos(self, enlaces, ruta_destino):
+        """Descarga cada enlace con el primer navegador libre; devuelve los resultados en el mismo orden"""
+        def obtener(enlace):
+            with self.navegador() as navegador:
+                return navegador.obtener_documento(enlace, ruta_destino)
+        
+        with ThreadPoolExecutor(max_workers=self.tamano) as executor:
+            return list(executor.map(obtener, enlaces))
+    
+    def cerrar(self):
+        """Guarda las cookies en el estado, cierra todos los navegadores y borra sus directorios temporales"""
+        for navegador in self.navegadores:
+            if navegador:
+                try:
+                    navegador.guardar_estado()
+                except Exception as e:
+                    print(f"⚠ No se pudo guardar el estado de sesión del navegador: {e}")
+                navegador.cerrar()
+                shutil.rmtree(navegador.directorio_descargas, ignore_errors=True)
+        self.navegadores = []
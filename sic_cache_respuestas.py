@@ -0,0 +1,146 @@
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+# Vigencia por defecto de una respuesta de búsqueda (segundos)
+TTL_RESPUESTAS = 3600
+
+# Tamaño máximo (comprimido) de la caché antes de desalojar las menos usadas
+MAX_BYTES_RESPUESTAS = 512 * 1024 * 1024
+
+
+def normalizar_cuerpo(cuerpo):
+    """Representación canónica del cuerpo de una consulta para usarla en la clave
+
+    Los diccionarios y listas se serializan con claves ordenadas y sin
+    espacios; en NDJSON (_msearch) se normaliza cada línea.
+    """
+    if isinstance(cuerpo, (dict, list)):
+        return json.dumps(cuerpo, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    lineas = []
+    for linea in (cuerpo or "").splitlines():
+        try:
+            lineas.append(normalizar_cuerpo(json.loads(linea)))
+        except ValueError:
+            lineas.append(linea.strip())
+    return "\n".join(lineas)
+
+
+class CacheRespuestas:
+    def __init__(self, ruta, ttl=TTL_RESPUESTAS, max_bytes=MAX_BYTES_RESPUESTAS):
+        """Caché en disco (SQLite) de respuestas de búsqueda indexada por (endpoint, cuerpo normalizado)
+
+        Una respuesta es fresca durante ttl segundos; pasada la vigencia se
+        revalida con If-None-Match / If-Modified-Since si el servidor envió
+        ETag o Last-Modified. Los cuerpos se guardan comprimidos y, al superar
+        max_bytes, se desalojan los menos usados recientemente.
+        """
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.aciertos = 0
+        self.revalidadas = 0
+        self.descargadas = 0
+
+        self.conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                contenido BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                guardado REAL NOT NULL,
+                usado REAL NOT NULL,
+                tamano INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_respuestas_usado ON respuestas (usado);
+        """)
+        self.conexion.commit()
+
+    @staticmethod
+    def clave(url, cuerpo):
+        return hashlib.sha256(f"{url}\n{normalizar_cuerpo(cuerpo)}".encode("utf-8")).hexdigest()
+
+    def obtener(self, clave, aceptar_vencida=False):
+        """Devuelve {"contenido", "etag", "last_modified", "fresca"} o None si no está en caché
+
+        Cuenta un acierto si la entrada se puede usar sin red: está fresca o
+        aceptar_vencida (modo offline).
+        """
+        with self.lock:
+            fila = self.conexion.execute(
+                "SELECT contenido, etag, last_modified, guardado FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if not fila:
+                return None
+            self.conexion.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (time.time(), clave))
+            self.conexion.commit()
+            contenido, etag, last_modified, guardado = fila
+            fresca = self.ttl is None or time.time() - guardado < self.ttl
+            if fresca or aceptar_vencida:
+                self.aciertos += 1
+        return {
+            "contenido": zlib.decompress(contenido),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresca": fresca
+        }
+
+    def cabeceras_revalidacion(self, entrada):
+        """Cabeceras condicionales para revalidar una entrada vencida"""
+        cabeceras = {}
+        if entrada and entrada["etag"]:
+            cabeceras["If-None-Match"] = entrada["etag"]
+        if entrada and entrada["last_modified"]:
+            cabeceras["If-Modified-Since"] = entrada["last_modified"]
+        return cabeceras
+
+    def guardar(self, clave, url, contenido, etag=None, last_modified=None):
+        """Guarda una respuesta y desaloja las menos usadas si se supera max_bytes"""
+        comprimido = zlib.compress(contenido, 6)
+        ahora = time.time()
+        with self.lock:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, url, contenido, etag, last_modified, guardado, usado, tamano) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (clave, url, comprimido, etag, last_modified, ahora, ahora, len(comprimido))
+            )
+            total = self.conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+            while total > self.max_bytes:
+                fila = self.conexion.execute(
+                    "SELECT clave, tamano FROM respuestas WHERE clave != ? ORDER BY usado LIMIT 1", (clave,)
+                ).fetchone()
+                if not fila:
+                    break
+                self.conexion.execute("DELETE FROM respuestas WHERE clave = ?", (fila[0],))
+                total -= fila[1]
+            self.conexion.commit()
+            self.descargadas += 1
+
+    def renovar(self, clave):
+        """Marca como fresca una entrada revalidada por el servidor (304)"""
+        with self.lock:
+            ahora = time.time()
+            self.conexion.execute("UPDATE respuestas SET guardado = ?, usado = ? WHERE clave = ?",
+                                  (ahora, ahora, clave))
+            self.conexion.commit()
+            self.revalidadas += 1
+
+    def estadisticas(self):
+        with self.lock:
+            entradas, ocupado = self.conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM respuestas"
+            ).fetchone()
+            return {"aciertos": self.aciertos, "revalidadas": self.revalidadas, "descargadas": self.descargadas,
+                    "entradas": entradas, "bytes": ocupado}
+
+    def cerrar(self):
+        """Cierra la conexión a la base de datos"""
+        with self.lock:
+            self.conexion.close()
@@ -0,0 +1,104 @@
+import time
+import sqlite3
+import calendar
+import threading
+import urllib.parse
+
+# Vigencia supuesta cuando la URL firmada no indica su expiración
+TTL_POR_DEFECTO = 900
+
+# Margen de seguridad: no se entregan URLs que caduquen en menos de esto
+MARGEN_EXPIRACION = 60
+
+
+def calcular_expiracion(url, ttl_por_defecto=TTL_POR_DEFECTO):
+    """Devuelve el instante (epoch) en que caduca una URL firmada de S3
+
+    Entiende firmas SigV4 (X-Amz-Date + X-Amz-Expires) y SigV2 (Expires en
+    epoch). Si la URL no trae ninguna de las dos se asume ttl_por_defecto.
+    """
+    params = {k.lower(): v for k, v in urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query)}
+
+    if "x-amz-date" in params and "x-amz-expires" in params:
+        try:
+            firmada = calendar.timegm(time.strptime(params["x-amz-date"], "%Y%m%dT%H%M%SZ"))
+            return firmada + int(params["x-amz-expires"])
+        except ValueError:
+            pass
+
+    if "expires" in params:
+        try:
+            return int(params["expires"])
+        except ValueError:
+            pass
+
+    return time.time() + ttl_por_defecto
+
+
+class CacheURLsFirmadas:
+    def __init__(self, ruta, max_entradas=10000, margen=MARGEN_EXPIRACION):
+        """Caché en SQLite de path_s3 -> URL firmada con expiración y desalojo LRU"""
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.margen = margen
+        self.lock = threading.Lock()
+
+        self.conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("""
+            CREATE TABLE IF NOT EXISTS urls_firmadas (
+                path_s3 TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                expira REAL NOT NULL,
+                ultimo_uso REAL NOT NULL
+            )
+        """)
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_uso ON urls_firmadas (ultimo_uso)")
+        self.conexion.commit()
+
+    def obtener(self, path_s3):
+        """Devuelve la URL firmada vigente para path_s3, o None si no hay o caducó"""
+        ahora = time.time()
+        with self.lock:
+            fila = self.conexion.execute(
+                "SELECT url, expira FROM urls_firmadas WHERE path_s3 = ?", (path_s3,)
+            ).fetchone()
+            if not fila:
+                return None
+
+            url, expira = fila
+            if expira - self.margen <= ahora:
+                self.conexion.execute("DELETE FROM urls_firmadas WHERE path_s3 = ?", (path_s3,))
+                self.conexion.commit()
+                return None
+
+            self.conexion.execute("UPDATE urls_firmadas SET ultimo_uso = ? WHERE path_s3 = ?", (ahora, path_s3))
+            self.conexion.commit()
+            return url
+
+    def invalidar(self, path_s3):
+        """Descarta la URL firmada de path_s3 (p. ej. porque S3 la rechazó antes de su expiración)"""
+        with self.lock:
+            self.conexion.execute("DELETE FROM urls_firmadas WHERE path_s3 = ?", (path_s3,))
+            self.conexion.commit()
+
+    def guardar(self, path_s3, url):
+        """Guarda una URL firmada y desaloja las entradas caducadas o menos usadas"""
+        ahora = time.time()
+        with self.lock:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO urls_firmadas (path_s3, url, expira, ultimo_uso) VALUES (?, ?, ?, ?)",
+                (path_s3, url, calcular_expiracion(url), ahora)
+            )
+            self.conexion.execute("DELETE FROM urls_firmadas WHERE expira <= ?", (ahora,))
+            self.conexion.execute("""
+                DELETE FROM urls_firmadas WHERE path_s3 IN (
+                    SELECT path_s3 FROM urls_firmadas ORDER BY ultimo_uso DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entradas,))
+            self.conexion.commit()
+
+    def cerrar(self):
+        """Cierra la conexión a la base de datos"""
+        with self.lock:
+            self.conexion.close()
@@ -3,59 +3,447 @@ import json
 import os
 import time
 import re
-from bs4 import BeautifulSoup
 import urllib.parse
-import random
+import hashlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from sic_limitador import LimitadorTasa
+from sic_http import crear_sesion, desconectar_sesion, preparar_al_primer_uso
+from sic_cache_urls import CacheURLsFirmadas
+from sic_manifiesto import ManifiestoTrabajo
+from sic_almacen import AlmacenContenido
+from sic_planificador import PlanificadorFuentes
+from sic_estrategias import SelectorEstrategias, es_bloqueo
+from sic_estado import EstadoSesion
+from sic_metricas import MetricasHTTP
+from sic_extractor import extraer_enlaces
+from sic_indice_local import IndiceLocal
+from sic_texto import ExtractorTexto
+from sic_exportar import ExportadorColumnar
+from sic_cache_respuestas import CacheRespuestas, TTL_RESPUESTAS, MAX_BYTES_RESPUESTAS
+
+
+# Campos de _source que consume obtener_ids_documentos (modo solo metadatos)
+CAMPOS_METADATOS = [
+    "informacion.ano_expediente",
+    "informacion.numero_expediente",
+    "informacion.tipo_providencia",
+    "informacion.fecha_providencia",
+    "partes.nombre",
+    "archivos.tipo_archivo",
+    "archivos.path_s3",
+    "tesauro.categoria.nombre",
+    "tesauro.descriptor.nombre",
+    "documento_resumen.transcripcion"
+]
+
+# Tamaño de bloque por defecto al escribir descargas (1 MiB)
+TAMANO_BLOQUE = 1024 * 1024
+
+# Campo de fecha con el que el modo sync filtra los documentos nuevos
+CAMPO_FECHA = "informacion.fecha_providencia"
+
+# Orden estable para paginar con search_after. Elasticsearch 8 no deja ordenar
+# por _id (sin fielddata), así que se desempata por fecha y por el subcampo
+# keyword (con doc values) del número de expediente
+CAMPO_DESEMPATE = "informacion.numero_expediente.keyword"
+ORDEN_PAGINACION = [{"_score": "desc"}, {CAMPO_FECHA: "desc"}, {CAMPO_DESEMPATE: "asc"}]
+
+# Elasticsearch rechaza from + size por encima de index.max_result_window
+MAX_VENTANA_RESULTADOS = 10000
+
+# Documentos por solicitud en el modo por lista (_mget por IDs, _msearch por expediente)
+LOTE_IDS = 200
+LOTE_EXPEDIENTES = 50
+
+# Providencias que se piden como máximo por cada expediente de la lista
+MAX_POR_EXPEDIENTE = 100
+
+# Endpoints de la SIC
+URL_SIC = "https://relatoria.sic.gov.co/"
+URL_INDICE = URL_SIC + "sic-relatoria-idx"
+URL_BUSQUEDA = URL_INDICE + "/_search"
+URL_MGET = URL_INDICE + "/_mget"
+URL_MSEARCH = URL_INDICE + "/_msearch"
+URL_API_BUSQUEDA = URL_SIC + "api/v1/busqueda"
+URL_VISOR = "https://gestor.relatoria.sic.gov.co/visor-relatorias"
+URL_FIRMA_S3 = "https://m0s03uyzg3.execute-api.us-east-1.amazonaws.com/prod/get-signed-url/"
+
+def leer_lista_documentos(ruta):
+    """Lee un archivo con un documento por línea y devuelve (ids, expedientes)
+
+    Cada línea es un ID de documento del índice o un par año/número de
+    expediente separado por coma, punto y coma, tabulador o espacios
+    ("2020,12345"). Se ignoran las líneas vacías y las que empiezan por #.
+    """
+    ids = []
+    expedientes = []
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea or linea.startswith("#"):
+                continue
+            partes = [parte for parte in re.split(r"[,;\t ]+", linea) if parte]
+            if len(partes) == 2:
+                expedientes.append((partes[0], partes[1]))
+            else:
+                ids.append(linea)
+    return ids, expedientes
+
+
+def leer_consultas(ruta):
+    """Lee un archivo con una búsqueda por línea (se ignoran vacías, repetidas y comentarios con #)"""
+    consultas = []
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea and not linea.startswith("#") and linea not in consultas:
+                consultas.append(linea)
+    return consultas
+
+
+def nombre_base_documento(doc):
+    """Nombre base de los archivos de un documento: año_numero_tipo"""
+    return f"{doc['año']}_{doc['numero']}_{doc['tipo_providencia']}"
+
+
+def nombre_base_reservado(manifiesto, doc):
+    """nombre_base_documento reservado en el manifiesto para el documento
+
+    Varios documentos pueden compartir año, número y tipo de providencia. El
+    primero que lo reserva se queda con el nombre; los demás llevan además su
+    ID, así no se pisan sus archivos ni, con varios workers, sus .part.
+    """
+    base = nombre_base_documento(doc)
+    if manifiesto.reservar_nombre(base, doc["id"]) == doc["id"]:
+        return base
+    return f"{base}_{doc['id']}"
+
+
+def nombre_archivo_s3(directorio, base_nombre, tipo_archivo, path_s3):
+    """Ruta local para un archivo de S3"""
+    # Determinar extensión
+    extension = "pdf"  # Por defecto PDF
+    if path_s3.lower().endswith(".docx"):
+        extension = "docx"
+    elif path_s3.lower().endswith(".doc"):
+        extension = "doc"
+    return os.path.join(directorio, f"{base_nombre}_{tipo_archivo.replace(' ', '_')}.{extension}")
+
+
+def nombre_archivo_visor(directorio, base_nombre, tipo, j, enlace):
+    """Ruta local para el j-ésimo enlace encontrado en el visor para un tipo de archivo"""
+    # Determinar tipo de archivo
+    extension = "pdf"  # Por defecto PDF
+    if enlace.lower().endswith(".docx"):
+        extension = "docx"
+    elif enlace.lower().endswith(".doc"):
+        extension = "doc"
+    elif enlace.lower().endswith(".xlsx"):
+        extension = "xlsx"
+    elif enlace.lower().endswith(".xls"):
+        extension = "xls"
+    return os.path.join(directorio, f"{base_nombre}_{tipo.replace(' ', '_')}_{j}.{extension}")
+
+
+class PaginacionIndice:
+    def __init__(self, terminos_busqueda, tamano_pagina=100, max_documentos=None, solo_metadatos=True,
+                 desde_fecha=None, usar_cursor=True):
+        """Estado de la paginación de una búsqueda en el índice, sin acceso a la red
+
+        Construye cada consulta (search_after o from/size hasta
+        MAX_VENTANA_RESULTADOS), convierte los aciertos en documentos y decide
+        cuándo termina. SICDownloader.iter_documentos y
+        SICDownloaderAsync.iter_documentos solo envían las consultas.
+        completa indica al terminar si se recorrieron todos los resultados.
+        """
+        self.terminos_busqueda = terminos_busqueda
+        self.tamano_pagina = tamano_pagina
+        self.max_documentos = max_documentos
+        self.solo_metadatos = solo_metadatos
+        self.desde_fecha = desde_fecha
+        self.usar_cursor = usar_cursor
+        self.entregados = 0
+        self.pedidos = 0
+        self.desde = 0
+        self.hits = []
+        self.completa = False
+
+    def _consulta(self, **kwargs):
+        return SICDownloader._construir_consulta(self.terminos_busqueda, self.pedidos,
+                                                 solo_metadatos=self.solo_metadatos,
+                                                 desde_fecha=self.desde_fecha, **kwargs)
+
+    def _restante(self):
+        if self.max_documentos:
+            return min(self.tamano_pagina, self.max_documentos - self.entregados)
+        return self.tamano_pagina
+
+    def primera_consulta(self):
+        """Consulta de la primera página (con cursor si usar_cursor)"""
+        self.pedidos = self._restante()
+        if self.usar_cursor:
+            return self._consulta(search_after=[])
+        return self._consulta(from_index=0)
+
+    def sin_cursor(self):
+        """Pasa a from/size (el índice no aceptó search_after) y devuelve de nuevo la primera consulta"""
+        self.usar_cursor = False
+        return self.primera_consulta()
+
+    def documentos(self, resultados):
+        """Documentos de una página de resultados"""
+        self.hits = resultados.get("hits", {}).get("hits", [])
+        documentos = SICDownloader.obtener_ids_documentos(resultados)
+        self.entregados += len(documentos)
+        return documentos
+
+    def siguiente_consulta(self):
+        """Consulta de la página siguiente, o None si la búsqueda terminó"""
+        # Una página incompleta es la última
+        if len(self.hits) < self.pedidos:
+            self.completa = True
+            return None
+        if self.max_documentos and self.entregados >= self.max_documentos:
+            return None
+        
+        self.pedidos = self._restante()
+        if self.usar_cursor:
+            return self._consulta(search_after=self.hits[-1]["sort"])
+        self.desde += len(self.hits)
+        if self.desde + self.pedidos > MAX_VENTANA_RESULTADOS:
+            print(f"⚠ Se alcanzó el límite de {MAX_VENTANA_RESULTADOS} resultados para from/size")
+            return None
+        return self._consulta(from_index=self.desde)
+
+
+class DescargaParcial:
+    def __init__(self, nombre_archivo, chunk_size=TAMANO_BLOQUE, almacen=None, clave=None):
+        """Escritura de una descarga en nombre_archivo + ".part", sin acceso a la red
+
+        El archivo solo recibe su nombre final cuando el tamaño coincide con
+        Content-Range o Content-Length, de modo que un archivo con el nombre
+        final siempre está completo. Si quedó un .part de un intento anterior
+        se pide el resto con Range. Con almacén, clave identifica el origen y
+        el contenido se guarda como blob (ver sic_almacen).
+        SICDownloader._descargar y SICDownloaderAsync._descargar envían la
+        solicitud y pasan aquí la respuesta y los bloques del cuerpo.
+        """
+        self.nombre_archivo = nombre_archivo
+        self.parcial = nombre_archivo + ".part"
+        self.chunk_size = chunk_size
+        self.almacen = almacen
+        self.clave = clave
+        self.clave_etag = None
+        self.inicio = os.path.getsize(self.parcial) if os.path.exists(self.parcial) else 0
+        self.esperado = None
+        self.total_bytes = 0
+        self.sha256 = None
+
+    def existente(self):
+        """{"bytes", "sha256"} si el archivo ya está en disco o en el almacén, o None
+
+        Un archivo que ya existe no se vuelve a leer y su sha256 queda en None.
+        """
+        if os.path.exists(self.nombre_archivo):
+            print(f"El archivo ya existe: {self.nombre_archivo}")
+            return {"bytes": os.path.getsize(self.nombre_archivo), "sha256": None}
+        if self.almacen:
+            info = self.almacen.recuperar(self.clave, self.nombre_archivo)
+            if info:
+                print(f"✓ Contenido ya almacenado, enlazado: {self.nombre_archivo}")
+                return info
+        return None
+
+    def cabeceras(self):
+        """Cabeceras de la solicitud, con Range si hay un .part que continuar"""
+        headers = {"Accept": "*/*"}
+        if self.inicio:
+            headers["Range"] = f"bytes={self.inicio}-"
+        return headers
+
+    def rango_rechazado(self, status_code):
+        """Con un 416 el .part no encaja con el recurso actual: se borra para empezar de cero"""
+        if self.inicio and status_code == 416:
+            os.remove(self.parcial)
+            return True
+        return False
+
+    def enlazar_por_etag(self, url, response):
+        """Si el ETag corresponde a un blob conocido lo enlaza sin leer el cuerpo y devuelve su info"""
+        if not self.almacen:
+            return None
+        self.clave_etag = self.almacen.clave_etag(url, response.headers.get("ETag"))
+        info = self.almacen.recuperar(self.clave_etag, self.nombre_archivo)
+        if not info:
+            return None
+        if os.path.exists(self.parcial):
+            # El .part de un intento anterior ya no hace falta
+            os.remove(self.parcial)
+        self.almacen.guardar_referencias(info["sha256"], [self.clave])
+        print(f"✓ Contenido ya almacenado (ETag), enlazado: {self.nombre_archivo}")
+        return info
+
+    def abrir(self, response):
+        """Abre el .part para escribir el cuerpo: lo continúa con un 206 y si no lo reemplaza"""
+        self.sha256 = hashlib.sha256()
+        if self.inicio and response.status_code == 206:
+            modo = 'ab'
+            with open(self.parcial, 'rb') as f:
+                for bloque in iter(lambda: f.read(self.chunk_size), b""):
+                    self.sha256.update(bloque)
+        else:
+            # El servidor ignoró el Range: se descarga completo
+            modo = 'wb'
+            self.inicio = 0
+        self.esperado = SICDownloader._tamano_esperado(response, self.inicio)
+        self.total_bytes = self.inicio
+        return open(self.parcial, modo)
+
+    def escribir(self, archivo, chunk):
+        """Escribe un bloque calculando el checksum al vuelo"""
+        archivo.write(chunk)
+        self.sha256.update(chunk)
+        self.total_bytes += len(chunk)
+
+    def terminar(self):
+        """Da al archivo su nombre final y devuelve {"bytes", "sha256"}, o None si quedó incompleto"""
+        if self.esperado is not None and self.total_bytes != self.esperado:
+            print(f"× Descarga incompleta ({self.total_bytes} de {self.esperado} bytes): {self.nombre_archivo}")
+            return None
+        
+        sha256 = self.sha256.hexdigest()
+        if self.almacen:
+            self.almacen.guardar(self.parcial, sha256, [self.clave, self.clave_etag])
+            self.almacen.enlazar(sha256, self.nombre_archivo)
+        else:
+            os.replace(self.parcial, self.nombre_archivo)
+        print(f"✓ Documento descargado: {self.nombre_archivo}")
+        return {"bytes": self.total_bytes, "sha256": sha256}
+
 
 class SICDownloader:
-    def __init__(self, output_dir="documentos_sic"):
-        """Inicializa el descargador de documentos SIC"""
+    def __init__(self, output_dir="documentos_sic", workers=1, limitador=None, cache_urls=None, manifiesto=None,
+                 chunk_size=TAMANO_BLOQUE, almacen=None, planificar=True, parser_html=None, session=None,
+                 indice=None, extractor=None, exportador=None, cache_respuestas=None, offline=False,
+                 estrategias=None, metricas=None, estado=None):
+        """Inicializa el descargador de documentos SIC
+
+        workers indica cuántos documentos se procesan en paralelo; con 1 se
+        conserva el recorrido secuencial original. Todas las solicitudes pasan
+        por un limitador de tasa por host (ver sic_limitador). Las URLs firmadas
+        de S3 se guardan en cache_urls (por defecto una base SQLite en output_dir)
+        y el avance de cada documento y archivo en manifiesto (ver sic_manifiesto).
+        chunk_size es el tamaño de bloque con el que se leen y escriben las descargas.
+        Si se pasa un almacen (sic_almacen.AlmacenContenido) los archivos se
+        guardan deduplicados por contenido. Con planificar, un planificador
+        decide por documento qué fuentes probar (S3 primero y el visor solo
+        para lo que falte); con planificar=False se prueban siempre todas.
+        parser_html elige el backend de sic_extractor para las páginas del
+        visor (por defecto el más rápido instalado). session permite compartir
+        una sesión de sic_http.crear_sesion con otros componentes. Con indice
+        (sic_indice_local.IndiceLocal) cada documento se indexa en cuanto
+        terminan sus descargas. Con extractor (sic_texto.ExtractorTexto) cada
+        archivo descargado pasa a un pool de procesos que extrae su texto
+        mientras siguen las descargas. Con exportador
+        (sic_exportar.ExportadorColumnar) los metadatos de cada documento
+        encontrado se añaden a un dataset Parquet particionado. Con
+        cache_respuestas (sic_cache_respuestas.CacheRespuestas) las búsquedas
+        por POST (_search, _mget, _msearch) se sirven desde disco mientras
+        estén frescas y se revalidan al vencer. Con offline no se accede a la
+        red: las búsquedas salen solo de la caché (aunque estén vencidas), no
+        se firma ni se descarga nada y no se guardan resultados en el
+        planificador, el manifiesto ni las estrategias. estrategias
+        (sic_estrategias.SelectorEstrategias) recuerda qué método de búsqueda
+        funciona. Con metricas (sic_metricas.MetricasHTTP) cada solicitud de
+        la sesión queda registrada por fase y el resumen incluye latencias y
+        rendimiento. estado (sic_estado.EstadoSesion, por defecto
+        .estado_sesion.json en output_dir) guarda cookies, User-Agent y
+        métodos de búsqueda para compartirlos con otras ejecuciones y con
+        procesos que trabajen a la vez. La visita inicial a la página
+        principal se hace con la primera solicitud y no al crear el
+        descargador; si el estado tiene cookies vigentes se reutilizan y la
+        visita se omite.
+        """
         self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.almacen = almacen
+        self.indice = indice
+        self.extractor = extractor
+        self.exportador = exportador
+        self.offline = offline
+        if offline and cache_respuestas is None:
+            cache_respuestas = CacheRespuestas(os.path.join(output_dir, ".cache_respuestas.sqlite"))
+        self.cache_respuestas = cache_respuestas
+        self.parser_html = parser_html
+        self.planificador = None
+        if planificar:
+            self.planificador = PlanificadorFuentes(os.path.join(output_dir, ".planificador.json"))
+        self.limitador = limitador or LimitadorTasa()
         os.makedirs(output_dir, exist_ok=True)
+        self.estado = estado or EstadoSesion(os.path.join(output_dir, ".estado_sesion.json"))
+        self.estrategias = estrategias or SelectorEstrategias(estado=self.estado)
+        self.cache_urls = cache_urls or CacheURLsFirmadas(os.path.join(output_dir, ".cache_urls.sqlite"))
+        self.manifiesto = manifiesto or ManifiestoTrabajo(os.path.join(output_dir, ".manifiesto.sqlite"))
         
-        # Lista de User-Agents comunes para simular diferentes navegadores
-        user_agents = [
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:127.0) Gecko/20100101 Firefox/127.0",
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15"
-        ]
-        
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": random.choice(user_agents),
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
-            "Referer": "https://relatoria.sic.gov.co/",
-            "Origin": "https://relatoria.sic.gov.co",
-            "Sec-Fetch-Dest": "empty",
-            "Sec-Fetch-Mode": "cors",
-            "Sec-Fetch-Site": "same-origin",
-            "Connection": "keep-alive"
-        })
+        # Limitador por host, reintentos y pools de conexiones al menos tan grandes como workers
+        # (ver sic_http). Se puede pasar una sesión ya creada para compartirla.
+        self.session = session or crear_sesion(self.limitador, workers=self.workers)
+        self.tiempo_inicializacion = None
+        self.cookies_reutilizadas = False
+        # Lotes de buscar_por_ids / buscar_por_expedientes que no se pudieron obtener
+        self.lotes_fallidos = 0
+        # URLs cuya descarga respondió 4xx (ver _descarga_rechazada)
+        self.urls_rechazadas = set()
+        # Código HTTP del último método de búsqueda que falló (None si fue un error de conexión)
+        self.codigo_busqueda = None
+        # El índice respondió 400 a la consulta con search_after: el resto de la sesión usa from/size
+        self.cursor_rechazado = False
+        self.metricas = metricas
+        if metricas:
+            metricas.limitador = metricas.limitador or self.limitador
+            metricas.instalar(self.session)
+        if offline:
+            desconectar_sesion(self.session)
+            print("Modo offline: las búsquedas se sirven solo desde la caché de respuestas")
+            return
         
-        # Inicializar cookies visitando primero la página principal
-        self._inicializar_sesion()
+        # Mismo User-Agent y cookies que la última ejecución (o que otro proceso en marcha):
+        # con cookies vigentes no hace falta visitar la página principal
+        if self.estado.aplicar_a_sesion(self.session):
+            self.cookies_reutilizadas = True
+            print("✓ Sesión reanudada con las cookies guardadas")
+            return
+        
+        # Inicializar cookies visitando primero la página principal, justo antes de la primera solicitud
+        preparar_al_primer_uso(self.session, self._inicializar_sesion)
     
     def _inicializar_sesion(self):
-        """Visita la página principal para obtener cookies iniciales"""
+        """Visita la página principal para obtener cookies iniciales y las comparte en el estado de sesión"""
         try:
             print("Inicializando sesión con la SIC...")
-            response = self.session.get("https://relatoria.sic.gov.co/")
+            inicio = time.perf_counter()
+            response = self.session.get(URL_SIC)
+            self.tiempo_inicializacion = time.perf_counter() - inicio
             if response.status_code == 200:
-                print("✓ Sesión inicializada correctamente")
+                print(f"✓ Sesión inicializada correctamente ({self.tiempo_inicializacion * 1000:.0f} ms)")
+                self.estado.guardar_de_sesion(self.session)
             else:
                 print(f"× Error al inicializar sesión: {response.status_code}")
         except Exception as e:
             print(f"× Error al inicializar sesión: {e}")
 
-    def buscar_documentos(self, terminos_busqueda, size=20, from_index=0):
-        """Realiza una búsqueda en el índice de relatorías"""
-        print(f"Buscando documentos para: '{terminos_busqueda}'")
-        
-        # Base URL para la búsqueda
-        base_url = "https://relatoria.sic.gov.co/sic-relatoria-idx/_search"
-        
+    @staticmethod
+    def _construir_consulta(terminos_busqueda, size=20, from_index=0, search_after=None,
+                            solo_metadatos=False, resaltar=None, desde_fecha=None):
+        """Construye la consulta de Elasticsearch para los términos dados
+
+        Con search_after se pagina por cursor (orden estable de ORDEN_PAGINACION)
+        en lugar de usar from/size. Con solo_metadatos el _source se limita a
+        CAMPOS_METADATOS y no se piden resaltados salvo que resaltar sea True.
+        Con desde_fecha solo se piden documentos con CAMPO_FECHA >= desde_fecha.
+        """
         # Construir la consulta (version simple para evitar errores de encoding)
         query = {
             "query": {
@@ -128,92 +516,149 @@ class SICDownloader:
             }
         }
         
-        # Primer intento: enviar la consulta como JSON en el cuerpo de la solicitud
-        try:
-            headers = self.session.headers.copy()
-            headers.update({
-                "Content-Type": "application/json"
-            })
-            
-            # Enfoque 1: Usar POST con cuerpo JSON
-            response = self.session.post(
-                "https://relatoria.sic.gov.co/sic-relatoria-idx/_search",
-                json=query,
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                print("✓ Búsqueda exitosa (método POST)")
-                return response.json()
-            else:
-                print(f"× Error en búsqueda POST: {response.status_code}")
-            
-            # Enfoque 2: Usar GET con parámetros en URL
-            params = {
-                "source": json.dumps(query),
-                "source_content_type": "application/json"
-            }
-            
-            response = self.session.get(base_url, params=params, headers=headers)
-            
-            if response.status_code == 200:
-                print("✓ Búsqueda exitosa (método GET)")
-                return response.json()
-            else:
-                print(f"× Error en búsqueda GET: {response.status_code}")
-                
-            # Enfoque 3: Usar la forma que vimos en el navegador
-            print("Intentando método alternativo de búsqueda...")
-            
-            # Esta URL simula exactamente lo que vimos en los logs del navegador
-            search_url = f"https://relatoria.sic.gov.co/#/results?q={urllib.parse.quote(terminos_busqueda)}"
-            
-            # Primero visitamos la página de resultados para obtener posibles tokens
-            response = self.session.get(search_url)
-            if response.status_code == 200:
-                print("✓ Visita a página de resultados exitosa")
-                
-                # Esperar brevemente para simular comportamiento humano
-                time.sleep(2)
-                
-                # Ahora intentamos la búsqueda en la API como lo haría el navegador
-                api_url = "https://relatoria.sic.gov.co/api/v1/busqueda"
-                api_payload = {
-                    "terminos": terminos_busqueda,
-                    "pagina": 1,
-                    "resultados_pagina": size
-                }
-                
-                api_response = self.session.post(api_url, json=api_payload)
-                if api_response.status_code == 200:
-                    print("✓ Búsqueda exitosa (API alternativa)")
-                    return api_response.json()
-                else:
-                    print(f"× Error en API alternativa: {api_response.status_code}")
-            
-            print("⚠ Todos los métodos de búsqueda fallaron. Intentando simulación de navegador...")
-            return self._buscar_con_simulacion(terminos_busqueda, size)
-            
-        except Exception as e:
-            print(f"× Error en la búsqueda: {e}")
+        if desde_fecha:
+            query["query"]["bool"]["filter"].append({"range": {CAMPO_FECHA: {"gte": desde_fecha}}})
+        
+        if resaltar is None:
+            resaltar = not solo_metadatos
+        if solo_metadatos:
+            query["_source"] = {"includes": CAMPOS_METADATOS}
+        if not resaltar:
+            del query["highlight"]
+        
+        if search_after is not None:
+            query["sort"] = ORDEN_PAGINACION
+            del query["from"]
+            if search_after:
+                query["search_after"] = search_after
+        
+        return query
+
+    def buscar_documentos(self, terminos_busqueda, size=20, from_index=0, solo_metadatos=False, resaltar=None,
+                          desde_fecha=None):
+        """Realiza una búsqueda en el índice de relatorías
+
+        Prueba los métodos de búsqueda (POST, GET, API alternativa y
+        simulación de navegador) en el orden que propone el selector de
+        estrategias: primero el que funcionó la última vez y sin repetir los
+        que vienen fallando (ver sic_estrategias).
+        """
+        print(f"Buscando documentos para: '{terminos_busqueda}'")
+        
+        query = self._construir_consulta(terminos_busqueda, size, from_index,
+                                         solo_metadatos=solo_metadatos, resaltar=resaltar, desde_fecha=desde_fecha)
+        metodos = {
+            "post": lambda: self._buscar_post(query),
+            "get": lambda: self._buscar_get(query),
+            "api": lambda: self._buscar_api_alternativa(terminos_busqueda, size),
+            "simulacion": lambda: self._buscar_con_simulacion(terminos_busqueda, size),
+        }
+        
+        probadas = []
+        for estrategia in self.estrategias.orden():
+            if estrategia == "simulacion" and probadas:
+                print("⚠ Todos los métodos de búsqueda fallaron. Intentando simulación de navegador...")
+            probadas.append(estrategia)
+            self.codigo_busqueda = None
+            try:
+                resultados = metodos[estrategia]()
+                bloqueo = es_bloqueo(self.codigo_busqueda)
+            except Exception as e:
+                print(f"× Error en la búsqueda ({estrategia}): {e}")
+                resultados = None
+                # Un JSON ilegible (JSONDecodeError es también RequestException) no es un rechazo
+                bloqueo = isinstance(e, requests.exceptions.RequestException) and not isinstance(e, ValueError)
+            # Solo los rechazos del servidor (403/405/429/5xx, conexión) cuentan contra el método
+            self.estrategias.registrar(estrategia, resultados is not None, bloqueo)
+            if resultados is not None:
+                self.estrategias.contabilizar(probadas, estrategia)
+                return resultados
+        
+        self.estrategias.contabilizar(probadas)
+        return None
+    
+    def _buscar_post(self, query):
+        """Enfoque 1: POST con la consulta como JSON en el cuerpo (pasa por la caché de respuestas)"""
+        headers = self.session.headers.copy()
+        headers.update({
+            "Content-Type": "application/json"
+        })
+        status_code, datos = self._post_busqueda(URL_BUSQUEDA, headers, consulta=query)
+        self.codigo_busqueda = status_code
+        if status_code == 200:
+            print("✓ Búsqueda exitosa (método POST)")
+            return datos
+        print(f"× Error en búsqueda POST: {status_code}")
+        return None
+    
+    def _buscar_get(self, query):
+        """Enfoque 2: GET con la consulta en los parámetros de la URL"""
+        headers = self.session.headers.copy()
+        headers.update({
+            "Content-Type": "application/json"
+        })
+        params = {
+            "source": json.dumps(query),
+            "source_content_type": "application/json"
+        }
+        
+        response = self.session.get(URL_BUSQUEDA, params=params, headers=headers)
+        self.codigo_busqueda = response.status_code
+        
+        if response.status_code == 200:
+            print("✓ Búsqueda exitosa (método GET)")
+            return response.json()
+        print(f"× Error en búsqueda GET: {response.status_code}")
+        return None
+    
+    def _buscar_api_alternativa(self, terminos_busqueda, size=20):
+        """Enfoque 3: la forma que vimos en el navegador (página de resultados y API de búsqueda)"""
+        print("Intentando método alternativo de búsqueda...")
+        
+        # Esta URL simula exactamente lo que vimos en los logs del navegador
+        search_url = f"{URL_SIC}#/results?q={urllib.parse.quote(terminos_busqueda)}"
+        
+        # Primero visitamos la página de resultados para obtener posibles tokens
+        response = self.session.get(search_url)
+        self.codigo_busqueda = response.status_code
+        if response.status_code != 200:
+            print(f"× Error al visitar la página de resultados: {response.status_code}")
             return None
+        print("✓ Visita a página de resultados exitosa")
+        
+        # Ahora intentamos la búsqueda en la API como lo haría el navegador
+        api_url = URL_API_BUSQUEDA
+        api_payload = {
+            "terminos": terminos_busqueda,
+            "pagina": 1,
+            "resultados_pagina": size
+        }
+        
+        api_response = self.session.post(api_url, json=api_payload)
+        self.codigo_busqueda = api_response.status_code
+        if api_response.status_code == 200:
+            print("✓ Búsqueda exitosa (API alternativa)")
+            return api_response.json()
+        print(f"× Error en API alternativa: {api_response.status_code}")
+        return None
     
     def _buscar_con_simulacion(self, terminos_busqueda, size=20):
         """Simula la navegación manual para extraer resultados"""
         try:
-            # Visitar la página principal primero
-            self.session.get("https://relatoria.sic.gov.co/")
-            time.sleep(1)
+            # Visitar la página principal primero (el ritmo lo marca el limitador de tasa)
+            self.session.get(URL_SIC)
             
             # Visitar la página de resultados
-            url_resultados = f"https://relatoria.sic.gov.co/#/results?q={urllib.parse.quote(terminos_busqueda)}"
+            url_resultados = f"{URL_SIC}#/results?q={urllib.parse.quote(terminos_busqueda)}"
             response = self.session.get(url_resultados)
+            self.codigo_busqueda = response.status_code
             
             if response.status_code != 200:
                 print(f"× Error al acceder a página de resultados: {response.status_code}")
                 return None
             
-            # Extraer resultados del HTML
+            # Extraer resultados del HTML (bs4 solo se importa si se llega a este recurso)
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(response.text, 'html.parser')
             
             # Buscar script que contenga los datos de resultados
@@ -240,9 +685,249 @@ class SICDownloader:
             
         except Exception as e:
             print(f"× Error en simulación de navegador: {e}")
+            if not isinstance(e, requests.exceptions.RequestException) or isinstance(e, ValueError):
+                # El fallo es del análisis de la página, no un rechazo del servidor
+                self.codigo_busqueda = 200
             return None
 
-    def obtener_ids_documentos(self, resultados):
+    def _post_busqueda(self, url, headers, consulta=None, datos=None):
+        """POST de búsqueda (consulta JSON o datos NDJSON) que devuelve (status_code, JSON)
+
+        Sin caché de respuestas es una solicitud normal. Con caché, una
+        respuesta fresca se devuelve sin red; una vencida se revalida con
+        If-None-Match / If-Modified-Since y un 304 la renueva. En modo offline
+        se devuelve lo que haya en caché y 504 si no hay nada, como hace
+        Cache-Control: only-if-cached.
+        """
+        cache = self.cache_respuestas
+        if cache is None:
+            response = self.session.post(url, json=consulta, data=datos, headers=headers)
+            return response.status_code, response.json() if response.status_code == 200 else None
+        
+        clave = cache.clave(url, consulta if consulta is not None else datos)
+        entrada = cache.obtener(clave, aceptar_vencida=self.offline)
+        if entrada and (entrada["fresca"] or self.offline):
+            return 200, json.loads(entrada["contenido"])
+        if self.offline:
+            print(f"× Sin respuesta en caché para {url.rsplit('/', 1)[-1]} (modo offline)")
+            return 504, None
+        
+        headers = dict(headers, **cache.cabeceras_revalidacion(entrada))
+        response = self.session.post(url, json=consulta, data=datos, headers=headers)
+        if response.status_code == 304 and entrada:
+            cache.renovar(clave)
+            return 200, json.loads(entrada["contenido"])
+        if response.status_code != 200:
+            return response.status_code, None
+        resultados = response.json()
+        cache.guardar(clave, url, response.content, response.headers.get("ETag"),
+                      response.headers.get("Last-Modified"))
+        return 200, resultados
+
+    def _consultar_indice(self, query):
+        """Envía una consulta por POST al índice y devuelve el JSON, o None si falla"""
+        headers = self.session.headers.copy()
+        headers.update({
+            "Content-Type": "application/json"
+        })
+        self.codigo_busqueda = None
+        try:
+            status_code, datos = self._post_busqueda(URL_BUSQUEDA, headers, consulta=query)
+            self.codigo_busqueda = status_code
+            if status_code == 200:
+                return datos
+            print(f"× Error en búsqueda paginada: {status_code}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"× Error en búsqueda paginada: {e}")
+            if isinstance(e, ValueError):
+                # Respuesta sin JSON válido: no es un rechazo del servidor
+                self.codigo_busqueda = 200
+        return None
+
+    def iter_documentos(self, terminos_busqueda, tamano_pagina=100, max_documentos=None, solo_metadatos=True,
+                        desde_fecha=None):
+        """Recorre todas las páginas de resultados y produce los documentos uno a uno
+
+        Usa search_after cuando el índice lo admite y from/size en caso
+        contrario (hasta MAX_VENTANA_RESULTADOS). Si la consulta directa al
+        índice falla se recurre a buscar_documentos, que solo devuelve una
+        página. El total de aciertos queda en self.total_resultados.
+        Por defecto solo se piden los metadatos que usa el descargador.
+        desde_fecha limita la búsqueda a documentos de esa fecha o posteriores.
+        self.paginacion_completa indica al terminar si se recorrieron todos los
+        resultados (no hubo corte por max_documentos, límite ni error).
+        """
+        print(f"Buscando documentos para: '{terminos_busqueda}' (paginado)")
+        self.total_resultados = 0
+        self.paginacion_completa = False
+        pagina = PaginacionIndice(terminos_busqueda, tamano_pagina, max_documentos, solo_metadatos, desde_fecha,
+                                  usar_cursor=not self.cursor_rechazado)
+        
+        # Primera página: probar con cursor y, si el índice no lo acepta, con from/size
+        # (si el POST al índice viene fallando, el selector de estrategias lo salta)
+        resultados = None
+        if self.estrategias.disponible("post"):
+            if pagina.usar_cursor:
+                resultados = self._consultar_indice(pagina.primera_consulta())
+                if resultados is None and self.codigo_busqueda == 400:
+                    print("⚠ El índice no acepta el orden de search_after; se pagina con from/size en esta sesión")
+                    self.cursor_rechazado = True
+            if resultados is None or not self._hits_con_orden(resultados):
+                resultados = self._consultar_indice(pagina.sin_cursor())
+            self.estrategias.registrar("post", resultados is not None, es_bloqueo(self.codigo_busqueda))
+        else:
+            self.estrategias.omitir("post", 2)
+        
+        if resultados is None:
+            # Sin acceso directo al índice: una sola página por los métodos alternativos
+            resultados = self.buscar_documentos(terminos_busqueda, solo_metadatos=solo_metadatos,
+                                                desde_fecha=desde_fecha)
+            documentos = self.obtener_ids_documentos(resultados)
+            self.total_resultados = len(documentos)
+            if max_documentos:
+                documentos = documentos[:max_documentos]
+            yield from documentos
+            return
+        
+        self.total_resultados = self._total_hits(resultados)
+        print(f"✓ Búsqueda exitosa ({self.total_resultados} resultados, "
+              f"paginación {'search_after' if pagina.usar_cursor else 'from/size'})")
+        
+        while True:
+            yield from pagina.documentos(resultados)
+            query = pagina.siguiente_consulta()
+            if query is None:
+                self.paginacion_completa = pagina.completa
+                return
+            resultados = self._consultar_indice(query)
+            if resultados is None:
+                print("× Se interrumpió la paginación")
+                return
+
+    def _consultar_lote(self, url, datos, tipo_contenido):
+        """Envía una solicitud por lotes (_mget o _msearch) y devuelve el JSON, o None si falla"""
+        headers = self.session.headers.copy()
+        headers.update({
+            "Content-Type": tipo_contenido
+        })
+        try:
+            status_code, resultados = self._post_busqueda(url, headers, datos=datos)
+            if status_code == 200:
+                return resultados
+            print(f"× Error en consulta por lotes ({url.rsplit('/', 1)[-1]}): {status_code}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"× Error en consulta por lotes: {e}")
+        return None
+
+    def buscar_por_ids(self, ids, tamano_lote=LOTE_IDS):
+        """Obtiene los metadatos de documentos con ID conocido, tamano_lote por solicitud
+
+        Usa _mget y, si el índice no lo permite, una búsqueda con consulta ids.
+        Produce los documentos en el formato de obtener_ids_documentos; los IDs
+        que el índice no conoce se informan y se omiten.
+        """
+        for inicio in range(0, len(ids), tamano_lote):
+            lote = ids[inicio:inicio + tamano_lote]
+            cuerpo = {"docs": [{"_id": doc_id, "_source": {"includes": CAMPOS_METADATOS}} for doc_id in lote]}
+            respuesta = self._consultar_lote(URL_MGET, json.dumps(cuerpo), "application/json")
+            if respuesta is not None:
+                hits = [doc for doc in respuesta.get("docs", []) if doc.get("found")]
+                resultados = {"hits": {"hits": hits}}
+            else:
+                resultados = self._consultar_indice({
+                    "query": {"ids": {"values": lote}},
+                    "size": len(lote),
+                    "_source": {"includes": CAMPOS_METADATOS}
+                })
+                if resultados is None:
+                    print(f"× No se pudieron obtener {len(lote)} documentos por ID")
+                    self.lotes_fallidos += 1
+                    continue
+            
+            documentos = self.obtener_ids_documentos(resultados)
+            if len(documentos) < len(lote):
+                print(f"⚠ {len(lote) - len(documentos)} de {len(lote)} IDs no existen en el índice")
+            yield from documentos
+
+    def buscar_por_expedientes(self, expedientes, tamano_lote=LOTE_EXPEDIENTES, max_por_expediente=MAX_POR_EXPEDIENTE):
+        """Obtiene los metadatos de las providencias de pares (año, número) de expediente con _msearch"""
+        for inicio in range(0, len(expedientes), tamano_lote):
+            lote = expedientes[inicio:inicio + tamano_lote]
+            lineas = []
+            for ano, numero in lote:
+                lineas.append(json.dumps({}))
+                lineas.append(json.dumps({
+                    "query": {
+                        "bool": {
+                            "filter": [
+                                {"match": {"informacion.ano_expediente": ano}},
+                                {"match": {"informacion.numero_expediente": {"query": numero, "operator": "and"}}}
+                            ]
+                        }
+                    },
+                    # Sin "sort": no hace falta orden y Elasticsearch 8 rechaza ordenar por _id
+                    "size": max_por_expediente,
+                    "_source": {"includes": CAMPOS_METADATOS}
+                }))
+            # _msearch exige NDJSON terminado en salto de línea
+            respuesta = self._consultar_lote(URL_MSEARCH, "\n".join(lineas) + "\n", "application/x-ndjson")
+            if respuesta is None:
+                print(f"× No se pudieron obtener {len(lote)} expedientes")
+                self.lotes_fallidos += 1
+                continue
+            
+            for (ano, numero), resultados in zip(lote, respuesta.get("responses", [])):
+                if "error" in resultados:
+                    print(f"× Error al buscar el expediente {ano}-{numero}: {resultados['error']}")
+                    self.lotes_fallidos += 1
+                    continue
+                documentos = self.obtener_ids_documentos(resultados)
+                if not documentos:
+                    print(f"⚠ Expediente sin providencias en el índice: {ano}-{numero}")
+                yield from documentos
+
+    def iter_documentos_lista(self, ruta, max_documentos=None):
+        """Produce los documentos de un archivo de IDs y expedientes (ver leer_lista_documentos)
+
+        Un documento pedido por ID y por expediente solo se entrega una vez. El
+        total de entradas del archivo queda en self.total_resultados y
+        self.paginacion_completa indica si se obtuvieron todos los lotes.
+        """
+        ids, expedientes = leer_lista_documentos(ruta)
+        self.total_resultados = len(ids) + len(expedientes)
+        print(f"Lista {ruta}: {len(ids)} IDs y {len(expedientes)} expedientes")
+        
+        self.paginacion_completa = False
+        self.lotes_fallidos = 0
+        vistos = set()
+        for doc in itertools.chain(self.buscar_por_ids(ids), self.buscar_por_expedientes(expedientes)):
+            if doc["id"] in vistos:
+                continue
+            vistos.add(doc["id"])
+            yield doc
+            if max_documentos and len(vistos) >= max_documentos:
+                return
+        
+        # Los expedientes pueden tener varias providencias
+        self.total_resultados = len(vistos)
+        self.paginacion_completa = not self.lotes_fallidos
+
+    @staticmethod
+    def _hits_con_orden(resultados):
+        """Indica si los aciertos traen los valores de orden que requiere search_after"""
+        hits = resultados.get("hits", {}).get("hits", [])
+        return all("sort" in hit for hit in hits)
+
+    @staticmethod
+    def _total_hits(resultados):
+        """Lee hits.total, que según la versión de Elasticsearch es un entero o un objeto"""
+        total = resultados.get("hits", {}).get("total", 0)
+        if isinstance(total, dict):
+            return total.get("value", 0)
+        return total
+
+    @staticmethod
+    def obtener_ids_documentos(resultados):
         """Extrae los IDs de documentos y metadatos relevantes de los resultados"""
         documentos = []
         
@@ -296,14 +981,19 @@ class SICDownloader:
         
         return documentos
 
-    def obtener_url_visor_relatorias(self, doc_id, tipo_archivo="Sentencia_escrita"):
+    @staticmethod
+    def obtener_url_visor_relatorias(doc_id, tipo_archivo="Sentencia_escrita"):
         """Genera la URL correcta para acceder al visor de relatorías"""
-        base_url = "https://gestor.relatoria.sic.gov.co/visor-relatorias"
+        base_url = URL_VISOR
         url = f"{base_url}/{doc_id}/archivos-providencia/{tipo_archivo}"
         return url
 
     def extraer_links_documentos(self, url_visor):
-        """Extrae los enlaces a los documentos desde la página del visor"""
+        """Extrae los enlaces a los documentos desde la página del visor
+
+        Devuelve None si la página no se pudo obtener, para no confundir un
+        error del visor con una página que no tiene enlaces.
+        """
         print(f"Analizando: {url_visor}")
         
         # Actualizar el Referer para esta solicitud
@@ -316,72 +1006,28 @@ class SICDownloader:
             response = self.session.get(url_visor, headers=headers)
             response.raise_for_status()
             
-            # Parsear el HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Búsqueda de enlaces y elementos relevantes
-            links = []
-            
-            # 1. Buscar enlaces directos a documentos
-            pdf_links = soup.find_all('a', href=re.compile(r'\.(pdf|docx?|xlsx?)$', re.I))
-            for link in pdf_links:
-                href = link.get('href')
-                if href and href not in links:
-                    # Convertir URL relativa a absoluta si es necesario
-                    if not href.startswith(('http://', 'https://')):
-                        href = urllib.parse.urljoin(url_visor, href)
-                    links.append(href)
-            
-            # 2. Buscar en contenedores de documentos
-            content_containers = soup.find_all(['div', 'section'], class_=re.compile(r'(documento|archivo|file|document|content)', re.I))
-            for container in content_containers:
-                anchors = container.find_all('a')
-                for anchor in anchors:
-                    href = anchor.get('href')
-                    if href and href not in links:
-                        if not href.startswith(('http://', 'https://')):
-                            href = urllib.parse.urljoin(url_visor, href)
-                        links.append(href)
-            
-            # 3. Buscar en iframes
-            iframes = soup.find_all('iframe')
-            for iframe in iframes:
-                src = iframe.get('src')
-                if src and src not in links:
-                    if not src.startswith(('http://', 'https://')):
-                        src = urllib.parse.urljoin(url_visor, src)
-                    links.append(src)
-            
-            # 4. Buscar en scripts (URLs embebidas)
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if script.string:
-                    # Buscar URLs en el contenido del script
-                    url_matches = re.findall(r'(https?://[^\s"\'<>]+\.(pdf|docx?|xlsx?|zip))', script.string)
-                    for url_match, _ in url_matches:
-                        if url_match not in links:
-                            links.append(url_match)
-                    
-                    # Buscar URLs en formato AWS S3
-                    s3_matches = re.findall(r'(https?://[^\s"\'<>]+amazonaws\.com[^\s"\'<>]+)', script.string)
-                    for s3_url in s3_matches:
-                        if s3_url not in links:
-                            links.append(s3_url)
+            # Enlaces directos, contenedores de documentos, iframes y scripts en una sola pasada
+            links = extraer_enlaces(response.text, url_visor, self.parser_html)
             
             print(f"Se encontraron {len(links)} enlaces.")
             return links
         
         except requests.exceptions.RequestException as e:
             print(f"Error al acceder al visor: {e}")
-            return []
+            return None
 
     def obtener_url_s3(self, path_s3):
         """Obtiene la URL firmada para un archivo en S3"""
         if not path_s3:
             return None
         
+        # Reutilizar una URL firmada que siga vigente
+        url_firmada = self.cache_urls.obtener(path_s3)
+        if url_firmada:
+            return url_firmada
+        
         # Base URL para obtener la URL firmada
-        base_url = "https://m0s03uyzg3.execute-api.us-east-1.amazonaws.com/prod/get-signed-url/"
+        base_url = URL_FIRMA_S3
         
         # Codificar la ruta S3 en la URL
         url = base_url + urllib.parse.quote(path_s3)
@@ -390,179 +1036,605 @@ class SICDownloader:
             response = self.session.get(url)
             response.raise_for_status()
             data = response.json()
-            return data.get("url")  # URL firmada
+            url_firmada = data.get("url")  # URL firmada
+            if url_firmada:
+                self.cache_urls.guardar(path_s3, url_firmada)
+            return url_firmada
         except requests.exceptions.RequestException as e:
             print(f"Error al obtener URL firmada: {e}")
             return None
 
     def descargar_documento(self, url, nombre_archivo):
         """Descarga un documento dado su URL"""
-        # Verificar si ya existe
-        if os.path.exists(nombre_archivo):
-            print(f"El archivo ya existe: {nombre_archivo}")
-            return True
-        
-        # Actualizar headers para la descarga
-        headers = self.session.headers.copy()
-        headers.update({
-            "Accept": "*/*"
-        })
+        return self._descargar(url, nombre_archivo) is not None
+
+    def _descargar(self, url, nombre_archivo, clave=None):
+        """Descarga un documento y devuelve {"bytes", "sha256"}, o None si falla
+
+        El .part, la reanudación con Range y el almacén los gestiona
+        DescargaParcial. Con almacén, clave identifica el origen (por defecto
+        la URL): si ya se descargó antes, o si el ETag de la respuesta
+        corresponde a un blob conocido, el archivo se enlaza al blob existente
+        sin descargarlo.
+        """
+        parte = DescargaParcial(nombre_archivo, self.chunk_size, self.almacen, clave or url)
+        info = parte.existente()
+        if info:
+            return info
         
         try:
-            print(f"Descargando: {nombre_archivo}")
-            response = self.session.get(url, headers=headers, stream=True)
+            print(f"Descargando: {nombre_archivo}" + (f" (reanudando desde {parte.inicio} bytes)" if parte.inicio else ""))
+            response = self.session.get(url, headers=parte.cabeceras(), stream=True)
+            
+            if parte.rango_rechazado(response.status_code):
+                response.close()
+                return self._descargar(url, nombre_archivo, clave)
             response.raise_for_status()
             
-            # Guardar el archivo
-            with open(nombre_archivo, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            info = parte.enlazar_por_etag(url, response)
+            if info:
+                response.close()
+                return info
             
-            print(f"✓ Documento descargado: {nombre_archivo}")
-            return True
+            with parte.abrir(response) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    parte.escribir(f, chunk)
+            return parte.terminar()
         
         except requests.exceptions.RequestException as e:
             print(f"× Error al descargar documento: {e}")
+            if e.response is not None and 400 <= e.response.status_code < 500:
+                self.urls_rechazadas.add(url)
+            return None
+
+    def _descarga_rechazada(self, url):
+        """Indica (una sola vez) si la última descarga de url falló con un 4xx"""
+        if url in self.urls_rechazadas:
+            self.urls_rechazadas.discard(url)
+            return True
+        return False
+
+    @staticmethod
+    def _tamano_esperado(response, inicio):
+        """Tamaño total del archivo según Content-Range o Content-Length, si se puede saber"""
+        if response.headers.get("Content-Encoding", "identity") != "identity":
+            # Content-Length se refiere al cuerpo comprimido
+            return None
+        rango = response.headers.get("Content-Range", "")
+        if "/" in rango and not rango.endswith("/*"):
+            try:
+                return int(rango.rsplit("/", 1)[1])
+            except ValueError:
+                return None
+        longitud = response.headers.get("Content-Length")
+        if longitud and longitud.isdigit():
+            return inicio + int(longitud)
+        return None
+
+    def _descargar_registrado(self, url, nombre_archivo, clave=None, doc_id=None):
+        """Descarga un archivo registrado en el manifiesto y deja constancia del resultado"""
+        self.manifiesto.marcar_archivo(nombre_archivo, "descargando")
+        info = self._descargar(url, nombre_archivo, clave)
+        if info is None:
+            self.manifiesto.marcar_archivo(nombre_archivo, "fallido", error="descarga")
             return False
+        
+        self.manifiesto.marcar_archivo(nombre_archivo, "completado", info["bytes"], info["sha256"])
+        self._archivo_completado(doc_id, nombre_archivo)
+        return True
 
-    def procesar_documentos(self, terminos_busqueda, max_documentos=None, tipos_archivo=None):
-        """Procesa todos los documentos para los términos de búsqueda dados"""
-        if tipos_archivo is None:
-            tipos_archivo = ["Sentencia_escrita", "Auto_escrito", "Sentencia_oral", "Comunicacion"]
+    def _archivo_completado(self, doc_id, nombre_archivo):
+        """Pasa un archivo ya en disco a la etapa de extracción de texto, si está activa"""
+        if self.extractor and doc_id:
+            self.extractor.enviar(doc_id, nombre_archivo)
+
+    def _procesar_documento(self, doc, i, total, tipos_archivo, reanudar=False):
+        """Descarga los archivos de un documento (S3 y visor) y devuelve cuántos se obtuvieron"""
+        doc_id = doc["id"]
+        tipo_prov = doc["tipo_providencia"]
         
-        # Realizar la búsqueda inicial
-        resultados = self.buscar_documentos(terminos_busqueda)
-        if not resultados:
-            print("No se encontraron resultados para la búsqueda.")
-            return
+        # Nombre base para los archivos
+        base_nombre = nombre_base_reservado(self.manifiesto, doc)
         
-        # Extraer IDs y metadatos
-        documentos = self.obtener_ids_documentos(resultados)
+        print(f"\n[{i}/{total}] Documento: {base_nombre} (ID: {doc_id})")
         
-        # Limitar número de documentos si es necesario
-        if max_documentos:
-            documentos = documentos[:max_documentos]
+        estado = self.manifiesto.estado_documento(doc_id)
+        if reanudar and estado == "completado":
+            print("  ✓ Documento completado en una ejecución anterior.")
+            return 0
         
-        print(f"\nProcesando {len(documentos)} documentos encontrados...")
-        print("-" * 80)
+        print("  Partes:", ", ".join(doc["partes"]) if doc["partes"] else "N/A")
+        print("  Descriptores:", ", ".join(doc["descriptores"]) if doc["descriptores"] else "N/A")
         
-        # Contador de documentos descargados
-        total_descargados = 0
+        if self.offline:
+            # Sin red no se firma ni se descarga; tampoco se anotan fallos que
+            # harían que la siguiente ejecución con red se saltara fuentes
+            completados = self.manifiesto.archivos_completados(doc_id)
+            print(f"  Modo offline: {len(completados)} archivos descargados en ejecuciones anteriores, no se descarga nada")
+            if self.indice and not self.extractor:
+                self.indice.indexar_documento(doc, completados)
+            return 0
         
-        # Procesar cada documento
-        for i, doc in enumerate(documentos, 1):
-            doc_id = doc["id"]
-            año = doc["año"]
-            numero = doc["numero"]
-            tipo_prov = doc["tipo_providencia"]
-            
-            # Nombre base para los archivos
-            base_nombre = f"{año}_{numero}_{tipo_prov}"
-            
-            print(f"\n[{i}/{len(documentos)}] Documento: {base_nombre} (ID: {doc_id})")
-            print("  Partes:", ", ".join(doc["partes"]) if doc["partes"] else "N/A")
-            print("  Descriptores:", ", ".join(doc["descriptores"]) if doc["descriptores"] else "N/A")
+        fallidos = 0
+        
+        # 1. Primero intentar descargar archivos desde S3 si están disponibles
+        s3_descargados = 0
+        cubiertos_s3 = []
+        tiene_s3 = any(archivo.get("path_s3") for archivo in doc["archivos"])
+        usar_s3 = tiene_s3 and (not self.planificador or self.planificador.usar_s3(tipo_prov))
+        if tiene_s3 and not usar_s3:
+            print(f"  Estrategia: S3 no ha funcionado para '{tipo_prov}', se pasa directo al visor")
+        
+        for j, archivo in enumerate(doc["archivos"] if usar_s3 else [], 1):
+            path_s3 = archivo.get("path_s3")
+            tipo_archivo = archivo.get("tipo")
             
-            # 1. Primero intentar descargar archivos desde S3 si están disponibles
-            s3_descargados = 0
-            for j, archivo in enumerate(doc["archivos"], 1):
-                path_s3 = archivo.get("path_s3")
-                tipo_archivo = archivo.get("tipo")
+            if path_s3:
+                print(f"  - Archivo S3 #{j}: {tipo_archivo} ({path_s3})")
                 
-                if path_s3:
-                    print(f"  - Archivo S3 #{j}: {tipo_archivo} ({path_s3})")
-                    url_s3 = self.obtener_url_s3(path_s3)
-                    
-                    if url_s3:
-                        # Determinar extensión
-                        extension = "pdf"  # Por defecto PDF
-                        if path_s3.lower().endswith(".docx"):
-                            extension = "docx"
-                        elif path_s3.lower().endswith(".doc"):
-                            extension = "doc"
-                        
-                        # Crear nombre de archivo
-                        nombre_archivo = os.path.join(self.output_dir, f"{base_nombre}_{tipo_archivo.replace(' ', '_')}.{extension}")
-                        
-                        # Descargar
-                        if self.descargar_documento(url_s3, nombre_archivo):
-                            s3_descargados += 1
-                            total_descargados += 1
+                # Crear nombre de archivo
+                nombre_archivo = nombre_archivo_s3(self.output_dir, base_nombre, tipo_archivo, path_s3)
+                self.manifiesto.registrar_archivo(nombre_archivo, doc_id, "s3", path_s3)
                 
-                # Espaciar las solicitudes
-                time.sleep(0.5)
-            
-            if s3_descargados > 0:
-                print(f"  ✓ Descargados {s3_descargados} archivos desde S3.")
-            else:
-                print("  × No se encontraron archivos disponibles en S3.")
-            
-            # 2. Intentar descargar documentos desde el visor de relatorías
-            visor_descargados = 0
+                # Si ya lo tenemos no hace falta pedir la URL firmada
+                if os.path.exists(nombre_archivo):
+                    print(f"El archivo ya existe: {nombre_archivo}")
+                    self.manifiesto.marcar_archivo(nombre_archivo, "completado", os.path.getsize(nombre_archivo))
+                    self._archivo_completado(doc_id, nombre_archivo)
+                    s3_descargados += 1
+                    cubiertos_s3.append(tipo_archivo)
+                    continue
+                
+                # Tampoco si el almacén ya tiene el contenido de esta ruta S3
+                clave = f"s3:{path_s3}"
+                if self.almacen:
+                    info = self.almacen.recuperar(clave, nombre_archivo)
+                    if info:
+                        print(f"✓ Contenido ya almacenado, enlazado: {nombre_archivo}")
+                        self.manifiesto.marcar_archivo(nombre_archivo, "completado", info["bytes"], info["sha256"])
+                        self._archivo_completado(doc_id, nombre_archivo)
+                        s3_descargados += 1
+                        cubiertos_s3.append(tipo_archivo)
+                        continue
+                
+                de_cache = self.cache_urls.obtener(path_s3)
+                url_s3 = de_cache or self.obtener_url_s3(path_s3)
+                if not url_s3:
+                    self.manifiesto.marcar_archivo(nombre_archivo, "fallido", error="firma")
+                    fallidos += 1
+                    continue
+                
+                # Descargar
+                descargado = self._descargar_registrado(url_s3, nombre_archivo, clave, doc_id)
+                if not descargado and self._descarga_rechazada(url_s3) and de_cache:
+                    # Una URL firmada con credenciales temporales puede dejar de valer
+                    # antes de su X-Amz-Expires: se descarta y se firma una vez más
+                    print("  URL firmada de la caché rechazada, se vuelve a firmar")
+                    self.cache_urls.invalidar(path_s3)
+                    url_s3 = self.obtener_url_s3(path_s3)
+                    descargado = bool(url_s3) and self._descargar_registrado(url_s3, nombre_archivo, clave, doc_id)
+                if descargado:
+                    s3_descargados += 1
+                    cubiertos_s3.append(tipo_archivo)
+                else:
+                    fallidos += 1
+        
+        if usar_s3 and self.planificador:
+            self.planificador.registrar(tipo_prov, "s3", s3_descargados > 0)
+        
+        if s3_descargados > 0:
+            print(f"  ✓ Descargados {s3_descargados} archivos desde S3.")
+        else:
+            print("  × No se encontraron archivos disponibles en S3.")
+        
+        # 2. Intentar descargar documentos desde el visor de relatorías
+        visor_descargados = 0
+        visor_fallido = False
+        
+        if reanudar and estado in ("resuelto", "fallido"):
+            # Los enlaces del visor ya se extrajeron en una ejecución anterior
+            archivos_visor = self.manifiesto.archivos_documento(doc_id, "visor")
+            print(f"  Enlaces del visor recuperados del manifiesto: {len(archivos_visor)}")
+        else:
+            # Solo los tipos que S3 no cubrió y que el visor suele servir
+            tipos_visor = tipos_archivo
+            if self.planificador:
+                tipos_visor = self.planificador.tipos_visor(tipo_prov, tipos_archivo, cubiertos_s3)
+                if len(tipos_visor) < len(tipos_archivo):
+                    print(f"  Visor: se consultan {len(tipos_visor)} de {len(tipos_archivo)} tipos")
             
-            for tipo in tipos_archivo:
+            archivos_visor = []
+            for tipo in tipos_visor:
                 # Generar URL del visor
                 url_visor = self.obtener_url_visor_relatorias(doc_id, tipo)
                 
                 # Extraer enlaces
                 enlaces = self.extraer_links_documentos(url_visor)
+                if enlaces is None:
+                    # Un error del visor no dice nada de si el tipo existe: no cuenta para el planificador
+                    visor_fallido = True
+                    fallidos += 1
+                    continue
+                if self.planificador:
+                    self.planificador.registrar(tipo_prov, f"visor:{tipo}", bool(enlaces))
                 
-                # Descargar documentos encontrados
                 for j, enlace in enumerate(enlaces, 1):
-                    # Determinar tipo de archivo
-                    extension = "pdf"  # Por defecto PDF
-                    if enlace.lower().endswith(".docx"):
-                        extension = "docx"
-                    elif enlace.lower().endswith(".doc"):
-                        extension = "doc"
-                    elif enlace.lower().endswith(".xlsx"):
-                        extension = "xlsx"
-                    elif enlace.lower().endswith(".xls"):
-                        extension = "xls"
-                    
                     # Crear nombre de archivo
-                    nombre_archivo = os.path.join(self.output_dir, f"{base_nombre}_{tipo.replace(' ', '_')}_{j}.{extension}")
-                    
-                    # Descargar
-                    if self.descargar_documento(enlace, nombre_archivo):
-                        visor_descargados += 1
-                        total_descargados += 1
-                
-                # Espaciar las solicitudes
-                time.sleep(1)
+                    nombre_archivo = nombre_archivo_visor(self.output_dir, base_nombre, tipo, j, enlace)
+                    self.manifiesto.registrar_archivo(nombre_archivo, doc_id, "visor", enlace)
+                    archivos_visor.append((nombre_archivo, enlace))
             
-            if visor_descargados > 0:
-                print(f"  ✓ Descargados {visor_descargados} documentos desde el visor.")
+            # Con alguna página del visor sin obtener, los enlaces conocidos no son todos
+            if not visor_fallido:
+                self.manifiesto.marcar_documento(doc_id, "resuelto")
+        
+        # Descargar documentos encontrados
+        for nombre_archivo, enlace in archivos_visor:
+            if self._descargar_registrado(enlace, nombre_archivo, doc_id=doc_id):
+                visor_descargados += 1
             else:
-                print("  × No se encontraron documentos descargables en el visor.")
-            
-            # Esperar entre documentos para no sobrecargar el servidor
-            time.sleep(2)
+                fallidos += 1
+        
+        if visor_descargados > 0:
+            print(f"  ✓ Descargados {visor_descargados} documentos desde el visor.")
+        else:
+            print("  × No se encontraron documentos descargables en el visor.")
+        
+        if visor_fallido:
+            # Queda como buscado para que --resume vuelva a consultar el visor
+            self.manifiesto.marcar_documento(doc_id, "buscado")
+        else:
+            self.manifiesto.marcar_documento(doc_id, "fallido" if fallidos else "completado")
+        if self.indice and not self.extractor:
+            # Con extracción de texto se indexa al final, cuando el texto está listo
+            self.indice.indexar_documento(doc, self.manifiesto.archivos_completados(doc_id))
+        return s3_descargados + visor_descargados
+
+    def _iter_registrando(self, terminos_busqueda, max_documentos, lista=None):
+        """Recorre iter_documentos (o iter_documentos_lista) guardando cada documento en el manifiesto"""
+        if lista:
+            documentos = self.iter_documentos_lista(lista, max_documentos)
+        else:
+            documentos = self.iter_documentos(terminos_busqueda, max_documentos=max_documentos)
+        orden = 0
+        for orden, doc in enumerate(documentos, 1):
+            self.manifiesto.registrar_documento(terminos_busqueda, orden, doc)
+            if self.exportador:
+                self.exportador.agregar(doc, terminos_busqueda)
+            yield orden, doc
+        if self.offline:
+            # Una búsqueda servida desde la caché (quizá vencida) no se da por completa
+            return
+        # iter_documentos también termina sin excepción tras un error de página, el
+        # límite de from/size o max_documentos: solo la paginación completa (o el
+        # corte en max_documentos, que se guarda con la búsqueda) permite reanudar
+        # desde el manifiesto sin volver a buscar
+        if self.paginacion_completa:
+            self.manifiesto.marcar_busqueda(terminos_busqueda, True, self.total_resultados)
+        elif max_documentos and orden >= max_documentos:
+            self.manifiesto.marcar_busqueda(terminos_busqueda, True, self.total_resultados, max_documentos)
+        else:
+            self.manifiesto.marcar_busqueda(terminos_busqueda, False, self.total_resultados)
+
+    def _iter_sincronizando(self, terminos_busqueda, max_documentos):
+        """Como _iter_registrando, pero solo con los documentos posteriores a la marca de agua de la búsqueda
+
+        La consulta lleva un filtro de rango sobre CAMPO_FECHA desde la fecha de
+        la marca (incluida, porque el mismo día puede haber providencias nuevas)
+        y se descartan los documentos que la búsqueda ya tenía registrados. La
+        marca solo avanza si se recorrieron todos los resultados: como el orden
+        es por relevancia, una paginación cortada podría dejar atrás documentos
+        más antiguos que la nueva marca.
+        """
+        marca = self.manifiesto.marca_agua(terminos_busqueda)
+        desde_fecha = marca[0] if marca else None
+        if marca:
+            print(f"Sincronizando '{terminos_busqueda}' desde {CAMPO_FECHA} >= {desde_fecha} (último ID {marca[1]})")
+        else:
+            print(f"Sincronizando '{terminos_busqueda}' por primera vez (sin marca de agua)")
         
+        orden = self.manifiesto.ultimo_orden(terminos_busqueda)
+        nuevos = 0
+        repetidos = 0
+        documentos = self.iter_documentos(terminos_busqueda, max_documentos=max_documentos, desde_fecha=desde_fecha)
+        for doc in documentos:
+            if doc["fecha"] and (not marca or (doc["fecha"], doc["id"]) > marca):
+                marca = (doc["fecha"], doc["id"])
+            if self.manifiesto.conoce_documento(terminos_busqueda, doc["id"]):
+                repetidos += 1
+                continue
+            orden += 1
+            nuevos += 1
+            self.manifiesto.registrar_documento(terminos_busqueda, orden, doc)
+            if self.exportador:
+                self.exportador.agregar(doc, terminos_busqueda)
+            yield orden, doc
+        
+        # El progreso se mide sobre los documentos nuevos
+        self.total_resultados = nuevos
+        if self.offline:
+            print(f"⚠ Sincronización de '{terminos_busqueda}' en modo offline: la marca de agua no se actualiza")
+        elif self.paginacion_completa:
+            if marca:
+                self.manifiesto.guardar_marca(terminos_busqueda, marca[0], marca[1])
+            self.manifiesto.marcar_busqueda(terminos_busqueda, True, self.manifiesto.ultimo_orden(terminos_busqueda))
+            print(f"✓ Sincronización de '{terminos_busqueda}': {nuevos} documentos nuevos, {repetidos} ya conocidos; "
+                  f"marca de agua en {marca[0] if marca else 'N/A'}")
+        else:
+            print(f"⚠ Sincronización de '{terminos_busqueda}' incompleta: la marca de agua no se actualiza")
+
+    def procesar_documentos(self, terminos_busqueda=None, max_documentos=None, tipos_archivo=None, workers=None,
+                            reanudar=False, lista=None, sincronizar=False):
+        """Procesa todos los documentos para los términos de búsqueda dados
+
+        Con workers > 1 los documentos se reparten en un pool de hilos; cada
+        documento sigue resolviendo y descargando sus archivos en el mismo orden
+        que en el recorrido secuencial, por lo que los archivos resultantes son
+        idénticos. Se recorren todas las páginas de resultados (iter_documentos).
+        Con reanudar se retoma desde el manifiesto: si la búsqueda ya se completó
+        no se repite, se saltan los documentos terminados y se reutilizan los
+        enlaces del visor ya extraídos.
+        Con lista (ruta a un archivo de IDs o expedientes) los metadatos se piden
+        por lotes en lugar de buscar por términos; ver iter_documentos_lista.
+        Con sincronizar solo se piden los documentos posteriores a la marca de
+        agua de la búsqueda (ver _iter_sincronizando).
+        """
+        if lista:
+            # La lista ocupa el lugar de los términos en el manifiesto
+            terminos_busqueda = f"lista:{os.path.abspath(lista)}"
+        
+        documentos = self._documentos_busqueda(terminos_busqueda, max_documentos, reanudar, lista, sincronizar)
+        
+        def total():
+            if max_documentos:
+                return min(max_documentos, self.total_resultados)
+            return self.total_resultados
+        
+        procesados, total_descargados = self._ejecutar(documentos, total, tipos_archivo, workers, reanudar)
+        
+        if not procesados:
+            print("No se encontraron resultados para la búsqueda.")
+            return
+        self._imprimir_resumen(procesados, total_descargados)
+
+    def _documentos_busqueda(self, terminos_busqueda, max_documentos, reanudar, lista=None, sincronizar=False):
+        """Documentos (orden, doc) de una búsqueda: del manifiesto si ya se completó, si no del índice"""
+        if sincronizar and not lista:
+            return self._iter_sincronizando(terminos_busqueda, max_documentos)
+        if reanudar and self.manifiesto.busqueda_completa(terminos_busqueda, max_documentos):
+            print(f"Reanudando '{terminos_busqueda}' desde el manifiesto: {self.manifiesto.ruta}")
+            documentos = self.manifiesto.documentos(terminos_busqueda, max_documentos)
+            self.total_resultados = len(documentos)
+            return documentos
+        # Los documentos llegan página a página: la descarga empieza antes de que
+        # termine la paginación
+        return self._iter_registrando(terminos_busqueda, max_documentos, lista)
+
+    def _ejecutar(self, documentos, total, tipos_archivo=None, workers=None, reanudar=False):
+        """Procesa los (orden, doc) de documentos en la cola de trabajo y devuelve (procesados, descargados)
+
+        total es una función que devuelve el total a mostrar en el progreso.
+        """
+        if tipos_archivo is None:
+            tipos_archivo = ["Sentencia_escrita", "Auto_escrito", "Sentencia_oral", "Comunicacion"]
+        if workers is None:
+            workers = self.workers
+        
+        procesados = 0
+        total_descargados = 0
+        if workers > 1:
+            print(f"Usando {workers} workers en paralelo")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # Cola acotada: no se piden más páginas de las que los workers pueden absorber
+                pendientes = set()
+                for i, doc in documentos:
+                    if len(pendientes) >= workers * 2:
+                        hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                        total_descargados += sum(f.result() for f in hechos)
+                    # Los nombres se reservan en el orden de los documentos, no en el que acaban los workers
+                    nombre_base_reservado(self.manifiesto, doc)
+                    pendientes.add(executor.submit(self._procesar_documento, doc, i, total(), tipos_archivo, reanudar))
+                    procesados += 1
+                total_descargados += sum(f.result() for f in pendientes)
+        else:
+            for i, doc in documentos:
+                total_descargados += self._procesar_documento(doc, i, total(), tipos_archivo, reanudar)
+                procesados += 1
+        
+        if self.metricas:
+            self.metricas.documentos += procesados
+        if self.exportador:
+            self.exportador.vaciar()
+        if self.extractor:
+            print("Esperando a que termine la extracción de texto...")
+            self.extractor.esperar()
+            if self.indice:
+                self.indice.actualizar(self.manifiesto)
+        return procesados, total_descargados
+
+    def _imprimir_resumen(self, procesados, total_descargados):
         print("\n" + "=" * 80)
-        print(f"Resumen: Se procesaron {len(documentos)} documentos y se descargaron {total_descargados} archivos.")
+        print(f"Resumen: Se procesaron {procesados} documentos y se descargaron {total_descargados} archivos.")
+        print("Estado de los archivos en el manifiesto:", self.manifiesto.resumen())
+        if self.planificador:
+            if not self.offline:
+                self.planificador.guardar()
+            print(f"Fuentes por tipo de providencia ({self.planificador.visores_evitados} consultas al visor evitadas):")
+            for linea in self.planificador.resumen():
+                print("  " + linea)
+        if self.extractor:
+            print("Texto extraído:", self.extractor.resumen())
+        if self.exportador:
+            print(f"Metadatos exportados: {self.exportador.escritos} documentos nuevos en {self.exportador.lotes} lotes "
+                  f"({os.path.abspath(self.exportador.directorio)})")
+        if not self.offline:
+            # En modo offline los métodos de búsqueda "fallan" por falta de red, no por el servidor
+            self.estrategias.guardar()
+            self.estado.guardar_de_sesion(self.session)
+        print("Métodos de búsqueda:", self.estrategias.resumen())
+        if self.metricas:
+            print("Solicitudes HTTP por fase:")
+            for linea in self.metricas.resumen():
+                print("  " + linea)
+        if self.cache_respuestas:
+            estadisticas = self.cache_respuestas.estadisticas()
+            print(f"Caché de búsquedas: {estadisticas['aciertos']} respuestas sin red, "
+                  f"{estadisticas['revalidadas']} revalidadas (304), {estadisticas['descargadas']} descargadas; "
+                  f"{estadisticas['entradas']} entradas ({estadisticas['bytes'] / (1024 * 1024):.1f} MB)")
+        if self.almacen:
+            estadisticas = self.almacen.estadisticas()
+            print(f"Almacén: {estadisticas['nombres']} nombres sobre {estadisticas['blobs']} blobs únicos "
+                  f"({estadisticas['bytes'] / (1024 * 1024):.1f} MB)")
         print("Los archivos se encuentran en el directorio:", os.path.abspath(self.output_dir))
         print("=" * 80)
 
+    def procesar_consultas(self, consultas, max_documentos=None, tipos_archivo=None, workers=None, reanudar=False,
+                           sincronizar=False):
+        """Procesa varias búsquedas con una sola sesión y una sola cola de trabajo
+
+        consultas es una lista de términos o la ruta a un archivo con una
+        búsqueda por línea. Un documento que aparece en varias búsquedas se
+        descarga una sola vez (la primera vez que se encuentra); las búsquedas
+        siguen paginándose mientras los workers descargan. max_documentos se
+        aplica a cada búsqueda. La relación búsqueda -> IDs de documento,
+        incluidos los repetidos, se guarda en consultas.json en output_dir.
+        Con sincronizar cada búsqueda usa su propia marca de agua.
+        """
+        if isinstance(consultas, str):
+            consultas = leer_consultas(consultas)
+        
+        mapa = {}
+        unicos = set()
+        totales = {}
+        
+        def documentos():
+            orden = 0
+            for terminos in consultas:
+                mapa[terminos] = []
+                for _, doc in self._documentos_busqueda(terminos, max_documentos, reanudar, sincronizar=sincronizar):
+                    totales[terminos] = self.total_resultados
+                    mapa[terminos].append(doc["id"])
+                    if doc["id"] in unicos:
+                        continue
+                    unicos.add(doc["id"])
+                    orden += 1
+                    yield orden, doc
+        
+        def total():
+            return sum(min(t, max_documentos) if max_documentos else t for t in totales.values())
+        
+        print(f"Procesando {len(consultas)} búsquedas con una cola de trabajo compartida")
+        procesados, total_descargados = self._ejecutar(documentos(), total, tipos_archivo, workers, reanudar)
+        
+        encontrados = sum(len(ids) for ids in mapa.values())
+        ruta_mapa = os.path.join(self.output_dir, "consultas.json")
+        with open(ruta_mapa, "w", encoding="utf-8") as f:
+            json.dump({"consultas": mapa, "documentos_unicos": len(unicos),
+                       "repetidos": encontrados - len(unicos)}, f, indent=2, ensure_ascii=False)
+        
+        print(f"\n{len(consultas)} búsquedas, {encontrados} resultados, {len(unicos)} documentos únicos "
+              f"({encontrados - len(unicos)} repetidos no se descargaron de nuevo)")
+        print(f"Relación búsqueda -> documentos guardada en: {ruta_mapa}")
+        if not procesados:
+            print("No se encontraron resultados para las búsquedas.")
+            return
+        self._imprimir_resumen(procesados, total_descargados)
+
 # Función principal para ejecutar desde línea de comandos
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Descargador de documentos de la SIC.')
-    parser.add_argument('terminos', help='Términos de búsqueda')
+    parser.add_argument('terminos', nargs='?', help='Términos de búsqueda')
+    parser.add_argument('--consultas', default=None,
+                        help='Archivo con una búsqueda por línea; se procesan todas con una sola sesión')
+    parser.add_argument('--lista', default=None,
+                        help='Archivo con IDs de documento o pares año,número de expediente (uno por línea)')
     parser.add_argument('--max', type=int, default=None, help='Número máximo de documentos a procesar')
     parser.add_argument('--dir', default='documentos_sic', help='Directorio de salida')
+    parser.add_argument('--workers', type=int, default=1, help='Número de documentos a procesar en paralelo')
+    parser.add_argument('--resume', action='store_true', help='Reanudar una ejecución interrumpida desde el manifiesto')
+    parser.add_argument('--sync', action='store_true',
+                        help='Sincronizar: solo documentos posteriores a la última ejecución de cada búsqueda')
+    parser.add_argument('--chunk-kb', type=int, default=TAMANO_BLOQUE // 1024, help='Tamaño de bloque de descarga en KB')
+    parser.add_argument('--almacen', action='store_true', help='Guardar los archivos deduplicados por contenido')
+    parser.add_argument('--indexar', action='store_true',
+                        help='Mantener el índice local (buscar-local en sic_indice_local) al día con las descargas')
+    parser.add_argument('--extraer-texto', action='store_true',
+                        help='Extraer el texto de cada archivo descargado (en textos/<id>/) en paralelo a las descargas')
+    parser.add_argument('--procesos', type=int, default=None,
+                        help='Procesos para la extracción de texto (por defecto, uno por CPU)')
+    parser.add_argument('--exportar', action='store_true',
+                        help='Añadir los metadatos a un dataset Parquet particionado por año y tipo (requiere pyarrow)')
+    parser.add_argument('--cache-ttl', type=int, default=None,
+                        help='Guardar las respuestas de búsqueda en disco y reutilizarlas durante estos segundos')
+    parser.add_argument('--cache-mb', type=int, default=MAX_BYTES_RESPUESTAS // (1024 * 1024),
+                        help='Tamaño máximo de la caché de respuestas en MB (se desalojan las menos usadas)')
+    parser.add_argument('--offline', action='store_true',
+                        help='No acceder a la red: las búsquedas se sirven solo desde la caché de respuestas')
+    parser.add_argument('--metricas', action='store_true',
+                        help='Registrar cada solicitud HTTP (JSON por línea en <dir>/.metricas.jsonl) y resumir por fase')
+    parser.add_argument('--prometheus', default=None, metavar='RUTA',
+                        help='Escribir las métricas al terminar en formato de texto de Prometheus (implica --metricas)')
+    parser.add_argument('--estado', default=None, metavar='RUTA',
+                        help='Archivo de estado de sesión (cookies, User-Agent, métodos de búsqueda) compartido '
+                             'entre procesos; por defecto <dir>/.estado_sesion.json')
+    parser.add_argument('--exhaustivo', action='store_true', help='Probar siempre S3 y todos los tipos del visor')
+    parser.add_argument('--parser-html', choices=['selectolax', 'lxml', 'html.parser'], default=None,
+                        help='Parser para las páginas del visor (por defecto el más rápido instalado)')
     
     args = parser.parse_args()
+    if not args.terminos and not args.lista and not args.consultas:
+        parser.error("indique términos de búsqueda, --consultas o --lista")
+    
+    almacen = AlmacenContenido(args.dir) if args.almacen else None
+    indice = IndiceLocal(os.path.join(args.dir, ".indice.sqlite")) if args.indexar else None
+    extractor = ExtractorTexto(args.dir, args.procesos) if args.extraer_texto else None
+    exportador = ExportadorColumnar(os.path.join(args.dir, "metadatos")) if args.exportar else None
+    metricas = None
+    if args.metricas or args.prometheus:
+        os.makedirs(args.dir, exist_ok=True)
+        metricas = MetricasHTTP(os.path.join(args.dir, ".metricas.jsonl"))
+    cache_respuestas = None
+    if args.cache_ttl is not None or args.offline:
+        os.makedirs(args.dir, exist_ok=True)
+        cache_respuestas = CacheRespuestas(os.path.join(args.dir, ".cache_respuestas.sqlite"),
+                                           ttl=args.cache_ttl if args.cache_ttl is not None else TTL_RESPUESTAS,
+                                           max_bytes=args.cache_mb * 1024 * 1024)
     
     # Inicializar el descargador
-    downloader = SICDownloader(output_dir=args.dir)
+    downloader = SICDownloader(output_dir=args.dir, workers=args.workers, chunk_size=args.chunk_kb * 1024,
+                               almacen=almacen, planificar=not args.exhaustivo, parser_html=args.parser_html,
+                               indice=indice, extractor=extractor, exportador=exportador,
+                               cache_respuestas=cache_respuestas, offline=args.offline, metricas=metricas,
+                               estado=EstadoSesion(args.estado) if args.estado else None)
     
-    # Procesar documentos
-    downloader.procesar_documentos(
-        terminos_busqueda=args.terminos,
-        max_documentos=args.max
-    )
+    try:
+        if args.consultas:
+            downloader.procesar_consultas(args.consultas, max_documentos=args.max, reanudar=args.resume,
+                                          sincronizar=args.sync)
+        else:
+            # Procesar documentos
+            downloader.procesar_documentos(
+                terminos_busqueda=args.terminos,
+                max_documentos=args.max,
+                reanudar=args.resume,
+                lista=args.lista,
+                sincronizar=args.sync
+            )
+    finally:
+        if extractor:
+            extractor.cerrar()
+        if exportador:
+            # Los registros aún en memoria (hasta un lote) se escriben aunque la ejecución se corte
+            exportador.cerrar()
+        if cache_respuestas:
+            cache_respuestas.cerrar()
+        if metricas:
+            if args.prometheus:
+                metricas.escribir_prometheus(args.prometheus)
+                print(f"Métricas en formato Prometheus: {args.prometheus}")
+            metricas.cerrar()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # sin fcntl (Windows) solo queda la escritura atómica, sin bloqueo entre procesos
+    fcntl = None
+
+# Vigencia por defecto de cada sección del estado (segundos)
+VIGENCIA_COOKIES = 3600
+VIGENCIA_USER_AGENT = 7 * 24 * 3600
+
+
+def cookies_de_sesion(session):
+    """Cookies de una sesión de requests como lista de diccionarios"""
+    return [{
+        "name": cookie.name,
+        "value": cookie.value,
+        "domain": cookie.domain,
+        "path": cookie.path,
+        "expires": cookie.expires,
+        "secure": bool(cookie.secure),
+        "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+    } for cookie in session.cookies]
+
+
+class EstadoSesion:
+    def __init__(self, ruta):
+        """Estado de la sesión con la SIC compartido entre ejecuciones y procesos
+
+        Guarda en un JSON las cookies, el User-Agent elegido y el estado del
+        selector de métodos de búsqueda, cada sección con la hora en que se
+        guardó para poder caducarla. Las escrituras leen, combinan y
+        reemplazan el archivo bajo un bloqueo exclusivo (fcntl.flock sobre
+        ruta + ".lock"), así varios procesos que trabajan a la vez lo
+        comparten sin pisarse y se presentan como un mismo cliente.
+        """
+        self.ruta = ruta
+        self.ruta_bloqueo = ruta + ".lock"
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+
+    @contextmanager
+    def _bloqueo(self, exclusivo):
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.ruta_bloqueo, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _leer_archivo(self):
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def leer(self, seccion, vigencia=None):
+        """Valor guardado de una sección, o None si no existe o tiene más de vigencia segundos"""
+        with self._bloqueo(exclusivo=False):
+            entrada = self._leer_archivo().get(seccion)
+        if not entrada:
+            return None
+        if vigencia is not None and time.time() - entrada.get("guardado", 0) > vigencia:
+            return None
+        return entrada.get("valor")
+
+    def actualizar(self, seccion, funcion):
+        """Reemplaza una sección por funcion(valor_actual) bajo el bloqueo exclusivo"""
+        with self._bloqueo(exclusivo=True):
+            datos = self._leer_archivo()
+            actual = (datos.get(seccion) or {}).get("valor")
+            datos[seccion] = {"valor": funcion(actual), "guardado": time.time()}
+            temporal = f"{self.ruta}.{os.getpid()}.tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(datos, f, indent=2, ensure_ascii=False)
+            os.chmod(temporal, 0o600)
+            os.replace(temporal, self.ruta)
+
+    def guardar(self, seccion, valor):
+        self.actualizar(seccion, lambda _: valor)
+
+    def cookies(self, vigencia=VIGENCIA_COOKIES):
+        """Cookies guardadas que no hayan caducado"""
+        ahora = time.time()
+        return [cookie for cookie in self.leer("cookies", vigencia) or []
+                if not cookie.get("expires") or cookie["expires"] > ahora]
+
+    def guardar_cookies(self, cookies):
+        """Combina las cookies con las guardadas; las nuevas mandan por (dominio, ruta, nombre)"""
+        def combinar(actuales):
+            clave = lambda cookie: (cookie.get("domain"), cookie.get("path"), cookie["name"])
+            combinadas = {clave(cookie): cookie for cookie in actuales or []}
+            combinadas.update({clave(cookie): cookie for cookie in cookies})
+            return list(combinadas.values())
+        self.actualizar("cookies", combinar)
+
+    def user_agent(self, vigencia=VIGENCIA_USER_AGENT):
+        return self.leer("user_agent", vigencia)
+
+    def aplicar_a_sesion(self, session):
+        """Pone en una sesión de requests el User-Agent y las cookies guardadas
+
+        Devuelve True si había cookies vigentes (y la visita inicial se puede omitir).
+        """
+        user_agent = self.user_agent()
+        if user_agent:
+            session.headers["User-Agent"] = user_agent
+        cookies = self.cookies()
+        for cookie in cookies:
+            session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""),
+                                path=cookie.get("path", "/"), expires=cookie.get("expires"),
+                                secure=cookie.get("secure", False),
+                                rest={"HttpOnly": None} if cookie.get("httpOnly") else {})
+        return bool(cookies)
+
+    def guardar_de_sesion(self, session):
+        """Guarda las cookies y el User-Agent de una sesión de requests"""
+        if len(session.cookies):
+            self.guardar_cookies(cookies_de_sesion(session))
+        if not self.user_agent() and session.headers.get("User-Agent"):
+            self.guardar("user_agent", session.headers["User-Agent"])
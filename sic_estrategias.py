@@ -0,0 +1,182 @@
+import json
+import time
+import threading
+
+# Métodos de búsqueda de buscar_documentos, en el orden en que se prueban por defecto
+ESTRATEGIAS = ["post", "get", "api", "simulacion"]
+
+# Coste de probar cada método: (solicitudes, segundos de pausa). Los métodos
+# ya no hacen pausas fijas (el ritmo lo marca el limitador de tasa), así que
+# solo cuentan las solicitudes
+COSTE = {
+    "post": (1, 0.0),
+    "get": (1, 0.0),
+    "api": (2, 0.0),
+    "simulacion": (2, 0.0),
+}
+
+# Fallos seguidos a partir de los cuales se abre el circuito de un método
+UMBRAL_FALLOS = 2
+
+# Tiempo que un circuito abierto deja de probarse; se duplica en cada apertura seguida
+ENFRIAMIENTO = 300
+ENFRIAMIENTO_MAX = 6 * 3600
+
+# Tiempo durante el que el último método que funcionó se prueba primero
+VIGENCIA_PREFERIDA = 6 * 3600
+
+# Códigos con los que el servidor rechaza un método (además de 5xx y errores de conexión)
+CODIGOS_BLOQUEO = {403, 405, 429}
+
+
+def es_bloqueo(codigo):
+    """Indica si un fallo con este código (None = error de conexión) es del método y no de la consulta
+
+    Un 400 por una consulta mal formada no dice nada del método y no debe
+    abrir su circuito, que se guarda y comparte con otros procesos.
+    """
+    return codigo is None or codigo in CODIGOS_BLOQUEO or codigo >= 500
+
+
+class SelectorEstrategias:
+    def __init__(self, estado=None, umbral_fallos=UMBRAL_FALLOS, enfriamiento=ENFRIAMIENTO,
+                 vigencia=VIGENCIA_PREFERIDA):
+        """Recuerda qué método de búsqueda funciona para no repetir los que fallan
+
+        El último método con éxito se prueba primero mientras esté vigente. Un
+        método que falla umbral_fallos veces seguidas se salta (circuito
+        abierto) durante un enfriamiento que se duplica con cada apertura;
+        pasado ese tiempo se vuelve a probar una vez (semiabierto) y un
+        acierto lo cierra. Si se indica estado (un EstadoSesion) se guarda en
+        su sección "estrategias" para las siguientes ejecuciones y se comparte
+        con otros procesos; sin él solo dura lo que el objeto.
+        """
+        self.estado_sesion = estado
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento = enfriamiento
+        self.vigencia = vigencia
+        self.lock = threading.Lock()
+        # {"preferida": metodo, "exito_en": epoch, "metodos": {metodo: {"fallos_seguidos", "aperturas", "abierto_hasta", "exitos", "fallos"}}}
+        self.estado = {"preferida": None, "exito_en": 0, "metodos": {}}
+        self.solicitudes_evitadas = 0
+        self.espera_evitada = 0.0
+
+        if estado is not None:
+            self.estado.update(estado.leer("estrategias") or {})
+
+    def _metodo(self, estrategia):
+        metodo = self.estado["metodos"].setdefault(estrategia, {})
+        for campo in ("fallos_seguidos", "aperturas", "abierto_hasta", "exitos", "fallos"):
+            metodo.setdefault(campo, 0)
+        return metodo
+
+    def _disponible(self, estrategia, ahora):
+        return self._metodo(estrategia)["abierto_hasta"] <= ahora
+
+    def disponible(self, estrategia):
+        """Indica si el circuito del método está cerrado o ya toca volver a probarlo"""
+        with self.lock:
+            return self._disponible(estrategia, time.time())
+
+    def orden(self):
+        """Métodos a probar ahora: el preferido vigente primero y luego el resto con circuito cerrado
+
+        Si todos tienen el circuito abierto se prueban todos, para no dejar la
+        búsqueda sin ninguna opción.
+        """
+        ahora = time.time()
+        with self.lock:
+            preferida = self.estado["preferida"]
+            if preferida not in ESTRATEGIAS or ahora - self.estado["exito_en"] > self.vigencia:
+                preferida = None
+            orden = [preferida] if preferida and self._disponible(preferida, ahora) else []
+            orden += [e for e in ESTRATEGIAS if e != preferida and self._disponible(e, ahora)]
+        return orden or list(ESTRATEGIAS)
+
+    def registrar(self, estrategia, exito, bloqueo=True):
+        """Anota el resultado de probar un método y abre o cierra su circuito
+
+        Un fallo con bloqueo=False (ver es_bloqueo) no se cuenta.
+        """
+        if not exito and not bloqueo:
+            return
+        ahora = time.time()
+        with self.lock:
+            metodo = self._metodo(estrategia)
+            if exito:
+                metodo["exitos"] += 1
+                metodo["fallos_seguidos"] = 0
+                metodo["aperturas"] = 0
+                metodo["abierto_hasta"] = 0
+                self.estado["preferida"] = estrategia
+                self.estado["exito_en"] = ahora
+                return
+            metodo["fallos"] += 1
+            metodo["fallos_seguidos"] += 1
+            if metodo["fallos_seguidos"] >= self.umbral_fallos:
+                metodo["aperturas"] += 1
+                espera = min(ENFRIAMIENTO_MAX, self.enfriamiento * 2 ** (metodo["aperturas"] - 1))
+                metodo["abierto_hasta"] = ahora + espera
+                metodo["fallos_seguidos"] = 0
+            if self.estado["preferida"] == estrategia:
+                self.estado["preferida"] = None
+
+    def contabilizar(self, probadas, ganadora=None):
+        """Suma lo que habría costado el recorrido fijo (todos los métodos en orden hasta el que funcionó)
+
+        Cuenta las solicitudes y pausas de los métodos que ese recorrido
+        habría probado y que esta vez no se probaron.
+        """
+        recorrido = ESTRATEGIAS[:ESTRATEGIAS.index(ganadora) + 1] if ganadora else ESTRATEGIAS
+        with self.lock:
+            for estrategia in recorrido:
+                if estrategia not in probadas:
+                    solicitudes, espera = COSTE[estrategia]
+                    self.solicitudes_evitadas += solicitudes
+                    self.espera_evitada += espera
+
+    def omitir(self, estrategia, veces=1):
+        """Cuenta como evitadas veces pruebas de un método que se saltó fuera de buscar_documentos"""
+        solicitudes, espera = COSTE[estrategia]
+        with self.lock:
+            self.solicitudes_evitadas += solicitudes * veces
+            self.espera_evitada += espera * veces
+
+    def _combinar(self, guardado):
+        """Combina el estado de este proceso con el que otro haya guardado entretanto
+
+        De cada método se conserva el circuito que siga abierto más tiempo y
+        como preferido queda el del éxito más reciente.
+        """
+        with self.lock:
+            combinado = json.loads(json.dumps(self.estado))
+        if not guardado:
+            return combinado
+        for estrategia, metodo in guardado.get("metodos", {}).items():
+            propio = combinado["metodos"].setdefault(estrategia, metodo)
+            if metodo.get("abierto_hasta", 0) > propio.get("abierto_hasta", 0):
+                propio["abierto_hasta"] = metodo["abierto_hasta"]
+                propio["aperturas"] = max(propio.get("aperturas", 0), metodo.get("aperturas", 0))
+        if guardado.get("exito_en", 0) > combinado["exito_en"]:
+            combinado["preferida"] = guardado.get("preferida")
+            combinado["exito_en"] = guardado["exito_en"]
+        return combinado
+
+    def guardar(self):
+        """Combina el estado con el guardado en el EstadoSesion, si lo hay"""
+        if self.estado_sesion is not None:
+            self.estado_sesion.actualizar("estrategias", self._combinar)
+
+    def resumen(self):
+        """Método preferido, aciertos/fallos de cada uno y lo que se evitó"""
+        ahora = time.time()
+        with self.lock:
+            partes = []
+            for estrategia in ESTRATEGIAS:
+                metodo = self.estado["metodos"].get(estrategia)
+                if not metodo:
+                    continue
+                abierto = " (circuito abierto)" if metodo["abierto_hasta"] > ahora else ""
+                partes.append(f"{estrategia} {metodo['exitos']}/{metodo['exitos'] + metodo['fallos']}{abierto}")
+            return (f"preferido {self.estado['preferida'] or 'ninguno'}; " + ", ".join(partes) +
+                    f"; {self.solicitudes_evitadas} solicitudes y {self.espera_evitada:.0f} s de pausa evitadas")
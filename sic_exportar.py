@@ -0,0 +1,127 @@
+import os
+import time
+import uuid
+import threading
+
+# pyarrow es opcional (solo lo necesita la exportación columnar) y tarda en
+# importarse: se carga al crear el primer exportador
+pa = None
+ds = None
+
+# Registros que se acumulan en memoria antes de escribir un lote
+TAMANO_LOTE = 5000
+
+# Columnas por las que se particiona el dataset (directorios ano=.../tipo_providencia=...)
+COLUMNAS_PARTICION = ["ano", "tipo_providencia"]
+
+VALOR_DESCONOCIDO = "desconocido"
+
+
+def _cargar_pyarrow():
+    """Importa pyarrow la primera vez que se necesita"""
+    global pa, ds
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.dataset
+        except ImportError:
+            raise ImportError("La exportación columnar requiere pyarrow: pip install pyarrow") from None
+        pa, ds = pyarrow, pyarrow.dataset
+
+
+def esquema():
+    """Esquema Arrow de los registros de obtener_ids_documentos"""
+    _cargar_pyarrow()
+    return pa.schema([
+        ("id", pa.string()),
+        ("ano", pa.string()),
+        ("numero", pa.string()),
+        ("tipo_providencia", pa.string()),
+        ("fecha", pa.string()),
+        ("partes", pa.list_(pa.string())),
+        ("categorias", pa.list_(pa.string())),
+        ("descriptores", pa.list_(pa.string())),
+        ("resumen", pa.string()),
+        ("archivos", pa.list_(pa.struct([("tipo", pa.string()), ("path_s3", pa.string())]))),
+        ("terminos", pa.string()),
+        ("exportado", pa.timestamp("s")),
+    ])
+
+
+def _valor_particion(valor):
+    """Valor apto para nombre de directorio (sin barras ni vacío)"""
+    valor = str(valor or "").strip().replace("/", "-")
+    return valor or VALOR_DESCONOCIDO
+
+
+class ExportadorColumnar:
+    def __init__(self, directorio, tamano_lote=TAMANO_LOTE):
+        """Dataset Parquet particionado por año y tipo de providencia con los metadatos de los documentos
+
+        Los registros se acumulan y se escriben por lotes como archivos nuevos
+        dentro de cada partición, así que el dataset crece entre ejecuciones
+        sin reescribirse. Los IDs ya exportados se leen de la columna id al
+        abrirlo para no duplicar documentos. Se puede consultar con
+        pyarrow.dataset, DuckDB o Polars sin cargarlo entero en memoria.
+        """
+        _cargar_pyarrow()
+        self.directorio = directorio
+        self.tamano_lote = tamano_lote
+        self.esquema = esquema()
+        self.particion = ds.partitioning(
+            pa.schema([(columna, pa.string()) for columna in COLUMNAS_PARTICION]), flavor="hive"
+        )
+        self.lock = threading.Lock()
+        self.pendientes = []
+        self.escritos = 0
+        self.lotes = 0
+
+        self.exportados = set()
+        if os.path.isdir(directorio):
+            existente = ds.dataset(directorio, format="parquet", partitioning=self.particion)
+            self.exportados = set(existente.to_table(columns=["id"]).column("id").to_pylist())
+
+    def agregar(self, doc, terminos=""):
+        """Añade un documento (formato de obtener_ids_documentos); escribe un lote si se llenó"""
+        with self.lock:
+            if doc["id"] in self.exportados:
+                return
+            self.exportados.add(doc["id"])
+            self.pendientes.append({
+                "id": doc["id"],
+                "ano": _valor_particion(doc.get("año")),
+                "numero": str(doc.get("numero", "")),
+                "tipo_providencia": _valor_particion(doc.get("tipo_providencia")),
+                "fecha": doc.get("fecha", ""),
+                "partes": doc.get("partes", []),
+                "categorias": doc.get("categorias", []),
+                "descriptores": doc.get("descriptores", []),
+                "resumen": doc.get("resumen", ""),
+                "archivos": doc.get("archivos", []),
+                "terminos": terminos,
+                "exportado": int(time.time()),
+            })
+            if len(self.pendientes) >= self.tamano_lote:
+                self._escribir()
+
+    def vaciar(self):
+        """Escribe los registros pendientes"""
+        with self.lock:
+            self._escribir()
+
+    def _escribir(self):
+        if not self.pendientes:
+            return
+        tabla = pa.Table.from_pylist(self.pendientes, schema=self.esquema)
+        ds.write_dataset(
+            tabla, self.directorio, format="parquet", partitioning=self.particion,
+            basename_template=f"lote-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore"
+        )
+        self.escritos += len(self.pendientes)
+        self.lotes += 1
+        self.pendientes = []
+
+    def cerrar(self):
+        """Escribe lo pendiente; el dataset no mantiene recursos abiertos"""
+        self.vaciar()
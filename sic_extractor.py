@@ -0,0 +1,179 @@
+import re
+import functools
+import urllib.parse
+from html.parser import HTMLParser
+
+# Expresiones precompiladas (antes se compilaban en cada llamada)
+RE_ENLACE_DOCUMENTO = re.compile(r'\.(pdf|docx?|xlsx?)$', re.I)
+RE_CLASE_CONTENEDOR = re.compile(r'(documento|archivo|file|document|content)', re.I)
+RE_URL_SCRIPT = re.compile(r'(https?://[^\s"\'<>]+\.(pdf|docx?|xlsx?|zip))')
+RE_URL_S3 = re.compile(r'(https?://[^\s"\'<>]+amazonaws\.com[^\s"\'<>]+)')
+
+ETIQUETAS_CONTENEDOR = {"div", "section"}
+
+
+class _Recolector:
+    """Acumula los enlaces en cuatro grupos para conservar el orden de la extracción original
+
+    1. enlaces <a> a documentos, 2. enlaces dentro de contenedores de
+    documentos, 3. iframes, 4. URLs embebidas en scripts. La deduplicación se
+    hace con un conjunto sobre las URLs ya absolutas.
+    """
+
+    def __init__(self, url_base):
+        self.url_base = url_base
+        self.grupos = ([], [], [], [])
+        self.vistos = set()
+
+    def agregar(self, grupo, url, absoluta=False):
+        if not url:
+            return
+        if not absoluta and not url.startswith(('http://', 'https://')):
+            url = urllib.parse.urljoin(self.url_base, url)
+        if url not in self.vistos:
+            self.vistos.add(url)
+            self.grupos[grupo].append(url)
+
+    def anchor(self, href, en_contenedor):
+        if href and RE_ENLACE_DOCUMENTO.search(href):
+            self.agregar(0, href)
+        elif en_contenedor:
+            self.agregar(1, href)
+
+    def script(self, texto):
+        if not texto:
+            return
+        for url, _ in RE_URL_SCRIPT.findall(texto):
+            self.agregar(3, url, absoluta=True)
+        for url in RE_URL_S3.findall(texto):
+            self.agregar(3, url, absoluta=True)
+
+    def enlaces(self):
+        return [url for grupo in self.grupos for url in grupo]
+
+
+def _es_contenedor(etiqueta, clase):
+    return etiqueta in ETIQUETAS_CONTENEDOR and bool(clase) and RE_CLASE_CONTENEDOR.search(clase) is not None
+
+
+class _EscanerHTML(HTMLParser):
+    """Recorrido único del HTML con el parser de la biblioteca estándar"""
+
+    def __init__(self, recolector):
+        super().__init__(convert_charrefs=True)
+        self.recolector = recolector
+        # Pila de div/section abiertos: True si es contenedor de documentos
+        self.pila = []
+        self.contenedores_abiertos = 0
+        self.en_script = False
+        self.texto_script = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ETIQUETAS_CONTENEDOR:
+            es_contenedor = _es_contenedor(tag, dict(attrs).get("class"))
+            self.pila.append(es_contenedor)
+            self.contenedores_abiertos += es_contenedor
+        elif tag == "a":
+            self.recolector.anchor(dict(attrs).get("href"), self.contenedores_abiertos > 0)
+        elif tag == "iframe":
+            self.recolector.agregar(2, dict(attrs).get("src"))
+        elif tag == "script":
+            self.en_script = True
+            self.texto_script = []
+
+    def handle_endtag(self, tag):
+        if tag in ETIQUETAS_CONTENEDOR and self.pila:
+            self.contenedores_abiertos -= self.pila.pop()
+        elif tag == "script" and self.en_script:
+            self.en_script = False
+            self.recolector.script("".join(self.texto_script))
+
+    def handle_data(self, data):
+        if self.en_script:
+            self.texto_script.append(data)
+
+
+def _extraer_html_parser(html, recolector):
+    escaner = _EscanerHTML(recolector)
+    escaner.feed(html)
+    escaner.close()
+
+
+def _extraer_lxml(html, recolector):
+    from lxml import etree
+
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    parser.feed(html)
+    parser.close()
+    contenedores_abiertos = 0
+    pila = []
+    for evento, elemento in parser.read_events():
+        tag = elemento.tag if isinstance(elemento.tag, str) else ""
+        if evento == "start":
+            if tag in ETIQUETAS_CONTENEDOR:
+                es_contenedor = _es_contenedor(tag, elemento.get("class"))
+                pila.append(es_contenedor)
+                contenedores_abiertos += es_contenedor
+            elif tag == "a":
+                recolector.anchor(elemento.get("href"), contenedores_abiertos > 0)
+            elif tag == "iframe":
+                recolector.agregar(2, elemento.get("src"))
+        else:
+            if tag in ETIQUETAS_CONTENEDOR and pila:
+                contenedores_abiertos -= pila.pop()
+            elif tag == "script":
+                recolector.script(elemento.text)
+
+
+def _extraer_selectolax(html, recolector):
+    from selectolax.lexbor import LexborHTMLParser
+
+    arbol = LexborHTMLParser(html)
+    for nodo in arbol.css("a, iframe, script"):
+        if nodo.tag == "a":
+            en_contenedor = False
+            padre = nodo.parent
+            while padre is not None:
+                if _es_contenedor(padre.tag, padre.attributes.get("class")):
+                    en_contenedor = True
+                    break
+                padre = padre.parent
+            recolector.anchor(nodo.attributes.get("href"), en_contenedor)
+        elif nodo.tag == "iframe":
+            recolector.agregar(2, nodo.attributes.get("src"))
+        else:
+            recolector.script(nodo.text(deep=True))
+
+
+BACKENDS = {
+    "selectolax": _extraer_selectolax,
+    "lxml": _extraer_lxml,
+    "html.parser": _extraer_html_parser,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def backends_disponibles():
+    """Backends cuyo parser está instalado, del más rápido al más lento"""
+    disponibles = []
+    for nombre, modulo in (("selectolax", "selectolax.lexbor"), ("lxml", "lxml.etree")):
+        try:
+            __import__(modulo)
+            disponibles.append(nombre)
+        except ImportError:
+            pass
+    disponibles.append("html.parser")
+    return tuple(disponibles)
+
+
+def extraer_enlaces(html, url_base, backend=None):
+    """Extrae en una sola pasada los enlaces a documentos de una página del visor
+
+    backend puede ser "selectolax", "lxml" o "html.parser"; por defecto se usa
+    el más rápido instalado.
+    """
+    if backend is None:
+        backend = backends_disponibles()[0]
+    recolector = _Recolector(url_base)
+    BACKENDS[backend](html, recolector)
+    return recolector.enlaces()
@@ -0,0 +1,189 @@
+import random
+import socket
+import threading
+import requests
+from urllib3.util.retry import Retry
+from sic_limitador import LimitadorTasa, AdaptadorLimitado
+
+# Lista de User-Agents comunes para simular diferentes navegadores
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:127.0) Gecko/20100101 Firefox/127.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15"
+]
+
+# Cabeceras comunes de las solicitudes a la SIC (el User-Agent se elige de USER_AGENTS)
+CABECERAS_BASE = {
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
+    "Referer": "https://relatoria.sic.gov.co/",
+    "Origin": "https://relatoria.sic.gov.co",
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Site": "same-origin",
+    "Connection": "keep-alive"
+}
+
+# Conexiones vivas por host. Los hosts de la SIC se usan de a pocas a la vez;
+# las descargas de S3 y las firmas escalan con el número de workers, así que
+# para esos hosts el pool nunca es menor que workers.
+POOL_POR_HOST = {
+    "relatoria.sic.gov.co": 4,
+    "gestor.relatoria.sic.gov.co": 10,
+    "m0s03uyzg3.execute-api.us-east-1.amazonaws.com": 10,
+    "s3.amazonaws.com": 10,
+}
+POOL_POR_DEFECTO = 10
+
+# Hosts distintos cuyos pools se mantienen abiertos a la vez (los buckets de
+# S3 con estilo virtual-host cuentan como hosts propios)
+POOLS_ABIERTOS = 32
+
+# Reintentos de errores de conexión (urllib3) y de respuestas de saturación (AdaptadorLimitado)
+REINTENTOS = 3
+FACTOR_ESPERA = 0.5
+
+# TCP keep-alive para que las conexiones inactivas entre páginas no se caigan
+OPCIONES_SOCKET = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+class SesionSIC(requests.Session):
+    def __init__(self):
+        """requests.Session que ejecuta una preparación antes de su primera solicitud
+
+        La preparación (p. ej. visitar la página principal para obtener
+        cookies) se asigna con al_primer_uso y se ejecuta una sola vez, aunque
+        varios hilos hagan su primera solicitud a la vez; así crear el
+        descargador no cuesta una solicitud si luego no se usa la red.
+        """
+        super().__init__()
+        self.preparacion = None
+        self.lock_preparacion = threading.Lock()
+
+    def al_primer_uso(self, funcion):
+        self.preparacion = funcion
+
+    def request(self, *args, **kwargs):
+        if self.preparacion is not None:
+            with self.lock_preparacion:
+                # La preparación puede usar la propia sesión: se quita antes de ejecutarla
+                preparacion, self.preparacion = self.preparacion, None
+                if preparacion:
+                    preparacion()
+        return super().request(*args, **kwargs)
+
+
+class AdaptadorHTTP(AdaptadorLimitado):
+    def __init__(self, limitador, *args, socket_options=None, **kwargs):
+        """AdaptadorLimitado que además fija opciones de socket (keep-alive) en su pool"""
+        self.socket_options = socket_options
+        super().__init__(limitador, *args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def crear_reintentos(reintentos=REINTENTOS, factor_espera=FACTOR_ESPERA):
+    """Política de reintentos de urllib3 para los adaptadores
+
+    Solo cubre errores de conexión y de lectura, con espera exponencial. POST
+    se incluye porque las búsquedas (_search) solo leen. Los códigos de
+    saturación no se reintentan aquí: urllib3 lo haría dentro del adaptador,
+    sin pasar por el limitador de tasa, que vería solo la respuesta final;
+    de esos se encarga AdaptadorLimitado.
+    """
+    return Retry(
+        total=reintentos,
+        connect=reintentos,
+        read=reintentos,
+        status=0,
+        backoff_factor=factor_espera,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+        raise_on_status=False
+    )
+
+
+def crear_sesion(limitador=None, workers=1, pool_por_host=None, reintentos=REINTENTOS, cabeceras=None,
+                 user_agent=None):
+    """Crea la sesión HTTP compartida por los descargadores
+
+    Cada host de pool_por_host (por defecto POOL_POR_HOST) recibe su propio
+    adaptador con un pool de al menos workers conexiones; el resto usa un
+    adaptador común. Todos pasan por el limitador de tasa, reintentan los
+    errores de conexión según crear_reintentos y las respuestas de
+    saturación en el propio adaptador, y mantienen las conexiones vivas para
+    reutilizar TCP y TLS entre búsqueda, firmas y descargas.
+    """
+    limitador = limitador or LimitadorTasa()
+    if pool_por_host is None:
+        pool_por_host = POOL_POR_HOST
+    workers = max(1, workers)
+
+    session = SesionSIC()
+    session.headers.update(CABECERAS_BASE if cabeceras is None else cabeceras)
+    session.headers["User-Agent"] = user_agent or random.choice(USER_AGENTS)
+
+    def adaptador(tamano):
+        return AdaptadorHTTP(limitador, pool_connections=POOLS_ABIERTOS, pool_maxsize=max(tamano, workers),
+                             max_retries=crear_reintentos(reintentos), reintentos_saturacion=reintentos,
+                             socket_options=OPCIONES_SOCKET)
+
+    comun = adaptador(POOL_POR_DEFECTO)
+    session.mount("https://", comun)
+    session.mount("http://", comun)
+    for host, tamano in pool_por_host.items():
+        session.mount(f"https://{host}/", adaptador(tamano))
+    return session
+
+
+def preparar_al_primer_uso(session, funcion):
+    """Ejecuta funcion antes de la primera solicitud de la sesión (o ya, si no es una SesionSIC)"""
+    if isinstance(session, SesionSIC):
+        session.al_primer_uso(funcion)
+    else:
+        funcion()
+
+
+def crear_cliente_async(concurrencia, http2=True, cabeceras=None, user_agent=None, **kwargs):
+    """Equivalente de crear_sesion para httpx.AsyncClient (usado por sic_async)
+
+    El pool admite concurrencia * 4 conexiones en total y deja vivas
+    concurrencia * 2; los reintentos de conexión los hace el transporte.
+    kwargs se pasan tal cual a httpx.AsyncClient (transport, event_hooks, ...).
+    """
+    import httpx
+
+    headers = dict(CABECERAS_BASE if cabeceras is None else cabeceras)
+    headers["User-Agent"] = user_agent or random.choice(USER_AGENTS)
+    limites = httpx.Limits(max_connections=concurrencia * 4, max_keepalive_connections=concurrencia * 2)
+    if kwargs.get("transport") is None:
+        kwargs["transport"] = httpx.AsyncHTTPTransport(http2=http2, limits=limites, retries=REINTENTOS,
+                                                       socket_options=OPCIONES_SOCKET)
+    return httpx.AsyncClient(
+        http2=http2,
+        headers=headers,
+        limits=limites,
+        timeout=httpx.Timeout(60.0, connect=15.0),
+        follow_redirects=True,
+        **kwargs
+    )
+
+
+class AdaptadorSinRed(requests.adapters.BaseAdapter):
+    """Adaptador del modo offline: rechaza cualquier solicitud que llegue a la red"""
+
+    def send(self, request, **kwargs):
+        raise requests.exceptions.ConnectionError(f"Modo offline: no se accede a {request.url}", request=request)
+
+    def close(self):
+        pass
+
+
+def desconectar_sesion(session):
+    """Sustituye todos los adaptadores de la sesión por AdaptadorSinRed (modo offline)"""
+    sin_red = AdaptadorSinRed()
+    for prefijo in list(session.adapters):
+        session.mount(prefijo, sin_red)
+    return session
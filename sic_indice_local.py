@@ -0,0 +1,253 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from sic_texto import extraer_texto, ruta_texto, texto_vigente
+
+# Columnas indexadas y su peso en bm25, equivalentes a los boosts de la consulta remota
+COLUMNAS = [
+    ("doc_id", 0.0),
+    ("ano", 9.0),
+    ("numero", 10.0),
+    ("tipo_providencia", 2.0),
+    ("fecha", 0.0),
+    ("partes", 3.0),
+    ("categorias", 5.0),
+    ("descriptores", 6.0),
+    ("resumen", 1.5),
+    ("texto", 1.5),
+    ("archivos", 1.0),
+]
+
+# Nombres de campo de Elasticsearch aceptados en las consultas (campo:valor)
+ALIAS_CAMPOS = {
+    "informacion.ano_expediente": "ano",
+    "ano_expediente": "ano",
+    "año": "ano",
+    "informacion.numero_expediente": "numero",
+    "numero_expediente": "numero",
+    "informacion.tipo_providencia": "tipo_providencia",
+    "partes.nombre": "partes",
+    "tesauro.categoria.nombre": "categorias",
+    "tesauro.descriptor.nombre": "descriptores",
+    "documento_resumen.transcripcion": "resumen",
+    "archivos.contenido_archivo": "texto",
+}
+
+OPERADORES = {"AND", "OR", "NOT"}
+
+RE_TERMINO = re.compile(r'(?:(\w[\w.]*):)?("[^"]*"|[^\s()"]+|[()])')
+
+
+def traducir_consulta(consulta):
+    """Traduce una consulta estilo query_string a la sintaxis MATCH de FTS5
+
+    Las palabras se citan para que la puntuación no rompa la consulta, se
+    conservan AND/OR/NOT, los paréntesis, las frases entre comillas, los
+    prefijos (palabra*) y los filtros campo:valor. Como en la búsqueda
+    remota, los términos sin operador se combinan con AND.
+    """
+    columnas = {nombre for nombre, _ in COLUMNAS}
+    partes = []
+    for campo, termino in RE_TERMINO.findall(consulta):
+        if termino in ("(", ")") or (termino in OPERADORES and not campo):
+            partes.append(termino)
+            continue
+        prefijo = termino.endswith("*") and not termino.startswith('"')
+        texto = termino.strip('"').rstrip("*").replace('"', "")
+        if not texto:
+            continue
+        traducido = f'"{texto}"' + ("*" if prefijo else "")
+        campo = ALIAS_CAMPOS.get(campo, campo)
+        if campo in columnas:
+            traducido = f"{campo} : {traducido}"
+        partes.append(traducido)
+    return " ".join(partes)
+
+
+class IndiceLocal:
+    def __init__(self, ruta):
+        """Índice de texto completo (SQLite FTS5) de los documentos descargados
+
+        Cada documento se indexa con sus metadatos (partes, categorías,
+        descriptores, resumen...) y el texto de sus archivos descargados. Una
+        firma de los metadatos y de los archivos permite reindexar solo los
+        documentos que cambiaron.
+        """
+        self.ruta = ruta
+        self.directorio = os.path.dirname(os.path.abspath(ruta))
+        self.lock = threading.Lock()
+
+        self.conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS documentos USING fts5(
+                {", ".join(nombre for nombre, _ in COLUMNAS)},
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS indexados (
+                doc_id TEXT PRIMARY KEY,
+                fila INTEGER NOT NULL,
+                firma TEXT NOT NULL,
+                actualizado REAL NOT NULL
+            );
+        """)
+        self.conexion.commit()
+
+    def _firma(self, doc, archivos):
+        # Que aparezca el texto extraído de un archivo también obliga a reindexar
+        con_texto = [os.path.exists(ruta_texto(self.directorio, doc["id"], archivo[0])) for archivo in archivos]
+        datos = json.dumps([doc, [list(archivo) for archivo in archivos], con_texto], sort_keys=True,
+                           ensure_ascii=False)
+        return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+    def _ruta_archivo(self, nombre_archivo):
+        """Ruta del archivo tal como se registró o, si se movió el directorio, junto al índice"""
+        if os.path.exists(nombre_archivo):
+            return nombre_archivo
+        return os.path.join(self.directorio, os.path.basename(nombre_archivo))
+
+    def texto_archivo(self, doc_id, nombre_archivo):
+        """Texto de un archivo descargado: el ya extraído por sic_texto o, si no está, extraído aquí"""
+        ruta = self._ruta_archivo(nombre_archivo)
+        ruta_txt = ruta_texto(self.directorio, doc_id, nombre_archivo)
+        if texto_vigente(ruta, ruta_txt):
+            with open(ruta_txt, encoding="utf-8") as f:
+                return f.read()
+        if not os.path.exists(ruta):
+            return ""
+        return extraer_texto(ruta) or ""
+
+    def indexar_documento(self, doc, archivos=()):
+        """Indexa un documento y sus archivos descargados [(nombre_archivo, bytes, sha256)]
+
+        Devuelve True si se (re)indexó y False si no había cambios.
+        """
+        firma = self._firma(doc, archivos)
+        with self.lock:
+            fila = self.conexion.execute("SELECT fila, firma FROM indexados WHERE doc_id = ?", (doc["id"],)).fetchone()
+        if fila and fila[1] == firma:
+            return False
+
+        # La extracción de texto es lo costoso: fuera del lock
+        texto = "\n".join(filter(None, (self.texto_archivo(doc["id"], archivo[0]) for archivo in archivos)))
+        valores = (
+            doc["id"], doc.get("año", ""), doc.get("numero", ""), doc.get("tipo_providencia", ""),
+            doc.get("fecha", ""), "\n".join(doc.get("partes", [])), "\n".join(doc.get("categorias", [])),
+            "\n".join(doc.get("descriptores", [])), doc.get("resumen", ""), texto,
+            "\n".join(os.path.basename(archivo[0]) for archivo in archivos)
+        )
+        with self.lock:
+            if fila:
+                self.conexion.execute("DELETE FROM documentos WHERE rowid = ?", (fila[0],))
+            cursor = self.conexion.execute(
+                f"INSERT INTO documentos VALUES ({', '.join('?' * len(COLUMNAS))})", valores
+            )
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO indexados (doc_id, fila, firma, actualizado) VALUES (?, ?, ?, ?)",
+                (doc["id"], cursor.lastrowid, firma, time.time())
+            )
+            self.conexion.commit()
+        return True
+
+    def actualizar(self, manifiesto):
+        """Indexa los documentos del manifiesto que sean nuevos o hayan cambiado
+
+        Devuelve (indexados, sin_cambios).
+        """
+        indexados = 0
+        sin_cambios = 0
+        for doc_id, doc in manifiesto.documentos_registrados():
+            if self.indexar_documento(doc, manifiesto.archivos_completados(doc_id)):
+                indexados += 1
+            else:
+                sin_cambios += 1
+        return indexados, sin_cambios
+
+    def buscar(self, consulta, limite=20):
+        """Busca en el índice y devuelve los documentos ordenados por relevancia (bm25)"""
+        pesos = ", ".join(str(peso) for _, peso in COLUMNAS)
+        with self.lock:
+            filas = self.conexion.execute(f"""
+                SELECT doc_id, ano, numero, tipo_providencia, fecha, archivos,
+                       snippet(documentos, -1, '[', ']', '…', 12), bm25(documentos, {pesos}) AS puntaje
+                FROM documentos WHERE documentos MATCH ? ORDER BY puntaje LIMIT ?
+            """, (traducir_consulta(consulta), limite)).fetchall()
+        return [{
+            "id": doc_id,
+            "año": ano,
+            "numero": numero,
+            "tipo_providencia": tipo,
+            "fecha": fecha,
+            "archivos": archivos.split("\n") if archivos else [],
+            "fragmento": fragmento,
+            "puntaje": -puntaje
+        } for doc_id, ano, numero, tipo, fecha, archivos, fragmento, puntaje in filas]
+
+    def total(self):
+        """Número de documentos indexados"""
+        with self.lock:
+            return self.conexion.execute("SELECT COUNT(*) FROM indexados").fetchone()[0]
+
+    def cerrar(self):
+        """Cierra la conexión a la base de datos"""
+        with self.lock:
+            self.conexion.close()
+
+
+# Función principal para ejecutar desde línea de comandos
+def main():
+    import argparse
+    from sic_manifiesto import ManifiestoTrabajo
+
+    parser = argparse.ArgumentParser(description='Índice local de los documentos SIC descargados.')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    indexar = subparsers.add_parser('indexar', help='Indexar los documentos nuevos o modificados del directorio')
+    indexar.add_argument('--dir', default='documentos_sic', help='Directorio de los documentos descargados')
+
+    buscar = subparsers.add_parser('buscar-local', help='Buscar en el índice local, sin red')
+    buscar.add_argument('terminos', help='Términos de búsqueda (admite AND/OR/NOT, "frases", prefijo* y campo:valor)')
+    buscar.add_argument('--dir', default='documentos_sic', help='Directorio de los documentos descargados')
+    buscar.add_argument('--max', type=int, default=20, help='Número máximo de resultados')
+    buscar.add_argument('--json', action='store_true', help='Mostrar los resultados como JSON')
+
+    args = parser.parse_args()
+
+    indice = IndiceLocal(os.path.join(args.dir, ".indice.sqlite"))
+    try:
+        if args.comando == 'indexar':
+            manifiesto = ManifiestoTrabajo(os.path.join(args.dir, ".manifiesto.sqlite"))
+            inicio = time.perf_counter()
+            indexados, sin_cambios = indice.actualizar(manifiesto)
+            manifiesto.cerrar()
+            print(f"✓ {indexados} documentos indexados, {sin_cambios} sin cambios "
+                  f"({time.perf_counter() - inicio:.1f} s, {indice.total()} en el índice)")
+            return
+
+        inicio = time.perf_counter()
+        try:
+            resultados = indice.buscar(args.terminos, args.max)
+        except sqlite3.OperationalError as e:
+            print(f"× Consulta no válida: {e}")
+            return
+        duracion = (time.perf_counter() - inicio) * 1000
+
+        if args.json:
+            print(json.dumps(resultados, indent=2, ensure_ascii=False))
+            return
+        print(f"{len(resultados)} resultados en {duracion:.1f} ms ({indice.total()} documentos indexados)")
+        for i, doc in enumerate(resultados, 1):
+            print(f"\n[{i}] {doc['año']}_{doc['numero']}_{doc['tipo_providencia']} (ID: {doc['id']}) {doc['fecha']}")
+            print(f"  {doc['fragmento']}")
+            for archivo in doc["archivos"]:
+                print(f"  - {archivo}")
+    finally:
+        indice.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,135 @@
+import time
+
+# Instante en que se empezó a cargar este módulo (para --profile-startup)
+INICIO = time.perf_counter()
+
 import os
 import sys
-import time
 import json
 import argparse
+from contextlib import contextmanager
+
+
+class PerfilArranque:
+    def __init__(self, activo=False):
+        """Mide las etapas del arranque (importaciones e inicialización) para --profile-startup"""
+        self.activo = activo
+        self.etapas = []
+
+    @contextmanager
+    def medir(self, etapa):
+        modulos = len(sys.modules)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas.append((etapa, time.perf_counter() - inicio, len(sys.modules) - modulos))
+
+    def anotar(self, etapa, inicio):
+        """Registra una etapa que empezó en inicio (perf_counter) y acaba ahora"""
+        self.etapas.append((etapa, time.perf_counter() - inicio, 0))
+
+    def imprimir(self, notas=()):
+        if not self.activo:
+            return
+        print("\nPerfil de arranque:")
+        for etapa, segundos, modulos in self.etapas:
+            detalle = f" ({modulos} módulos cargados)" if modulos else ""
+            print(f"  {etapa:<28}{segundos * 1000:>8.1f} ms{detalle}")
+        print(f"  {'total desde el inicio':<28}{(time.perf_counter() - INICIO) * 1000:>8.1f} ms")
+        for nota in notas:
+            print(f"  {nota}")
+        print("  (python -X importtime da el detalle por módulo)\n")
+        self.activo = False
+
 
 def main():
+    perfil = PerfilArranque()
+    perfil.anotar("carga de sic_integrado", INICIO)
+    inicio_argumentos = time.perf_counter()
+
     parser = argparse.ArgumentParser(description='Descargador de documentos de la SIC.')
-    parser.add_argument('terminos', help='Términos de búsqueda')
+    parser.add_argument('terminos', nargs='?', help='Términos de búsqueda')
+    parser.add_argument('--consultas', default=None,
+                        help='Archivo con una búsqueda por línea; se descargan con un solo descargador y sin repetir documentos')
     parser.add_argument('--max', type=int, default=None, help='Número máximo de documentos a procesar')
     parser.add_argument('--dir', default='documentos_sic', help='Directorio de salida')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Número de documentos a procesar en paralelo (con Selenium, navegadores)')
+    parser.add_argument('--resume', action='store_true', help='Reanudar una ejecución interrumpida desde el manifiesto')
+    parser.add_argument('--exportar', action='store_true',
+                        help='Añadir los metadatos a un dataset Parquet en <dir>/metadatos (requiere pyarrow)')
+    parser.add_argument('--sync', action='store_true',
+                        help='Sincronizar: solo documentos posteriores a la última ejecución de cada búsqueda')
     parser.add_argument('--selenium', action='store_true', help='Usar Selenium para la búsqueda')
+    parser.add_argument('--async', dest='usar_async', action='store_true',
+                        help='Usar el motor asíncrono (httpx); --workers indica la concurrencia por etapa')
+    parser.add_argument('--estado', default=None, metavar='RUTA',
+                        help='Archivo de estado de sesión (cookies, User-Agent, métodos de búsqueda) compartido '
+                             'entre procesos y con Selenium; por defecto <dir>/.estado_sesion.json')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Mostrar el tiempo de importaciones e inicialización antes de empezar')
     
     args = parser.parse_args()
+    perfil.anotar("argumentos", inicio_argumentos)
+    perfil.activo = args.profile_startup
+    if not args.terminos and not args.consultas:
+        parser.error("indique términos de búsqueda o --consultas")
+    if (args.consultas or args.sync or args.exportar) and (args.selenium or args.usar_async):
+        parser.error("--consultas, --sync y --exportar solo están disponibles con el método de API síncrono")
     
     # Crear directorio para documentos si no existe
     os.makedirs(args.dir, exist_ok=True)
     
+    # Cookies, User-Agent y métodos de búsqueda comunes a requests, Selenium y otros procesos
+    from sic_estado import EstadoSesion
+    estado = EstadoSesion(args.estado or os.path.join(args.dir, ".estado_sesion.json"))
+    
     # Intentar primero con el método de requests
     if not args.selenium:
         try:
-            from sic_downloader import SICDownloader
             print("Intentando descarga con método de API...")
             
-            downloader = SICDownloader(output_dir=args.dir)
-            downloader.procesar_documentos(
-                terminos_busqueda=args.terminos,
-                max_documentos=args.max
-            )
+            if args.usar_async:
+                with perfil.medir("import sic_async"):
+                    import sic_async
+                perfil.imprimir()
+                sic_async.procesar_documentos(args.terminos, args.dir, max_documentos=args.max,
+                                              reanudar=args.resume, concurrencia=args.workers)
+            else:
+                with perfil.medir("import sic_downloader"):
+                    from sic_downloader import SICDownloader
+                exportador = None
+                if args.exportar:
+                    with perfil.medir("exportador (pyarrow)"):
+                        from sic_exportar import ExportadorColumnar
+                        exportador = ExportadorColumnar(os.path.join(args.dir, "metadatos"))
+                with perfil.medir("SICDownloader()"):
+                    downloader = SICDownloader(output_dir=args.dir, workers=args.workers, exportador=exportador,
+                                               estado=estado)
+                perfil.imprimir(["visita a la página principal: " + (
+                    "omitida (cookies guardadas)" if downloader.cookies_reutilizadas
+                    else "con la primera solicitud")])
+                try:
+                    if args.consultas:
+                        downloader.procesar_consultas(args.consultas, max_documentos=args.max,
+                                                      reanudar=args.resume, sincronizar=args.sync)
+                        return
+                    downloader.procesar_documentos(
+                        terminos_busqueda=args.terminos,
+                        max_documentos=args.max,
+                        reanudar=args.resume,
+                        sincronizar=args.sync
+                    )
+                finally:
+                    if exportador:
+                        exportador.cerrar()
             
             # Verificar si se descargaron documentos
-            archivos = os.listdir(args.dir)
+            # Los archivos ocultos son cachés y manifiestos, y los directorios y .json son
+            # metadatos o texto extraído, no documentos
+            archivos = [a for a in os.listdir(args.dir)
+                        if not a.startswith('.') and not a.endswith('.json') and os.path.isfile(os.path.join(args.dir, a))]
             if not archivos:
                 print("\n⚠ No se descargaron documentos con el método de API. Intentando con Selenium...")
                 usar_selenium = True
@@ -46,12 +146,15 @@ def main():
     # Si falla o se especifica --selenium, usar Selenium
     if usar_selenium:
         try:
-            from sic_browser import SICBrowser
+            with perfil.medir("import sic_browser (selenium)"):
+                from sic_browser import PoolNavegadores
+            perfil.imprimir()
             
-            browser = SICBrowser(headless=True)
+            # Los navegadores se reutilizan: uno busca y hasta --workers descargan en paralelo
+            navegadores = PoolNavegadores(args.workers, headless=True, estado=estado)
             try:
                 print(f"\nBuscando documentos con Selenium para: '{args.terminos}'")
-                resultados = browser.buscar_documentos(args.terminos)
+                resultados = navegadores.buscar_documentos(args.terminos)
                 
                 if not resultados:
                     print("No se encontraron resultados con Selenium.")
@@ -71,36 +174,25 @@ def main():
                 print(f"Resultados guardados en: {resultados_file}")
                 
                 # Procesar los resultados para descargar documentos
+                con_enlace = []
                 for i, doc in enumerate(resultados, 1):
-                    titulo = doc.get("titulo", "")
-                    enlace = doc.get("enlace", "")
-                    doc_id = doc.get("id", "")
-                    
-                    if not enlace:
-                        print(f"[{i}/{len(resultados)}] Sin enlace para documento: {titulo}")
+                    if not doc.get("enlace", ""):
+                        print(f"[{i}/{len(resultados)}] Sin enlace para documento: {doc.get('titulo', '')}")
                         continue
-                    
-                    print(f"\n[{i}/{len(resultados)}] Procesando: {titulo}")
-                    print(f"  URL: {enlace}")
-                    
-                    # Crear nombre base para el archivo
-                    nombre_base = f"{i:02d}"
-                    if doc_id:
-                        nombre_base += f"_{doc_id}"
-                    
-                    # Intentar descargar
-                    resultado = browser.obtener_documento(enlace, args.dir)
-                    
+                    con_enlace.append((i, doc))
+                
+                descargados = navegadores.obtener_documentos([doc["enlace"] for _, doc in con_enlace], args.dir)
+                
+                for (i, doc), resultado in zip(con_enlace, descargados):
+                    print(f"\n[{i}/{len(resultados)}] {doc.get('titulo', '')}")
+                    print(f"  URL: {doc['enlace']}")
                     if resultado:
-                        print(f"  ✓ Documento descargado con éxito.")
+                        print(f"  ✓ Documento descargado con éxito: {resultado}")
                     else:
                         print(f"  × No se pudo descargar el documento.")
-                    
-                    # Esperar entre documentos
-                    time.sleep(2)
                 
             finally:
-                browser.cerrar()
+                navegadores.cerrar()
                 
         except Exception as e:
             print(f"Error al usar Selenium: {e}")
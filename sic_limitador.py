@@ -0,0 +1,170 @@
+import time
+import asyncio
+import threading
+import urllib.parse
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+# Tasas iniciales (solicitudes por segundo) por host. Los hosts de la SIC son
+# los más sensibles; S3 y el endpoint de URLs firmadas toleran bastante más.
+TASAS_POR_HOST = {
+    "relatoria.sic.gov.co": 2.0,
+    "gestor.relatoria.sic.gov.co": 2.0,
+    "execute-api.us-east-1.amazonaws.com": 5.0,
+    "s3.amazonaws.com": 10.0,
+}
+TASA_POR_DEFECTO = 2.0
+
+# Códigos que indican que el servidor pide bajar el ritmo
+CODIGOS_SATURACION = {429, 502, 503, 504}
+
+
+class CuboTokens:
+    def __init__(self, tasa, tasa_min=None, tasa_max=None, capacidad=None):
+        """Token bucket con tasa adaptativa (aumento aditivo, reducción multiplicativa)"""
+        self.tasa = tasa
+        self.tasa_min = tasa_min if tasa_min is not None else tasa / 8
+        self.tasa_max = tasa_max if tasa_max is not None else tasa * 4
+        self.capacidad = capacidad if capacidad is not None else max(1.0, tasa)
+        self.incremento = tasa * 0.05
+        self.tokens = self.capacidad
+        self.ultimo = time.monotonic()
+        self.bloqueado_hasta = 0.0
+        self.lock = threading.Lock()
+
+    def _rellenar(self, ahora):
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+
+    def reservar(self):
+        """Reserva un token y devuelve los segundos que hay que esperar para usarlo"""
+        with self.lock:
+            ahora = time.monotonic()
+            self._rellenar(ahora)
+            self.tokens -= 1
+            espera = max(0.0, -self.tokens / self.tasa)
+            # Un Retry-After del servidor manda sobre el ritmo del cubo
+            return max(espera, self.bloqueado_hasta - ahora)
+
+    def registrar_respuesta(self, codigo, retry_after=None):
+        """Ajusta la tasa según la respuesta: frena ante errores y acelera si todo va bien"""
+        with self.lock:
+            if codigo is None or codigo in CODIGOS_SATURACION:
+                self.tasa = max(self.tasa_min, self.tasa / 2)
+                self.capacidad = max(1.0, self.tasa)
+                self.tokens = min(self.tokens, 0.0)
+                if retry_after:
+                    self.bloqueado_hasta = max(self.bloqueado_hasta, time.monotonic() + retry_after)
+            elif codigo < 400:
+                self.tasa = min(self.tasa_max, self.tasa + self.incremento)
+                self.capacidad = max(1.0, self.tasa)
+
+
+class LimitadorTasa:
+    def __init__(self, tasas=None, tasa_por_defecto=TASA_POR_DEFECTO):
+        """Mantiene un cubo de tokens independiente para cada host"""
+        self.tasas = dict(TASAS_POR_HOST)
+        if tasas:
+            self.tasas.update(tasas)
+        self.tasa_por_defecto = tasa_por_defecto
+        self.cubos = {}
+        self.lock = threading.Lock()
+        self.tiempo_espera = 0.0
+
+    def _tasa_inicial(self, host):
+        if host in self.tasas:
+            return self.tasas[host]
+        # Coincidencia por sufijo (p. ej. m0s03uyzg3.execute-api.us-east-1.amazonaws.com)
+        for sufijo, tasa in self.tasas.items():
+            if host.endswith("." + sufijo):
+                return tasa
+        return self.tasa_por_defecto
+
+    def cubo(self, url):
+        """Devuelve el cubo de tokens correspondiente al host de la URL"""
+        host = urllib.parse.urlsplit(url).hostname or ""
+        with self.lock:
+            if host not in self.cubos:
+                self.cubos[host] = CuboTokens(self._tasa_inicial(host))
+            return self.cubos[host]
+
+    def esperar(self, url):
+        """Bloquea hasta que el host de la URL admita una nueva solicitud"""
+        espera = self.cubo(url).reservar()
+        if espera > 0:
+            with self.lock:
+                self.tiempo_espera += espera
+            time.sleep(espera)
+        return espera
+
+    async def esperar_async(self, url):
+        """Versión para asyncio de esperar: cede el bucle de eventos en lugar de bloquear"""
+        espera = self.cubo(url).reservar()
+        if espera > 0:
+            with self.lock:
+                self.tiempo_espera += espera
+            await asyncio.sleep(espera)
+        return espera
+
+    def registrar(self, url, codigo, retry_after=None):
+        """Informa al limitador del resultado de una solicitud"""
+        self.cubo(url).registrar_respuesta(codigo, parsear_retry_after(retry_after))
+
+
+def parsear_retry_after(valor):
+    """Convierte la cabecera Retry-After (segundos o fecha HTTP) a segundos"""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+        return max(0.0, fecha.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptadorLimitado(HTTPAdapter):
+    def __init__(self, limitador, *args, reintentos_saturacion=0, **kwargs):
+        """Adaptador HTTP que hace pasar cada solicitud de la sesión por el limitador
+
+        Las respuestas de saturación (CODIGOS_SATURACION) se reintentan aquí y
+        no en urllib3, hasta reintentos_saturacion veces: cada intento espera
+        su turno en el limitador y le informa de su código, así que la tasa
+        baja y un Retry-After frena al host antes del siguiente intento. Al
+        agotarlos se devuelve la última respuesta.
+        """
+        self.limitador = limitador
+        self.reintentos_saturacion = reintentos_saturacion
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, *args, **kwargs):
+        espera_total = 0.0
+        intento = 0
+        while True:
+            espera_total += self.limitador.esperar(request.url)
+            try:
+                response = super().send(request, *args, **kwargs)
+            except Exception:
+                self.limitador.registrar(request.url, None)
+                raise
+            self.limitador.registrar(request.url, response.status_code, response.headers.get("Retry-After"))
+            if response.status_code not in CODIGOS_SATURACION or intento >= self.reintentos_saturacion:
+                break
+            intento += 1
+            # Devuelve la conexión al pool antes de repetir
+            response.close()
+        # response.elapsed incluye estas esperas; se dejan anotadas para quien mida la latencia de red
+        response.espera_limitador = espera_total
+        response.reintentos_saturacion = intento
+        return response
+
+
+def montar_limitador(session, limitador, **kwargs_adaptador):
+    """Monta el limitador en una sesión de requests para http y https"""
+    adaptador = AdaptadorLimitado(limitador, **kwargs_adaptador)
+    session.mount("https://", adaptador)
+    session.mount("http://", adaptador)
+    return adaptador
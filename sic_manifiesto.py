@@ -0,0 +1,216 @@
+import json
+import time
+import sqlite3
+import threading
+
+# Estados de un documento: buscado -> resuelto (enlaces del visor conocidos) -> completado | fallido
+# Estados de un archivo: resuelto -> descargando -> completado | fallido
+
+
+class ManifiestoTrabajo:
+    def __init__(self, ruta):
+        """Registro persistente (SQLite) del avance de una descarga para poder reanudarla"""
+        self.ruta = ruta
+        self.lock = threading.Lock()
+
+        self.conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS busquedas (
+                terminos TEXT PRIMARY KEY,
+                completa INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                actualizado REAL NOT NULL,
+                max_documentos INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS documentos (
+                terminos TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                orden INTEGER NOT NULL,
+                metadatos TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                actualizado REAL NOT NULL,
+                PRIMARY KEY (terminos, doc_id)
+            );
+            CREATE TABLE IF NOT EXISTS archivos (
+                nombre_archivo TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                origen TEXT NOT NULL,
+                referencia TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                bytes INTEGER,
+                sha256 TEXT,
+                error TEXT,
+                actualizado REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_archivos_doc ON archivos (doc_id, origen);
+            CREATE TABLE IF NOT EXISTS marcas (
+                terminos TEXT PRIMARY KEY,
+                fecha TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                actualizado REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS nombres (
+                base TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL
+            );
+        """)
+        # Manifiestos anteriores a max_documentos
+        columnas = [fila[1] for fila in self.conexion.execute("PRAGMA table_info(busquedas)")]
+        if "max_documentos" not in columnas:
+            self.conexion.execute("ALTER TABLE busquedas ADD COLUMN max_documentos INTEGER")
+        self.conexion.commit()
+
+    def _ejecutar(self, sql, parametros=()):
+        with self.lock:
+            self.conexion.execute(sql, parametros)
+            self.conexion.commit()
+
+    def _consultar(self, sql, parametros=()):
+        with self.lock:
+            return self.conexion.execute(sql, parametros).fetchall()
+
+    # Búsquedas
+
+    def busqueda_completa(self, terminos, max_documentos=None):
+        """Indica si una ejecución anterior ya obtuvo los documentos de estos términos
+
+        Una búsqueda que se cortó al llegar a su max_documentos solo sirve para
+        pedir como mucho esos mismos documentos; sin límite hace falta la lista entera.
+        """
+        filas = self._consultar("SELECT completa, max_documentos FROM busquedas WHERE terminos = ?", (terminos,))
+        if not filas or not filas[0][0]:
+            return False
+        maximo = filas[0][1]
+        return maximo is None or (max_documentos is not None and max_documentos <= maximo)
+
+    def marcar_busqueda(self, terminos, completa, total=0, max_documentos=None):
+        """Registra el estado de la paginación de una búsqueda
+
+        max_documentos es el límite con el que se cortó; None si se recorrieron todos los resultados.
+        """
+        self._ejecutar(
+            "INSERT OR REPLACE INTO busquedas (terminos, completa, total, actualizado, max_documentos) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (terminos, int(completa), total, time.time(), max_documentos)
+        )
+
+    def total_busqueda(self, terminos):
+        """Total de resultados que informó el índice para la búsqueda"""
+        filas = self._consultar("SELECT total FROM busquedas WHERE terminos = ?", (terminos,))
+        return filas[0][0] if filas else 0
+
+    def marca_agua(self, terminos):
+        """Devuelve (fecha_providencia, doc_id) del documento más reciente ya sincronizado, o None"""
+        filas = self._consultar("SELECT fecha, doc_id FROM marcas WHERE terminos = ?", (terminos,))
+        return tuple(filas[0]) if filas else None
+
+    def guardar_marca(self, terminos, fecha, doc_id):
+        """Registra la marca de agua de una búsqueda tras una sincronización completa"""
+        self._ejecutar(
+            "INSERT OR REPLACE INTO marcas (terminos, fecha, doc_id, actualizado) VALUES (?, ?, ?, ?)",
+            (terminos, fecha, doc_id, time.time())
+        )
+
+    # Documentos
+
+    def registrar_documento(self, terminos, orden, doc):
+        """Guarda los metadatos de un documento encontrado sin pisar su estado si ya existía"""
+        self._ejecutar("""
+            INSERT INTO documentos (terminos, doc_id, orden, metadatos, estado, actualizado)
+            VALUES (?, ?, ?, ?, 'buscado', ?)
+            ON CONFLICT (terminos, doc_id) DO UPDATE SET orden = excluded.orden, metadatos = excluded.metadatos
+        """, (terminos, doc["id"], orden, json.dumps(doc, ensure_ascii=False), time.time()))
+
+    def conoce_documento(self, terminos, doc_id):
+        """Indica si el documento ya se registró para esta búsqueda"""
+        return bool(self._consultar("SELECT 1 FROM documentos WHERE terminos = ? AND doc_id = ?", (terminos, doc_id)))
+
+    def ultimo_orden(self, terminos):
+        """Mayor orden registrado para la búsqueda (0 si no tiene documentos)"""
+        filas = self._consultar("SELECT MAX(orden) FROM documentos WHERE terminos = ?", (terminos,))
+        return filas[0][0] or 0
+
+    def documentos_registrados(self):
+        """Devuelve (doc_id, doc) de todos los documentos conocidos, sin repetir los de varias búsquedas"""
+        filas = self._consultar("SELECT doc_id, metadatos FROM documentos GROUP BY doc_id ORDER BY MIN(rowid)")
+        return [(doc_id, json.loads(metadatos)) for doc_id, metadatos in filas]
+
+    def estado_documento(self, doc_id):
+        """Estado más avanzado de un documento en cualquier búsqueda, o None si no se conoce"""
+        filas = self._consultar("SELECT estado FROM documentos WHERE doc_id = ?", (doc_id,))
+        estados = {fila[0] for fila in filas}
+        for estado in ("completado", "resuelto", "fallido", "buscado"):
+            if estado in estados:
+                return estado
+        return None
+
+    def marcar_documento(self, doc_id, estado):
+        """Actualiza el estado de un documento en todas las búsquedas que lo contienen"""
+        self._ejecutar(
+            "UPDATE documentos SET estado = ?, actualizado = ? WHERE doc_id = ?",
+            (estado, time.time(), doc_id)
+        )
+
+    def documentos(self, terminos, max_documentos=None):
+        """Devuelve (orden, doc) de la búsqueda en el orden original"""
+        sql = "SELECT orden, metadatos FROM documentos WHERE terminos = ? ORDER BY orden"
+        parametros = (terminos,)
+        if max_documentos:
+            sql += " LIMIT ?"
+            parametros += (max_documentos,)
+        return [(orden, json.loads(metadatos)) for orden, metadatos in self._consultar(sql, parametros)]
+
+    def reservar_nombre(self, base, doc_id):
+        """Asigna el nombre base al primer documento que lo pide y devuelve el doc_id de su dueño"""
+        with self.lock:
+            self.conexion.execute("INSERT OR IGNORE INTO nombres (base, doc_id) VALUES (?, ?)", (base, doc_id))
+            self.conexion.commit()
+            return self.conexion.execute("SELECT doc_id FROM nombres WHERE base = ?", (base,)).fetchone()[0]
+
+    # Archivos
+
+    def estado_archivo(self, nombre_archivo):
+        """Estado de un archivo, o None si no está registrado"""
+        filas = self._consultar("SELECT estado FROM archivos WHERE nombre_archivo = ?", (nombre_archivo,))
+        return filas[0][0] if filas else None
+
+    def registrar_archivo(self, nombre_archivo, doc_id, origen, referencia):
+        """Registra un archivo resuelto (ruta S3 o enlace del visor) sin pisar su estado"""
+        self._ejecutar("""
+            INSERT INTO archivos (nombre_archivo, doc_id, origen, referencia, estado, actualizado)
+            VALUES (?, ?, ?, ?, 'resuelto', ?)
+            ON CONFLICT (nombre_archivo) DO UPDATE SET referencia = excluded.referencia
+        """, (nombre_archivo, doc_id, origen, referencia, time.time()))
+
+    def marcar_archivo(self, nombre_archivo, estado, bytes_descargados=None, sha256=None, error=None):
+        """Actualiza el estado de un archivo y, al completarse, su tamaño y checksum"""
+        self._ejecutar("""
+            UPDATE archivos SET estado = ?, bytes = COALESCE(?, bytes), sha256 = COALESCE(?, sha256),
+                                error = ?, actualizado = ?
+            WHERE nombre_archivo = ?
+        """, (estado, bytes_descargados, sha256, error, time.time(), nombre_archivo))
+
+    def archivos_documento(self, doc_id, origen):
+        """Devuelve (nombre_archivo, referencia) de los archivos de un documento por origen"""
+        return self._consultar(
+            "SELECT nombre_archivo, referencia FROM archivos WHERE doc_id = ? AND origen = ? ORDER BY rowid",
+            (doc_id, origen)
+        )
+
+    def archivos_completados(self, doc_id):
+        """Devuelve (nombre_archivo, bytes, sha256) de los archivos descargados de un documento"""
+        return self._consultar(
+            "SELECT nombre_archivo, bytes, sha256 FROM archivos WHERE doc_id = ? AND estado = 'completado' "
+            "ORDER BY rowid",
+            (doc_id,)
+        )
+
+    def resumen(self):
+        """Cuenta los archivos por estado"""
+        return dict(self._consultar("SELECT estado, COUNT(*) FROM archivos GROUP BY estado"))
+
+    def cerrar(self):
+        """Cierra la conexión a la base de datos"""
+        with self.lock:
+            self.conexion.close()
@@ -0,0 +1,181 @@
+import os
+import json
+import math
+import time
+import threading
+import urllib.parse
+
+# Extensiones de los archivos que se descargan (fase "descarga" aunque vengan del gestor)
+EXTENSIONES_DOCUMENTO = (".pdf", ".docx", ".doc", ".xlsx", ".xls")
+
+# Orden de las fases en el resumen
+FASES = ["sesion", "busqueda", "firma", "visor", "descarga", "otro"]
+
+
+def fase_solicitud(url):
+    """Clasifica una solicitud en su fase del flujo según la URL"""
+    partes = urllib.parse.urlsplit(url)
+    host = partes.hostname or ""
+    ruta = partes.path.lower()
+    if "get-signed-url" in ruta:
+        return "firma"
+    if "visor-relatorias" in ruta:
+        return "visor"
+    if ruta.endswith(("/_search", "/_mget", "/_msearch")) or ruta.startswith("/api/v1/busqueda") or partes.fragment:
+        return "busqueda"
+    if host.endswith("s3.amazonaws.com") or ruta.endswith(EXTENSIONES_DOCUMENTO):
+        return "descarga"
+    if host == "relatoria.sic.gov.co" and ruta in ("", "/"):
+        return "sesion"
+    return "otro"
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class MetricasHTTP:
+    def __init__(self, ruta_log=None, limitador=None):
+        """Registra cada solicitud HTTP de una sesión mediante un hook de respuesta de requests
+
+        Por solicitud se guarda host, fase (ver fase_solicitud), código,
+        latencia hasta recibir las cabeceras, bytes (según Content-Length) y
+        reintentos (de conexión en urllib3 y de saturación en el adaptador). Si se indica ruta_log cada registro se
+        añade como una línea JSON. El resumen da p50/p95 por fase, MB/s,
+        documentos por minuto y el tiempo dormido en el limitador de tasa; lo
+        mismo se puede exportar en formato de texto de Prometheus. Las
+        solicitudes que fallan sin respuesta (errores de conexión) no pasan
+        por el hook y no se cuentan.
+        """
+        self.ruta_log = ruta_log
+        self.limitador = limitador
+        self.lock = threading.Lock()
+        self.inicio = time.monotonic()
+        self.registros = []
+        # Documentos procesados, que suma quien usa la sesión (para documentos/min)
+        self.documentos = 0
+        self.log = open(ruta_log, "a", encoding="utf-8") if ruta_log else None
+
+    def instalar(self, session):
+        """Añade el hook de respuesta a una sesión de requests"""
+        session.hooks["response"].append(self.gancho)
+        return session
+
+    def gancho(self, response, *args, **kwargs):
+        reintentos = getattr(response.raw, "retries", None)
+        # elapsed incluye la espera del limitador de tasa (ver AdaptadorLimitado), que se resume aparte
+        latencia = response.elapsed.total_seconds() - getattr(response, "espera_limitador", 0.0)
+        try:
+            tamano = int(response.headers.get("Content-Length", 0))
+        except ValueError:
+            tamano = 0
+        registro = {
+            "ts": round(time.time(), 3),
+            "metodo": response.request.method,
+            "host": urllib.parse.urlsplit(response.url).hostname or "",
+            "fase": fase_solicitud(response.request.url),
+            "status": response.status_code,
+            "latencia_ms": round(max(0.0, latencia) * 1000, 1),
+            "bytes": tamano,
+            "reintentos": (len(reintentos.history) if reintentos is not None else 0)
+                          + getattr(response, "reintentos_saturacion", 0),
+        }
+        with self.lock:
+            self.registros.append(registro)
+            if self.log:
+                self.log.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                self.log.flush()
+        return response
+
+    def _por_fase(self):
+        fases = {}
+        with self.lock:
+            for registro in self.registros:
+                fases.setdefault(registro["fase"], []).append(registro)
+        return sorted(fases.items(), key=lambda item: FASES.index(item[0]))
+
+    def _tiempo_espera(self):
+        return self.limitador.tiempo_espera if self.limitador else 0.0
+
+    def resumen(self):
+        """Líneas del resumen de fin de ejecución"""
+        duracion = max(time.monotonic() - self.inicio, 1e-9)
+        lineas = []
+        total_bytes = 0
+        for fase, registros in self._por_fase():
+            latencias = sorted(registro["latencia_ms"] for registro in registros)
+            errores = sum(1 for registro in registros if registro["status"] >= 400)
+            reintentos = sum(registro["reintentos"] for registro in registros)
+            tamano = sum(registro["bytes"] for registro in registros)
+            total_bytes += tamano
+            lineas.append(f"{fase}: {len(registros)} solicitudes, p50 {percentil(latencias, 50):.0f} ms, "
+                          f"p95 {percentil(latencias, 95):.0f} ms, {errores} errores, {reintentos} reintentos, "
+                          f"{tamano / (1024 * 1024):.1f} MB")
+        lineas.append(f"{total_bytes / (1024 * 1024) / duracion:.2f} MB/s, {self.documentos / duracion * 60:.1f} documentos/min "
+                      f"en {duracion:.1f} s; {self._tiempo_espera():.1f} s dormidos en el limitador de tasa")
+        return lineas
+
+    def prometheus(self):
+        """Las mismas métricas en formato de texto de Prometheus (p. ej. para el textfile collector)"""
+        lineas = [
+            "# HELP sic_solicitudes_total Solicitudes HTTP por fase, host y código",
+            "# TYPE sic_solicitudes_total counter",
+        ]
+        conteos = {}
+        with self.lock:
+            for registro in self.registros:
+                clave = (registro["fase"], registro["host"], registro["status"])
+                conteos[clave] = conteos.get(clave, 0) + 1
+        for (fase, host, status), n in sorted(conteos.items()):
+            lineas.append(f'sic_solicitudes_total{{fase="{fase}",host="{host}",status="{status}"}} {n}')
+
+        por_fase = self._por_fase()
+        lineas += ["# HELP sic_latencia_segundos Latencia hasta las cabeceras de respuesta",
+                   "# TYPE sic_latencia_segundos summary"]
+        for fase, registros in por_fase:
+            latencias = sorted(registro["latencia_ms"] / 1000 for registro in registros)
+            for cuantil in (0.5, 0.95):
+                lineas.append(f'sic_latencia_segundos{{fase="{fase}",quantile="{cuantil}"}} '
+                              f'{percentil(latencias, cuantil * 100):.6f}')
+            lineas.append(f'sic_latencia_segundos_sum{{fase="{fase}"}} {sum(latencias):.6f}')
+            lineas.append(f'sic_latencia_segundos_count{{fase="{fase}"}} {len(latencias)}')
+
+        lineas += ["# HELP sic_bytes_total Bytes recibidos por fase (según Content-Length)",
+                   "# TYPE sic_bytes_total counter"]
+        for fase, registros in por_fase:
+            lineas.append(f'sic_bytes_total{{fase="{fase}"}} {sum(registro["bytes"] for registro in registros)}')
+
+        lineas += ["# HELP sic_reintentos_total Reintentos de conexión y de saturación",
+                   "# TYPE sic_reintentos_total counter"]
+        for fase, registros in por_fase:
+            lineas.append(f'sic_reintentos_total{{fase="{fase}"}} {sum(registro["reintentos"] for registro in registros)}')
+
+        lineas += [
+            "# HELP sic_espera_limitador_segundos_total Tiempo dormido en el limitador de tasa",
+            "# TYPE sic_espera_limitador_segundos_total counter",
+            f"sic_espera_limitador_segundos_total {self._tiempo_espera():.3f}",
+            "# HELP sic_documentos_total Documentos procesados",
+            "# TYPE sic_documentos_total counter",
+            f"sic_documentos_total {self.documentos}",
+            "# HELP sic_duracion_segundos Duración de la ejecución",
+            "# TYPE sic_duracion_segundos gauge",
+            f"sic_duracion_segundos {time.monotonic() - self.inicio:.3f}",
+        ]
+        return "\n".join(lineas) + "\n"
+
+    def escribir_prometheus(self, ruta):
+        """Escribe prometheus() en ruta de forma atómica"""
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(temporal, ruta)
+
+    def cerrar(self):
+        """Cierra el log JSON"""
+        with self.lock:
+            if self.log:
+                self.log.close()
+                self.log = None
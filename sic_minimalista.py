@@ -1,36 +1,56 @@
-import requests
 from bs4 import BeautifulSoup
-import time
 import os
 import re
 import json
 import urllib.parse
+from sic_limitador import LimitadorTasa
+from sic_cache_urls import CacheURLsFirmadas
+from sic_http import crear_sesion
+from sic_metricas import MetricasHTTP
+from sic_estado import EstadoSesion
 
-def buscar_documentos_sic(terminos, max_docs=10):
-    """Busca documentos en la SIC y devuelve los resultados"""
+# Limitador compartido por todas las sesiones del módulo
+limitador = LimitadorTasa()
+
+# Endpoints de la SIC
+URL_SIC = "https://relatoria.sic.gov.co/"
+URL_API_BUSQUEDA = "https://relatoria.sic.gov.co/api/v1/busqueda"
+URL_BUSQUEDA = "https://relatoria.sic.gov.co/sic-relatoria-idx/_search"
+URL_VISOR = "https://gestor.relatoria.sic.gov.co/visor-relatorias"
+URL_FIRMA_S3 = "https://m0s03uyzg3.execute-api.us-east-1.amazonaws.com/prod/get-signed-url/"
+
+# User-Agent fijo de este descargador
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
+
+def crear_sesion_minimalista():
+    """Sesión única para búsqueda y descargas: conserva cookies y conexiones abiertas"""
+    return crear_sesion(limitador, user_agent=USER_AGENT)
+
+def buscar_documentos_sic(terminos, max_docs=10, session=None, estado=None):
+    """Busca documentos en la SIC y devuelve los resultados
+    
+    Si se pasa session se reutiliza (cookies y conexiones) para las descargas.
+    Con estado (sic_estado.EstadoSesion) se usan el User-Agent y las cookies
+    compartidos con otras ejecuciones y, si siguen vigentes, se omite la
+    visita a la página principal.
+    """
     print(f"Buscando documentos para: '{terminos}'")
     
-    # Configurar sesión con headers adecuados
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-        "Accept": "application/json, text/plain, */*",
-        "Accept-Language": "es-ES,es;q=0.9",
-        "Referer": "https://relatoria.sic.gov.co/",
-        "Origin": "https://relatoria.sic.gov.co",
-        "Sec-Fetch-Dest": "empty",
-        "Sec-Fetch-Mode": "cors",
-        "Sec-Fetch-Site": "same-origin"
-    })
-    
-    # Visitar la página principal primero para obtener cookies
+    if session is None:
+        session = crear_sesion_minimalista()
+    
+    # Visitar la página principal primero para obtener cookies, salvo que ya haya unas vigentes
     try:
-        print("Inicializando sesión...")
-        session.get("https://relatoria.sic.gov.co/")
-        time.sleep(1)
+        if estado is not None and estado.aplicar_a_sesion(session):
+            print("✓ Sesión reanudada con las cookies guardadas")
+        else:
+            print("Inicializando sesión...")
+            response = session.get(URL_SIC)
+            if estado is not None and response.status_code == 200:
+                estado.guardar_de_sesion(session)
         
         # Intentar primero con la API directa
-        api_url = "https://relatoria.sic.gov.co/api/v1/busqueda"
+        api_url = URL_API_BUSQUEDA
         api_payload = {
             "terminos": terminos,
             "pagina": 1,
@@ -47,7 +67,7 @@ def buscar_documentos_sic(terminos, max_docs=10):
             print(f"× Error en API: {response.status_code}")
         
         # Si falla, intentar con la forma de búsqueda en Elasticsearch
-        search_url = "https://relatoria.sic.gov.co/sic-relatoria-idx/_search"
+        search_url = URL_BUSQUEDA
         query = {
             "query": {
                 "query_string": {
@@ -84,14 +104,11 @@ def buscar_documentos_sic(terminos, max_docs=10):
         
         # Si ambos fallan, intentar extraer del HTML
         print("Intentando extraer resultados del HTML...")
-        search_html_url = f"https://relatoria.sic.gov.co/#/results?q={urllib.parse.quote(terminos)}"
+        search_html_url = f"{URL_SIC}#/results?q={urllib.parse.quote(terminos)}"
         
         response = session.get(search_html_url)
         
         if response.status_code == 200:
-            # Esperar a que JavaScript cargue los resultados (solo simulación)
-            time.sleep(3)
-            
             # En realidad, esto no funcionará porque necesitamos un navegador real
             # para ejecutar el JavaScript. Esta parte es solo un placeholder.
             return []
@@ -105,21 +122,29 @@ def buscar_documentos_sic(terminos, max_docs=10):
 
 def obtener_url_documento(doc_id, tipo="Sentencia_escrita"):
     """Genera URL para acceder al documento"""
-    return f"https://gestor.relatoria.sic.gov.co/visor-relatorias/{doc_id}/archivos-providencia/{tipo}"
+    return f"{URL_VISOR}/{doc_id}/archivos-providencia/{tipo}"
 
-def obtener_url_s3(path_s3, session):
+def obtener_url_s3(path_s3, session, cache=None):
     """Obtiene URL firmada para un archivo en S3"""
     if not path_s3:
         return None
     
-    base_url = "https://m0s03uyzg3.execute-api.us-east-1.amazonaws.com/prod/get-signed-url/"
+    if cache:
+        url_firmada = cache.obtener(path_s3)
+        if url_firmada:
+            return url_firmada
+    
+    base_url = URL_FIRMA_S3
     url = base_url + urllib.parse.quote(path_s3)
     
     try:
         response = session.get(url)
         if response.status_code == 200:
             data = response.json()
-            return data.get("url")
+            url_firmada = data.get("url")
+            if cache and url_firmada:
+                cache.guardar(path_s3, url_firmada)
+            return url_firmada
     except:
         pass
     
@@ -127,26 +152,51 @@ def obtener_url_s3(path_s3, session):
 
 def descargar_documento(url, nombre_archivo, session):
     """Descarga un documento"""
+    return _descargar(url, nombre_archivo, session) == 200
+
+def descargar_desde_s3(path_s3, nombre_archivo, session, cache=None):
+    """Firma path_s3 y descarga el archivo
+    
+    Si una URL firmada de la caché es rechazada (4xx), por ejemplo porque sus
+    credenciales temporales caducaron antes de X-Amz-Expires, se descarta y
+    se firma una vez más.
+    """
+    de_cache = cache.obtener(path_s3) if cache else None
+    url_s3 = de_cache or obtener_url_s3(path_s3, session, cache)
+    if not url_s3:
+        return False
+    codigo = _descargar(url_s3, nombre_archivo, session)
+    if de_cache and codigo is not None and 400 <= codigo < 500:
+        print("URL firmada de la caché rechazada, se vuelve a firmar")
+        cache.invalidar(path_s3)
+        url_s3 = obtener_url_s3(path_s3, session, cache)
+        codigo = _descargar(url_s3, nombre_archivo, session) if url_s3 else None
+    return codigo == 200
+
+def _descargar(url, nombre_archivo, session):
+    """Descarga un documento y devuelve el código HTTP (200 si ya existía), o None si hubo un error de red"""
     if os.path.exists(nombre_archivo):
         print(f"El archivo ya existe: {nombre_archivo}")
-        return True
+        return 200
     
     try:
         print(f"Descargando: {nombre_archivo}")
         response = session.get(url, stream=True)
         
         if response.status_code == 200:
-            with open(nombre_archivo, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+            # Escribir en .part y renombrar al terminar: nunca queda un archivo truncado con el nombre final
+            parcial = nombre_archivo + ".part"
+            with open(parcial, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
                     f.write(chunk)
+            os.replace(parcial, nombre_archivo)
             print(f"✓ Descargado: {nombre_archivo}")
-            return True
         else:
             print(f"× Error al descargar: {response.status_code}")
-            return False
+        return response.status_code
     except Exception as e:
         print(f"× Error: {e}")
-        return False
+        return None
 
 def main():
     import argparse
@@ -155,20 +205,32 @@ def main():
     parser.add_argument('terminos', help='Términos de búsqueda')
     parser.add_argument('--max', type=int, default=5, help='Número máximo de documentos')
     parser.add_argument('--dir', default='documentos_sic', help='Directorio de salida')
+    parser.add_argument('--metricas', action='store_true',
+                        help='Registrar cada solicitud HTTP (JSON por línea en <dir>/.metricas.jsonl) y resumir por fase')
+    parser.add_argument('--prometheus', default=None, metavar='RUTA',
+                        help='Escribir las métricas al terminar en formato de texto de Prometheus (implica --metricas)')
+    parser.add_argument('--estado', default=None, metavar='RUTA',
+                        help='Archivo de estado de sesión (cookies, User-Agent) compartido entre procesos; '
+                             'por defecto <dir>/.estado_sesion.json')
     
     args = parser.parse_args()
     
     # Crear directorio de salida
     os.makedirs(args.dir, exist_ok=True)
     
-    # Configurar sesión
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36"
-    })
+    # Una sola sesión: las cookies y conexiones de la búsqueda sirven para las descargas
+    session = crear_sesion_minimalista()
+    metricas = None
+    if args.metricas or args.prometheus:
+        metricas = MetricasHTTP(os.path.join(args.dir, ".metricas.jsonl"), limitador)
+        metricas.instalar(session)
+    
+    # Caché de URLs firmadas y estado de sesión compartidos entre ejecuciones
+    cache_urls = CacheURLsFirmadas(os.path.join(args.dir, ".cache_urls.sqlite"))
+    estado = EstadoSesion(args.estado or os.path.join(args.dir, ".estado_sesion.json"))
     
     # Buscar documentos
-    resultados = buscar_documentos_sic(args.terminos, args.max)
+    resultados = buscar_documentos_sic(args.terminos, args.max, session, estado)
     
     if not resultados:
         print("No se encontraron resultados.")
@@ -196,11 +258,14 @@ def main():
             tipo = archivo.get("tipo_archivo", "")
             
             if path_s3:
-                url_s3 = obtener_url_s3(path_s3, session)
-                if url_s3:
-                    nombre_archivo = os.path.join(args.dir, f"{i:02d}_{titulo.replace(' ', '_')}_{tipo}.pdf")
-                    if descargar_documento(url_s3, nombre_archivo, session):
-                        descargado = True
+                nombre_archivo = os.path.join(args.dir, f"{i:02d}_{titulo.replace(' ', '_')}_{tipo}.pdf")
+                if os.path.exists(nombre_archivo):
+                    print(f"El archivo ya existe: {nombre_archivo}")
+                    descargado = True
+                    continue
+                
+                if descargar_desde_s3(path_s3, nombre_archivo, session, cache_urls):
+                    descargado = True
         
         # Si no se descargó por S3, intentar con el visor
         if not descargado and doc_id:
@@ -231,12 +296,20 @@ def main():
                         descargar_documento(pdf_link, nombre_archivo, session)
             except Exception as e:
                 print(f"Error al procesar visor: {e}")
-        
-        # Esperar entre documentos
-        time.sleep(1)
+    
+    estado.guardar_de_sesion(session)
     
     print("\n" + "=" * 50)
     print(f"Proceso completado. Documentos guardados en: {args.dir}")
+    if metricas:
+        metricas.documentos = len(resultados)
+        print("Solicitudes HTTP por fase:")
+        for linea in metricas.resumen():
+            print("  " + linea)
+        if args.prometheus:
+            metricas.escribir_prometheus(args.prometheus)
+            print(f"Métricas en formato Prometheus: {args.prometheus}")
+        metricas.cerrar()
     print("=" * 50)
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+import os
+import json
+import threading
+import unicodedata
+
+# Intentos sin éxito a partir de los cuales una fuente se deja de probar
+MIN_MUESTRAS = 3
+
+# Aun descartada, una fuente se vuelve a probar cada tantos documentos
+REPROBAR_CADA = 10
+
+
+def normalizar_tipo(tipo):
+    """Normaliza un tipo de archivo para comparar los de S3 ("Sentencia escrita") con los del visor ("Sentencia_escrita")"""
+    sin_tildes = unicodedata.normalize("NFKD", tipo or "").encode("ascii", "ignore").decode("ascii")
+    return sin_tildes.strip().replace(" ", "_").lower()
+
+
+class PlanificadorFuentes:
+    def __init__(self, ruta=None, min_muestras=MIN_MUESTRAS, reprobar_cada=REPROBAR_CADA):
+        """Decide por documento qué fuentes probar (S3 y tipos del visor) según lo aprendido
+
+        Las estadísticas se agrupan por tipo_providencia y, si se indica ruta,
+        se guardan en JSON para que las siguientes ejecuciones partan de ellas.
+        """
+        self.ruta = ruta
+        self.min_muestras = min_muestras
+        self.reprobar_cada = reprobar_cada
+        self.lock = threading.Lock()
+        # {tipo_providencia: {fuente: {"intentos", "exitos", "fallos_seguidos", "omitidos"}}}
+        self.estadisticas = {}
+        self.visores_evitados = 0
+
+        if ruta and os.path.exists(ruta):
+            try:
+                with open(ruta, encoding="utf-8") as f:
+                    self.estadisticas = json.load(f)
+            except (OSError, ValueError):
+                self.estadisticas = {}
+
+    def _contador(self, tipo_providencia, fuente):
+        contador = self.estadisticas.setdefault(tipo_providencia, {}).setdefault(fuente, {})
+        for campo in ("intentos", "exitos", "fallos_seguidos", "omitidos"):
+            contador.setdefault(campo, 0)
+        return contador
+
+    def _decidir(self, tipo_providencia, fuente):
+        """Una fuente se prueba mientras no acumule min_muestras fracasos seguidos
+
+        Una fuente descartada se vuelve a probar cada reprobar_cada documentos
+        por si el servidor ha cambiado.
+        """
+        contador = self._contador(tipo_providencia, fuente)
+        if contador["fallos_seguidos"] < self.min_muestras:
+            return True
+        contador["omitidos"] += 1
+        if contador["omitidos"] >= self.reprobar_cada:
+            contador["omitidos"] = 0
+            return True
+        return False
+
+    def usar_s3(self, tipo_providencia):
+        """Indica si conviene intentar S3 para un documento de este tipo de providencia"""
+        with self.lock:
+            return self._decidir(tipo_providencia, "s3")
+
+    def tipos_visor(self, tipo_providencia, tipos_archivo, cubiertos_s3=()):
+        """Tipos del visor a consultar: los no cubiertos por S3 y que no se hayan descartado"""
+        cubiertos = {normalizar_tipo(tipo) for tipo in cubiertos_s3}
+        tipos = []
+        with self.lock:
+            for tipo in tipos_archivo:
+                if normalizar_tipo(tipo) in cubiertos or not self._decidir(tipo_providencia, f"visor:{tipo}"):
+                    self.visores_evitados += 1
+                else:
+                    tipos.append(tipo)
+        return tipos
+
+    def registrar(self, tipo_providencia, fuente, exito):
+        """Anota el resultado de probar una fuente ("s3" o "visor:<tipo>")"""
+        with self.lock:
+            contador = self._contador(tipo_providencia, fuente)
+            contador["intentos"] += 1
+            if exito:
+                contador["exitos"] += 1
+                contador["fallos_seguidos"] = 0
+            else:
+                contador["fallos_seguidos"] += 1
+
+    def guardar(self):
+        """Persiste las estadísticas en JSON"""
+        if not self.ruta:
+            return
+        with self.lock:
+            temporal = self.ruta + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(self.estadisticas, f, indent=2, ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+
+    def resumen(self):
+        """Fuente que funciona para cada tipo de providencia, con su tasa de éxito"""
+        lineas = []
+        with self.lock:
+            for tipo_providencia, fuentes in sorted(self.estadisticas.items()):
+                partes = [
+                    f"{fuente} {c['exitos']}/{c['intentos']}"
+                    for fuente, c in sorted(fuentes.items())
+                ]
+                lineas.append(f"{tipo_providencia or 'N/A'}: " + ", ".join(partes))
+        return lineas
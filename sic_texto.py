@@ -0,0 +1,207 @@
+import os
+import re
+import html
+import zipfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+
+# Subdirectorio de la salida con el texto extraído: textos/<doc_id>/<archivo>.txt
+DIR_TEXTOS = "textos"
+
+RE_ETIQUETA = re.compile(r"<[^>]+>")
+RE_PARRAFO_DOCX = re.compile(r"</w:p>")
+RE_ESPACIOS = re.compile(r"[ \t\r\f\v]+")
+
+
+def _texto_xml(xml, separador_parrafo):
+    """Quita las etiquetas de un XML de Office conservando los saltos de párrafo"""
+    xml = separador_parrafo.sub("\n", xml)
+    return html.unescape(RE_ETIQUETA.sub("", xml))
+
+
+def _extraer_docx(ruta):
+    with zipfile.ZipFile(ruta) as archivo:
+        xml = archivo.read("word/document.xml").decode("utf-8", "ignore")
+    return _texto_xml(xml, RE_PARRAFO_DOCX)
+
+
+def _extraer_xlsx(ruta):
+    with zipfile.ZipFile(ruta) as archivo:
+        try:
+            xml = archivo.read("xl/sharedStrings.xml").decode("utf-8", "ignore")
+        except KeyError:
+            return ""
+    return _texto_xml(xml, re.compile(r"</si>"))
+
+
+def _extraer_txt(ruta):
+    with open(ruta, encoding="utf-8", errors="ignore") as archivo:
+        return archivo.read()
+
+
+def _extraer_pdf(ruta):
+    # pypdf o pdfminer.six son opcionales; sin ninguno no se extrae texto de PDFs
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+    if PdfReader is None:
+        try:
+            from pdfminer.high_level import extract_text
+        except ImportError:
+            return None
+    # Cada biblioteca lanza sus propias excepciones (PdfReadError, PDFSyntaxError...)
+    # ante PDFs dañados o páginas de error HTML guardadas como .pdf
+    try:
+        if PdfReader is not None:
+            lector = PdfReader(ruta)
+            return "\n".join(pagina.extract_text() or "" for pagina in lector.pages)
+        return extract_text(ruta)
+    except Exception as e:
+        print(f"× PDF ilegible, se deja sin texto: {ruta}: {e}")
+        return ""
+
+
+EXTRACTORES = {
+    ".txt": _extraer_txt,
+    ".docx": _extraer_docx,
+    ".xlsx": _extraer_xlsx,
+    ".pdf": _extraer_pdf,
+}
+
+
+def extraer_texto(ruta):
+    """Devuelve el texto de un documento descargado, o None si su formato no se puede leer
+
+    Entiende .docx y .xlsx con la biblioteca estándar y .pdf si está instalado
+    pypdf o pdfminer.six. Los espacios repetidos se compactan.
+    """
+    extension = "." + ruta.rsplit(".", 1)[-1].lower() if "." in ruta else ""
+    extractor = EXTRACTORES.get(extension)
+    if extractor is None:
+        return None
+    try:
+        texto = extractor(ruta)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f"× No se pudo extraer el texto de {ruta}: {e}")
+        return None
+    if texto is None:
+        return None
+    lineas = (RE_ESPACIOS.sub(" ", linea).strip() for linea in texto.splitlines())
+    return "\n".join(linea for linea in lineas if linea)
+
+
+def ruta_texto(directorio, doc_id, nombre_archivo):
+    """Ruta del archivo de texto que acompaña a un documento descargado"""
+    return os.path.join(directorio, DIR_TEXTOS, doc_id, os.path.basename(nombre_archivo) + ".txt")
+
+
+def texto_vigente(ruta_archivo, ruta_txt):
+    """Indica si el texto extraído existe y no es más antiguo que el archivo"""
+    try:
+        return os.path.getmtime(ruta_txt) >= os.path.getmtime(ruta_archivo)
+    except OSError:
+        return False
+
+
+def _extraer_a_archivo(ruta_archivo, ruta_txt):
+    """Tarea del pool de procesos: extrae el texto y lo escribe junto al documento
+
+    Devuelve el número de caracteres extraídos, o None si el formato no se pudo leer.
+    """
+    texto = extraer_texto(ruta_archivo)
+    if texto is None:
+        return None
+    os.makedirs(os.path.dirname(ruta_txt), exist_ok=True)
+    parcial = ruta_txt + ".part"
+    with open(parcial, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(parcial, ruta_txt)
+    return len(texto)
+
+
+class ExtractorTexto:
+    def __init__(self, directorio, procesos=None):
+        """Etapa de extracción de texto en un pool de procesos
+
+        Los descargadores llaman a enviar al completar cada archivo y siguen
+        descargando mientras los procesos extraen el texto, de modo que el
+        trabajo de CPU se solapa con la espera de red. El texto queda en
+        directorio/textos/<doc_id>/<archivo>.txt.
+        """
+        self.directorio = directorio
+        self.executor = ProcessPoolExecutor(max_workers=procesos)
+        self.lock = threading.Lock()
+        self.pendientes = set()
+        self.extraidos = 0
+        self.sin_texto = 0
+        self.errores = 0
+        self.caracteres = 0
+
+    def enviar(self, doc_id, nombre_archivo):
+        """Encola la extracción de un archivo descargado (salvo que su texto ya esté al día)"""
+        ruta_txt = ruta_texto(self.directorio, doc_id, nombre_archivo)
+        if texto_vigente(nombre_archivo, ruta_txt):
+            return None
+        futuro = self.executor.submit(_extraer_a_archivo, nombre_archivo, ruta_txt)
+        with self.lock:
+            self.pendientes.add(futuro)
+        futuro.add_done_callback(self._terminado)
+        return futuro
+
+    def _terminado(self, futuro):
+        with self.lock:
+            self.pendientes.discard(futuro)
+            try:
+                caracteres = futuro.result()
+            except Exception:
+                self.errores += 1
+                return
+            if caracteres is None:
+                self.sin_texto += 1
+            else:
+                self.extraidos += 1
+                self.caracteres += caracteres
+
+    def esperar(self):
+        """Espera a que terminen las extracciones encoladas"""
+        with self.lock:
+            pendientes = set(self.pendientes)
+        wait(pendientes)
+
+    def resumen(self):
+        with self.lock:
+            return (f"{self.extraidos} archivos con texto ({self.caracteres / 1e6:.1f} M caracteres), "
+                    f"{self.sin_texto} sin formato legible, {self.errores} errores")
+
+    def cerrar(self):
+        """Espera las extracciones pendientes y cierra el pool de procesos"""
+        self.executor.shutdown(wait=True)
+
+
+# Función principal para ejecutar desde línea de comandos
+def main():
+    import argparse
+    from sic_manifiesto import ManifiestoTrabajo
+
+    parser = argparse.ArgumentParser(description='Extrae el texto de los documentos SIC ya descargados.')
+    parser.add_argument('--dir', default='documentos_sic', help='Directorio de los documentos descargados')
+    parser.add_argument('--procesos', type=int, default=None, help='Procesos de extracción (por defecto, uno por CPU)')
+
+    args = parser.parse_args()
+
+    manifiesto = ManifiestoTrabajo(os.path.join(args.dir, ".manifiesto.sqlite"))
+    extractor = ExtractorTexto(args.dir, args.procesos)
+    try:
+        for doc_id, _ in manifiesto.documentos_registrados():
+            for nombre_archivo, _, _ in manifiesto.archivos_completados(doc_id):
+                if os.path.exists(nombre_archivo):
+                    extractor.enviar(doc_id, nombre_archivo)
+    finally:
+        extractor.cerrar()
+        manifiesto.cerrar()
+    print("Texto extraído:", extractor.resumen())
+
+
+if __name__ == "__main__":
+    main()